@@ -0,0 +1,470 @@
+"""
+API Server Module
+A local HTTP/JSON interface to the library and the player, for scripts and
+other front ends. Built on asyncio streams (no extra dependencies): many
+clients are served at once, and library and player calls run on worker threads
+so a busy library or a slow audio device never blocks the server.
+
+Usage: python api_server.py [--host 127.0.0.1] [--port 8765] [--null-audio] [--library songs.txt]
+
+    GET    /songs?q=&prefix=&artist=&genre=&start=&limit=   list / search
+    POST   /songs                       add   {"title", "artist", "duration", "genre", "filepath"}
+    GET    /songs/<title>               get
+    PATCH  /songs/<title>               edit  {"artist": "...", ...}
+    DELETE /songs/<title>               delete
+    GET    /queue?start=&limit=         queue contents
+    POST   /queue                       add   {"title"} or {"titles": [...]}, "next": true to play it next
+    DELETE /queue/<position>            remove (1-based)
+    POST   /queue/move                  {"from": 3, "to": 1}
+    POST   /queue/shuffle
+    POST   /player/play                 {"title"} plays it now; without a body plays the next queued song
+    POST   /player/stop
+    GET    /now-playing?since=<version>&timeout=<s>   long-poll: waits until the version moves past `since`
+    GET    /events                      Server-Sent Events stream of now-playing changes
+    GET    /metrics
+"""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import re
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import metrics
+from audio_backend import NullAudioBackend
+from audio_player import AudioPlayer
+from music_library import MusicLibrary
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+MAX_PAGE_SIZE = 500
+LONG_POLL_MAX_SECONDS = 60
+SSE_KEEPALIVE_SECONDS = 15
+LIBRARY_WORKERS = 4 # Threads for library calls; reads run side by side, writes queue on the library's lock
+MESSAGE_INTERVAL_SECONDS = 2 # How often songs.txt reload messages are printed
+_SONG_FIELDS = ("title", "artist", "duration", "genre", "filepath")
+_STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+                431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def song_to_dict(song):
+    return {"title": song.title, "artist": song.artist, "duration": song.duration,
+            "genre": song.genre, "filepath": song.filepath,
+            "play_count": song.get_play_count(), "last_played": song.get_last_played()}
+
+
+def _int_param(query, name, default, minimum=0, maximum=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"'{name}' must be a number")
+    value = max(value, minimum)
+    return min(value, maximum) if maximum is not None else value
+
+
+# --- ApiServer Class ---
+class ApiServer:
+    """
+    Serves one MusicLibrary and one AudioPlayer over HTTP.
+    The loop itself only does HTTP. Library handlers run on a small thread
+    pool, since a write can wait on the library's lock (a reload or a full
+    save); player calls go to a single worker thread (keeping them in order).
+    Either way, long-poll and SSE clients are never held up.
+    """
+
+    def __init__(self, library, player):
+        self.library = library
+        self.player = player
+        self._player_calls = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-player")
+        self._library_calls = ThreadPoolExecutor(max_workers=LIBRARY_WORKERS, thread_name_prefix="api-library")
+        self._loop = None
+        self._server = None
+        self._version = 0 # Bumped on every now-playing change
+        self._changed = None
+        self._routes = [
+            ("GET", r"/songs", self.list_songs),
+            ("POST", r"/songs", self.add_song),
+            ("GET", r"/songs/(?P<title>[^/]+)", self.get_song),
+            ("PATCH", r"/songs/(?P<title>[^/]+)", self.edit_song),
+            ("DELETE", r"/songs/(?P<title>[^/]+)", self.delete_song),
+            ("GET", r"/queue", self.get_queue),
+            ("POST", r"/queue", self.add_to_queue),
+            ("POST", r"/queue/move", self.move_in_queue),
+            ("POST", r"/queue/shuffle", self.shuffle_queue),
+            ("DELETE", r"/queue/(?P<position>\d+)", self.remove_from_queue),
+            ("POST", r"/player/play", self.play),
+            ("POST", r"/player/stop", self.stop),
+            ("GET", r"/now-playing", self.now_playing),
+            ("GET", r"/metrics", self.get_metrics),
+        ]
+        self._routes = [(method, re.compile(pattern + r"/?"), handler) for method, pattern, handler in self._routes]
+
+    # --- Lifecycle ---
+    async def start(self, host="127.0.0.1", port=8765):
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.player.add_now_playing_listener(self._on_now_playing)
+        self._server = await asyncio.start_server(self._handle_connection, host, port,
+                                                  limit=MAX_HEADER_BYTES)
+        return self._server
+
+    async def close(self):
+        self.player.remove_now_playing_listener(self._on_now_playing)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._player_calls.shutdown(wait=True)
+        self._library_calls.shutdown(wait=True)
+
+    def _on_now_playing(self, song):
+        # Called on the player's threads; hand the change to the event loop.
+        self._loop.call_soon_threadsafe(self._bump_version)
+
+    def _bump_version(self):
+        self._version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _in_player(self, function, *args):
+        return await self._loop.run_in_executor(self._player_calls, function, *args)
+
+    async def _in_library(self, function, *args, **kwargs):
+        return await self._loop.run_in_executor(self._library_calls, functools.partial(function, *args, **kwargs))
+
+    # --- HTTP ---
+    async def _read_request(self, reader):
+        """Returns (method, path, query, body, keep_alive), or None when the client is done."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        url = urlsplit(target)
+        return method.upper(), url.path, parse_qs(url.query), body, keep_alive
+
+    @staticmethod
+    def _response(status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, 'OK')}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + body
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    writer.write(self._response(e.status, {"error": str(e)}, False))
+                    break
+                if request is None:
+                    break
+                method, path, query, body, keep_alive = request
+                if method == "GET" and path.rstrip("/") == "/events":
+                    await self._stream_events(writer)
+                    break
+                with metrics.timed("api.request"):
+                    status, payload = await self._dispatch(method, path, query, body)
+                metrics.increment(f"api.status.{status}")
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, query, body):
+        allowed = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            try:
+                data = json.loads(body) if body else {}
+                if not isinstance(data, dict):
+                    raise HttpError(400, "request body must be a JSON object")
+                params = {name: unquote(value) for name, value in match.groupdict().items()}
+                if inspect.iscoroutinefunction(handler):
+                    return await handler(query, data, **params)
+                return await self._in_library(handler, query, data, **params)
+            except json.JSONDecodeError:
+                return 400, {"error": "request body is not valid JSON"}
+            except HttpError as e:
+                return e.status, {"error": str(e)}
+            except Exception as e:
+                return 500, {"error": f"unexpected error: {e}"}
+        if allowed:
+            return 405, {"error": f"{method} not allowed on {path}"}
+        return 404, {"error": f"no route for {path}"}
+
+    # --- Library ---
+    def _find(self, title):
+        song = self.library.all_songs.get(title.lower())
+        if song is None:
+            raise HttpError(404, f"song '{title}' not found")
+        return song
+
+    def list_songs(self, query, data):
+        start = _int_param(query, "start", 0)
+        limit = _int_param(query, "limit", 50, 1, MAX_PAGE_SIZE)
+        if "q" in query:
+            songs = self.library.fuzzy_search(query["q"][0], limit=start + limit)
+        elif "prefix" in query:
+            songs = self.library.get_songs_by_prefix(query["prefix"][0])
+        elif "artist" in query:
+            songs = self.library.search_by_artist(query["artist"][0])
+        elif "genre" in query:
+            songs = self.library.search_by_genre(query["genre"][0])
+        else:
+            songs = self.library.get_sorted_song_list(start, start + limit)
+            return 200, {"total": self.library.song_count(), "start": start,
+                         "songs": [song_to_dict(song) for song in songs]}
+        return 200, {"total": len(songs), "start": start,
+                     "songs": [song_to_dict(song) for song in songs[start:start + limit]]}
+
+    def get_song(self, query, data, title):
+        return 200, song_to_dict(self._find(title))
+
+    def add_song(self, query, data):
+        missing = [field for field in _SONG_FIELDS if data.get(field) in (None, "")]
+        if missing:
+            raise HttpError(400, f"missing fields: {', '.join(missing)}")
+        title, artist, genre, filepath = (str(data[field]).strip() for field in ("title", "artist", "genre", "filepath"))
+        if any("|" in text for text in (title, artist, genre, filepath)):
+            raise HttpError(400, "fields can't contain '|'")
+        try:
+            duration = int(data["duration"])
+        except (TypeError, ValueError):
+            raise HttpError(400, "duration must be a number of seconds")
+        if duration <= 0:
+            raise HttpError(400, "duration must be positive")
+        if title.lower() in self.library.all_songs:
+            raise HttpError(409, f"song '{title}' already exists")
+        self.library.add_song(title, artist, duration, genre, filepath)
+        return 201, song_to_dict(self.library.all_songs[title.lower()])
+
+    def edit_song(self, query, data, title):
+        song = self._find(title)
+        unknown = set(data) - set(_SONG_FIELDS)
+        if unknown:
+            raise HttpError(400, f"unknown fields: {', '.join(sorted(unknown))}")
+        # Check every field before changing any, so a bad one doesn't leave the others applied.
+        values = {}
+        for field in data:
+            value = str(data[field]).strip()
+            if not value or "|" in value:
+                raise HttpError(400, f"invalid value for {field}")
+            if field == "duration":
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise HttpError(400, "duration must be a number of seconds")
+                if value <= 0:
+                    raise HttpError(400, "duration must be positive")
+            values[field] = value
+        with self.library.exclusive():
+            new_key = values.get("title", song.title).lower()
+            if new_key != song.title.lower() and new_key in self.library.all_songs:
+                raise HttpError(409, f"song '{values['title']}' already exists")
+            # Rename last so the song is still found under its old title until then.
+            for field in sorted(values, key=lambda field: field == "title"):
+                result = self.library.edit_song(song, field, values[field])
+                if result.startswith("❌"):
+                    raise HttpError(409, result.lstrip("❌ "))
+        return 200, song_to_dict(song)
+
+    def delete_song(self, query, data, title):
+        song = self._find(title)
+        self.library.delete_song(song.title)
+        return 200, {"deleted": song.title}
+
+    # --- Queue and playback ---
+    async def _queue_state(self, start=0, limit=50):
+        # The player's lock can be held while a track loads, so read the queue off the loop.
+        length, songs = await self._in_player(self.player.get_queue_window, start, limit)
+        return {"length": length, "start": start, "songs": [song_to_dict(song) for song in songs]}
+
+    async def get_queue(self, query, data):
+        return 200, await self._queue_state(_int_param(query, "start", 0),
+                                      _int_param(query, "limit", 50, 1, MAX_PAGE_SIZE))
+
+    async def add_to_queue(self, query, data):
+        titles = data.get("titles") or ([data["title"]] if data.get("title") else [])
+        if not titles:
+            raise HttpError(400, "give 'title' or 'titles'")
+        songs = await self._in_library(lambda: [self._find(str(title)) for title in titles])
+        if data.get("next"):
+            for song in reversed(songs):
+                await self._in_player(self.player.play_after_current, song)
+        elif len(songs) == 1:
+            await self._in_player(self.player.add_to_queue, songs[0])
+        else:
+            await self._in_player(self.player.add_many_to_queue, songs)
+        return 200, await self._queue_state()
+
+    async def remove_from_queue(self, query, data, position):
+        song = await self._in_player(self.player.remove_from_queue, int(position))
+        if song is None:
+            raise HttpError(404, f"no song at queue position {position}")
+        return 200, await self._queue_state()
+
+    async def move_in_queue(self, query, data):
+        try:
+            from_position, to_position = int(data["from"]), int(data["to"])
+        except (KeyError, TypeError, ValueError):
+            raise HttpError(400, "give numeric 'from' and 'to' positions")
+        length, _ = await self._in_player(self.player.get_queue_window, 0, 0)
+        if not (1 <= from_position <= length and 1 <= to_position <= length):
+            raise HttpError(400, "invalid queue position")
+        await self._in_player(self.player.move_in_queue, from_position, to_position)
+        return 200, await self._queue_state()
+
+    async def shuffle_queue(self, query, data):
+        await self._in_player(self.player.shuffle_queue)
+        return 200, await self._queue_state()
+
+    async def play(self, query, data):
+        if data.get("title"):
+            song = await self._in_library(self._find, str(data["title"]))
+            await self._in_player(self.player.play_now, song)
+        else:
+            await self._in_player(self.player.play_next_from_queue)
+        return 200, self._now_playing_state()
+
+    async def stop(self, query, data):
+        await self._in_player(self.player.stop)
+        return 200, self._now_playing_state()
+
+    def _now_playing_state(self):
+        song = self.player.current_song
+        return {"version": self._version, "is_playing": song is not None,
+                "song": song_to_dict(song) if song is not None else None}
+
+    async def now_playing(self, query, data):
+        since = _int_param(query, "since", -1, minimum=-1)
+        timeout = _int_param(query, "timeout", 25, 0, LONG_POLL_MAX_SECONDS)
+        if since >= self._version and timeout:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass # Nothing changed; the client polls again with the same version
+        return 200, self._now_playing_state()
+
+    async def _stream_events(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        metrics.increment("api.sse_clients")
+        try:
+            while True:
+                state = json.dumps(self._now_playing_state())
+                writer.write(f"id: {self._version}\nevent: now-playing\ndata: {state}\n\n".encode("utf-8"))
+                await writer.drain()
+                while True:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), SSE_KEEPALIVE_SECONDS)
+                        break
+                    except asyncio.TimeoutError:
+                        writer.write(b": keep-alive\n\n")
+                        await writer.drain()
+        finally:
+            metrics.increment("api.sse_clients", -1)
+
+    def get_metrics(self, query, data):
+        return 200, metrics.snapshot()
+
+
+async def serve(library, player, host, port, messages=list):
+    """Runs the API until Ctrl+C or SIGTERM, printing `messages()` (e.g. songs.txt reloads) as they come."""
+    server = ApiServer(library, player)
+    await server.start(host, port)
+    print(f"🌐 Musicify API listening on http://{host}:{port}")
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass # Windows: Ctrl+C still arrives as KeyboardInterrupt
+    try:
+        while not stopping.is_set(): # Until Ctrl+C or SIGTERM, so the library is saved on the way out
+            for message in messages():
+                print(message)
+            try:
+                await asyncio.wait_for(stopping.wait(), MESSAGE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Musicify HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--null-audio", action="store_true", help="play nothing (tests, headless machines)")
+    parser.add_argument("--track-seconds", type=float, default=None,
+                        help="with --null-audio, how long each silent track lasts")
+    parser.add_argument("--library", help="serve this songs.txt-format file read-only instead of "
+                                          "the normal library (nothing is saved)")
+    args = parser.parse_args()
+
+    from main import open_library
+    from player import load_songs_from_file
+    library = MusicLibrary()
+    if args.library:
+        print(load_songs_from_file(library, args.library))
+        save_library = lambda: "Nothing saved (read-only --library)."
+        library_messages = list
+    else:
+        save_library, library_messages = open_library(library)
+    backend = NullAudioBackend(args.track_seconds) if args.null_audio else None
+    player = AudioPlayer(backend=backend, library=library)
+    try:
+        asyncio.run(serve(library, player, args.host, args.port, library_messages))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(save_library())
+        player.shutdown()
+
+
+if __name__ == "__main__":
+    main()
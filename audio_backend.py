@@ -0,0 +1,146 @@
+"""
+Audio Backend Module
+The sound output used by AudioPlayer. pygame is only imported (and only its
+mixer initialized) when the first song is actually played; machines without
+pygame or without an audio device fall back to a silent backend.
+"""
+
+import os
+import sys
+import time
+
+AUDIO_BACKEND_ENV = "MUSICIFY_AUDIO" # Set to "null" to never touch pygame
+
+
+class NullAudioBackend:
+    """
+    Plays nothing. Used on machines without audio, for library-only tools and
+    in tests. A "playing" track lasts `track_seconds` (None = until stopped).
+    """
+    name = "null"
+
+    def __init__(self, track_seconds=None):
+        self.track_seconds = track_seconds
+        self.loaded = None
+        self.volume = 1.0
+        self._queued = None
+        self._busy_until = 0.0
+
+    def load(self, source, namehint=""):
+        self.loaded = source
+        self._busy_until = 0.0
+
+    def play(self):
+        self._busy_until = float("inf") if self.track_seconds is None else time.perf_counter() + self.track_seconds
+
+    def queue(self, filepath):
+        self._queued = filepath
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def stop(self):
+        self._busy_until = 0.0
+        self._queued = None
+
+    def get_busy(self):
+        return time.perf_counter() < self._busy_until
+
+    @property
+    def reports_end_events(self):
+        return False
+
+    def poll_end_event(self):
+        """True/False if the backend reports track ends as events, None if it must be polled."""
+        return None
+
+    def clear_end_events(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PygameAudioBackend:
+    """
+    pygame.mixer.music output. Importing pygame and opening the mixer happen
+    here, not at program start. Track-end events are used where SDL can deliver
+    them to the playback thread; otherwise the player polls get_busy().
+    """
+    name = "pygame"
+
+    def __init__(self):
+        import pygame # Deferred: only paid for when something is played
+        self._pygame = pygame
+        pygame.mixer.init()
+        self.music = pygame.mixer.music
+        self.end_event = pygame.USEREVENT + 1
+        self.music.set_endevent(self.end_event)
+        self._use_end_event = False
+        # The event queue needs the display subsystem and can only be pumped off
+        # the main thread where SDL allows it (not on macOS).
+        if sys.platform != "darwin":
+            try:
+                pygame.display.init()
+                self._use_end_event = True
+            except pygame.error:
+                pass
+
+    def load(self, source, namehint=""):
+        if namehint:
+            self.music.load(source, namehint)
+        else:
+            self.music.load(source)
+
+    def play(self):
+        self.music.play()
+
+    def queue(self, filepath):
+        self.music.queue(filepath)
+
+    def set_volume(self, volume):
+        self.music.set_volume(volume)
+
+    def stop(self):
+        self.music.stop()
+
+    def get_busy(self):
+        return self.music.get_busy()
+
+    @property
+    def reports_end_events(self):
+        return self._use_end_event
+
+    def poll_end_event(self):
+        if not self._use_end_event:
+            return None
+        try:
+            return bool(self._pygame.event.get(self.end_event))
+        except self._pygame.error:
+            self._use_end_event = False
+            return None
+
+    def clear_end_events(self):
+        if self._use_end_event:
+            try:
+                self._pygame.event.clear(self.end_event)
+            except self._pygame.error:
+                self._use_end_event = False
+
+    def close(self):
+        self._pygame.quit()
+
+
+def create_audio_backend():
+    """
+    Returns the pygame backend, or a NullAudioBackend if MUSICIFY_AUDIO=null,
+    pygame is not installed or no audio device can be opened.
+    """
+    if os.environ.get(AUDIO_BACKEND_ENV, "").lower() == "null":
+        return NullAudioBackend()
+    try:
+        return PygameAudioBackend()
+    except Exception as e:
+        print(f"Error initializing audio player: {e}")
+        print("Playback is disabled. Ensure you have pygame and audio drivers.")
+        return NullAudioBackend()
@@ -3,91 +3,620 @@ Audio Player Module
 Handles actual music playback and the song queue.
 """
 
-import pygame
+import io
+import logging
+import os
+import random
+import threading
 import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import metrics
+from audio_backend import create_audio_backend
+
+ENGINE_POLL_SECONDS = 0.005
+CLIP_MAX_BYTES = 8 * 1024 * 1024 # Files up to this size are kept in memory once read
+CLIP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+GAP_HISTORY = 50
+
+_log = logging.getLogger(__name__)
+
+class _ClipCache:
+    """
+    Small LRU cache holding the bytes of recently read short audio files, so
+    replaying or pre-buffering them never touches the disk at track change.
+    """
+    def __init__(self, max_bytes=CLIP_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._clips = OrderedDict() # Key: filepath, Value: file contents
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, filepath):
+        with self._lock:
+            data = self._clips.get(filepath)
+            if data is not None:
+                self._clips.move_to_end(filepath)
+            return data
+
+    def put(self, filepath, data):
+        with self._lock:
+            old = self._clips.pop(filepath, None)
+            if old is not None:
+                self._size -= len(old)
+            self._clips[filepath] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._clips) > 1:
+                _, evicted = self._clips.popitem(last=False)
+                self._size -= len(evicted)
 
 class AudioPlayer:
     """
     Manages audio playback, including play, stop, and queue.
-    Uses: pygame.mixer
+    Uses: an audio backend (pygame.mixer or silent), threading
+    A background playback thread starts the next queued song as soon as the
+    current one ends, so the queue keeps moving while the menus wait for input.
+    All queue access goes through one lock shared with that thread.
+    While a song plays, the next one is opened and checked by a prefetch worker
+    (short files are cached in memory) and, when end events are available,
+    handed to the backend's queue so it starts without a gap.
+    The backend (and with it pygame) is only created on first playback.
+    With a TrackValidator, songs whose files are known to be broken are skipped
+    instead of loaded, and files that fail to open are reported to it.
+    With an autoplay source (see set_autoplay), the queue is refilled as soon as
+    its last song starts, so playback doesn't stop when it runs dry.
+    With a LoudnessAnalyzer, each track plays at its measured volume; upcoming
+    files it hasn't measured are handed to it while the current one plays.
+    With the MusicLibrary the songs come from, every started track is counted
+    through library.record_play (play counts, rankings, journal).
     """
     
-    def __init__(self):
+    def __init__(self, auto_advance=True, backend=None, validator=None, loudness=None, library=None):
+        """
+        Initialize the queue and the playback thread. `backend` overrides the
+        audio output, e.g. NullAudioBackend() for tests or headless tools.
+        """
+        self._backend = backend
+        self.validator = validator
+        self.loudness = loudness
+        self.library = library
+        self.queue = deque()
+        self.is_playing = False
+        self.current_song = None
+        self._lock = threading.RLock()
+        self._engine = None
+        self._engine_stop = threading.Event()
+        self._engine_wake = threading.Event() # Set when a track starts, so an idle engine stops waiting
+        self._skip_pending = False # A track change failed; the engine moves on to the next song
+        self._clips = _ClipCache()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._prefetched_path = None # Next song's file, as last handed to the prefetcher
+        self._queued_song = None # Song handed to the backend's queue
+        self.track_gaps_ms = deque(maxlen=GAP_HISTORY)
+        self._now_playing_listeners = []
+        self._track_serial = 0 # Bumped on every track start, so a replayed song still counts as a change
+        self._announced = (None, 0)
+        self.autoplay = None
+        self._last_song = None # Last song started, the seed for autoplay after the queue ran dry
+        if auto_advance:
+            self.start_engine()
+
+    # --- Background playback engine ---
+    def start_engine(self):
+        """
+        Starts the playback thread (once).
+        """
+        if self._engine is not None:
+            return
+        self._engine_stop.clear()
+        self._engine = threading.Thread(target=self._run_engine, name="playback-engine", daemon=True)
+        self._engine.start()
+
+    def shutdown(self):
+        """
+        Stops the playback and prefetch threads and closes the audio backend.
+        """
+        self._prefetcher.shutdown(wait=True, cancel_futures=True)
+        if self._engine is not None:
+            self._engine_stop.set()
+            self._engine_wake.set()
+            self._engine.join()
+            self._engine = None
+        if self._backend is not None:
+            self._backend.close()
+
+    @property
+    def backend(self):
+        """
+        The audio backend, created (importing pygame) on first use.
+        """
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = create_audio_backend()
+        return self._backend
+
+    def add_now_playing_listener(self, callback):
+        """
+        Registers callback(song) to run whenever the current song changes
+        (song is None when playback stops). It runs on the thread that made the
+        change, with the player's lock held, so it must be quick.
+        """
+        self._now_playing_listeners.append(callback)
+
+    def remove_now_playing_listener(self, callback):
+        self._now_playing_listeners.remove(callback)
+
+    def _announce_now_playing(self):
+        """Tells the listeners if the current song changed since the last call. Caller holds the lock."""
+        state = (self.current_song, self._track_serial if self.current_song is not None else 0)
+        if state[0] is self._announced[0] and state[1] == self._announced[1]:
+            return
+        self._announced = state
+        for callback in list(self._now_playing_listeners):
+            try:
+                callback(self.current_song)
+            except Exception:
+                metrics.increment("audio.listener_errors")
+                _log.exception("Now-playing listener failed")
+
+    def set_autoplay(self, source):
         """
-        Initialize the pygame mixer and the queue.
+        Sets source(last_song) -> list of songs, called (with the player's lock
+        held) to refill the queue when it runs out; None turns autoplay off.
         """
+        with self._lock:
+            self.autoplay = source
+            self._prefetch_next()
+
+    def _refill_from_autoplay(self):
+        """Queues the autoplay source's next songs if the queue is empty. Caller holds the lock. Returns how many."""
+        seed = self.current_song or self._last_song
+        if self.autoplay is None or self.queue or seed is None:
+            return 0
         try:
-            pygame.mixer.init()
-            print("AudioPlayer initialized successfully.")
-        except Exception as e:
-            print(f"Error initializing audio player: {e}")
-            print("Playback may not work. Ensure you have audio drivers.")
-            
-        self.queue = []
+            songs = [song for song in self.autoplay(seed) if not self._broken_reason(song)]
+        except Exception:
+            metrics.increment("audio.autoplay_errors")
+            return 0
+        self.queue.extend(songs)
+        metrics.increment("audio.autoplay_songs", len(songs))
+        return len(songs)
+
+    def _track_finished(self):
+        if self._backend is None:
+            return False # Nothing has ever been played
+        ended = self._backend.poll_end_event()
+        if ended is not None:
+            return ended
+        return self.is_playing and not self._backend.get_busy()
+
+    def _clear_end_events(self):
+        # A stop() or a replaced track also reports an end; drop those so the
+        # engine doesn't skip the song that is about to start.
+        if self._backend is not None:
+            self._backend.clear_end_events()
+
+    def _run_engine(self):
+        while not self._engine_stop.is_set():
+            with self._lock:
+                idle = not self.is_playing and not self._skip_pending
+                if idle:
+                    self._engine_wake.clear()
+            if idle:
+                # Nothing can end until a track starts; that sets the event.
+                self._engine_wake.wait()
+                continue
+            if self._engine_stop.wait(ENGINE_POLL_SECONDS):
+                return
+            with self._lock:
+                try:
+                    finished = self._skip_pending or self._track_finished()
+                except Exception:
+                    # The backend went away (e.g. pygame.quit()); nothing left to drive.
+                    metrics.increment("audio.engine_errors")
+                    _log.exception("Audio backend failed; playback engine stopped")
+                    return
+                if not finished:
+                    continue
+                self._skip_pending = False
+                try:
+                    self._advance(time.perf_counter())
+                except Exception:
+                    # Drop the song that failed (it is already off the queue) and go on with the next.
+                    metrics.increment("audio.engine_errors")
+                    _log.exception("Playback engine failed to change tracks; skipping a song")
+                    self._drop_current_song()
+
+    def _advance(self, ended_at):
+        """Starts whatever follows the track that just ended. Caller holds the lock."""
+        if self._take_over_queued_song():
+            self._record_gap(ended_at)
+            self._announce_now_playing()
+            return
         self.is_playing = False
-            
+        self.current_song = None
+        # Skip over songs that fail to load instead of stalling.
+        while self.queue and self._start_next_song() is not None:
+            pass
+        if self.is_playing:
+            self._record_gap(ended_at)
+        self._announce_now_playing()
+
+    def _drop_current_song(self):
+        """After an unexpected error: stops the track and lets the engine start the next one. Caller holds the lock."""
+        self.is_playing = False
+        self.current_song = None
+        self._queued_song = None
+        self._prefetched_path = None
+        try:
+            if self._backend is not None:
+                self._backend.stop()
+            self._clear_end_events()
+        except Exception:
+            pass # The next poll finds out if the backend is gone
+        self._skip_pending = bool(self.queue)
+
+    def _count_play(self, song):
+        """Increments the play count. A failure there (e.g. writing the journal) doesn't stop playback."""
+        try:
+            if self.library is not None:
+                self.library.record_play(song)
+            else:
+                song.play()
+        except Exception:
+            metrics.increment("audio.play_count_errors")
+            _log.exception("Could not record a play of '%s'", song.title)
+
+    def _take_over_queued_song(self):
+        """
+        After a track ended: if the backend already started the song we queued
+        with it, adopt it as the current song. Returns True if it did.
+        """
+        queued, self._queued_song = self._queued_song, None
+        if queued is None or not self.backend.get_busy():
+            return False
+        if self.queue and self.queue[0] is queued:
+            self.queue.popleft()
+            metrics.increment("audio.tracks_started")
+            metrics.increment("audio.gapless_handoffs")
+            # The backend started it at the previous track's volume; correct that now.
+            self._apply_volume(queued)
+            self._count_play(queued)
+            self._track_serial += 1
+            self.current_song = self._last_song = queued
+            self.is_playing = True
+            self._prefetched_path = None
+            self._prefetch_next()
+            return True
+        # The queue changed after we handed that song to the backend; don't play it.
+        self.backend.stop()
+        self._clear_end_events()
+        return False
+
+    def _record_gap(self, ended_at):
+        gap_ms = (time.perf_counter() - ended_at) * 1000
+        self.track_gaps_ms.append(gap_ms)
+        metrics.observe_ms("audio.track_gap", gap_ms)
+
+    def get_gap_report(self):
+        """
+        Returns a summary of how long the player took to start each next track.
+        """
+        gaps = list(self.track_gaps_ms)
+        if not gaps:
+            return "No track changes measured yet."
+        return (f"Track change gap over last {len(gaps)}: last {gaps[-1]:.1f} ms, "
+                f"avg {sum(gaps) / len(gaps):.1f} ms, max {max(gaps):.1f} ms")
+
+    # --- Pre-buffering ---
+    def _prefetch_next(self):
+        """
+        Starts preparing the song at the front of the queue while the current one
+        plays. Caller holds the lock. Safe to call after any queue change.
+        """
+        if not self.queue and self.is_playing:
+            self._refill_from_autoplay()
+        metrics.set_gauge("audio.queue_depth", len(self.queue))
+        if not self.queue or not self.is_playing:
+            return
+        filepath = self.queue[0].filepath
+        if filepath == self._prefetched_path:
+            return
+        self._prefetched_path = filepath
+        try:
+            future = self._prefetcher.submit(self._read_ahead, filepath)
+        except RuntimeError:
+            return # Shut down
+        future.add_done_callback(lambda done: self._prefetch_done(filepath, done))
+
+    def _read_ahead(self, filepath):
+        """
+        Prefetch worker: opens the file so a missing or unreadable one is known
+        before it is due, and keeps short files in memory. Returns True if usable.
+        """
+        if self.loudness is not None:
+            self.loudness.schedule(filepath)
+        if self._clips.get(filepath) is not None:
+            return True
+        try:
+            size = os.path.getsize(filepath)
+            with open(filepath, 'rb') as file:
+                if size <= CLIP_MAX_BYTES:
+                    self._clips.put(filepath, file.read())
+                else:
+                    file.read(64 * 1024) # Warm the start of the file
+        except OSError as e:
+            metrics.increment("audio.prefetch_failures")
+            if self.validator is not None:
+                self.validator.mark_broken(filepath, f"cannot open file ({e.strerror})")
+            return False
+        return True
+
+    def _prefetch_done(self, filepath, future):
+        if future.cancelled() or not future.result():
+            return
+        with self._lock:
+            if not (self.is_playing and self.queue and self.queue[0].filepath == filepath):
+                return
+            # Only backends that report track ends can tell us the queued song started.
+            if not self.backend.reports_end_events:
+                return
+            try:
+                self.backend.queue(filepath)
+                self._queued_song = self.queue[0]
+            except Exception:
+                self._queued_song = None
+
+    def _load(self, filepath):
+        data = self._clips.get(filepath)
+        if data is None:
+            metrics.increment("audio.clip_cache_misses")
+            self.backend.load(filepath)
+            return
+        metrics.increment("audio.clip_cache_hits")
+        extension = os.path.splitext(filepath)[1].lstrip(".").lower()
+        self.backend.load(io.BytesIO(data), extension)
+
+    def _apply_volume(self, song):
+        """Sets the backend to the song's measured volume: a cache lookup, no analysis."""
+        if self.loudness is not None:
+            volume = self.loudness.volume(song.filepath)
+            self.backend.set_volume(volume)
+            metrics.set_gauge("audio.track_volume", volume)
+
+    def _broken_reason(self, song):
+        return self.validator.problem(song.filepath) if self.validator is not None else None
+
+    # --- Queue ---
     def play_now(self, song):
         """
         Clears the queue, adds this song, and plays it immediately.
         """
-        self.queue = [] # Clear the queue
-        self.queue.append(song)
-        self.play_next_from_queue()
+        with self._lock:
+            self.queue.clear() # Clear the queue
+            self.queue.append(song)
+            self.play_next_from_queue()
         
     def add_to_queue(self, song):
         """
         Adds a song to the end of the queue.
         """
-        self.queue.append(song)
+        problem = self._broken_reason(song)
+        if problem:
+            print(f"⚠️ '{song.title}' not queued: {problem}.")
+            return
+        with self._lock:
+            self.queue.append(song)
+            self._prefetch_next()
+            self._start_if_idle()
         print(f"✅ Added '{song.title}' to queue.")
 
-    def play_next_from_queue(self):
+    def add_many_to_queue(self, songs):
         """
-        Plays the next song in the queue.
-        If a song is already playing, it does nothing.
-        If the queue is empty, it stops.
+        Adds several songs (e.g. a whole genre) to the end of the queue.
         """
-        # 1. Don't interrupt a song that is already playing
-        if self.is_playing and pygame.mixer.music.get_busy():
-            print("(Music is already playing.)")
-            return
+        broken = 0
+        if self.validator is not None:
+            playable = [song for song in songs if not self._broken_reason(song)]
+            broken = len(songs) - len(playable)
+            songs = playable
+        with self._lock:
+            before = len(self.queue)
+            self.queue.extend(songs)
+            added = len(self.queue) - before
+            self._prefetch_next()
+            self._start_if_idle()
+        print(f"✅ Added {added} songs to queue.")
+        if broken:
+            print(f"⚠️ Skipped {broken} songs with missing or unreadable files.")
 
-        # 2. Check if the queue is empty
-        if len(self.queue) == 0:
-            self.is_playing = False
-            print("Queue is empty.")
+    def play_after_current(self, song):
+        """
+        Puts a song at the front of the queue so it plays next.
+        """
+        with self._lock:
+            self.queue.appendleft(song)
+            self._prefetch_next()
+            self._start_if_idle()
+        print(f"✅ '{song.title}' will play next.")
+
+    def remove_from_queue(self, position):
+        """
+        Removes the song at a 1-based queue position. Returns it, or None.
+        """
+        with self._lock:
+            if not 1 <= position <= len(self.queue):
+                print("❌ Invalid queue position.")
+                return None
+            song = self.queue[position - 1]
+            del self.queue[position - 1]
+            self._prefetch_next()
+        print(f"✅ Removed '{song.title}' from queue.")
+        return song
+
+    def move_in_queue(self, from_position, to_position):
+        """
+        Moves the song at one 1-based queue position to another.
+        """
+        with self._lock:
+            if not (1 <= from_position <= len(self.queue) and 1 <= to_position <= len(self.queue)):
+                print("❌ Invalid queue position.")
+                return
+            song = self.queue[from_position - 1]
+            del self.queue[from_position - 1]
+            self.queue.insert(to_position - 1, song)
+            self._prefetch_next()
+        print(f"✅ Moved '{song.title}' to position {to_position}.")
+
+    def shuffle_queue(self):
+        """
+        Shuffles the queue in place (Fisher-Yates, O(n)).
+        """
+        with self._lock:
+            songs = list(self.queue)
+            random.shuffle(songs)
+            self.queue = deque(songs)
+            self._prefetch_next()
+        print("🔀 Queue shuffled.")
+
+    # --- Playback ---
+    def _start_if_idle(self):
+        """
+        Starts the queue if nothing is playing (the engine only moves on when a
+        track ends). Caller holds the lock.
+        """
+        if self.is_playing or self._skip_pending or not self.queue:
             return
+        # Skip over songs that fail to load, as the engine does.
+        try:
+            while self.queue and self._start_next_song() is not None:
+                pass
+        except Exception:
+            metrics.increment("audio.engine_errors")
+            _log.exception("Could not start the queue; skipping a song")
+            self._drop_current_song()
+            self._engine_wake.set() # The engine moves on to the next song
+        self._announce_now_playing()
 
-        # 3. Pop the next song and play it
-        song = self.queue.pop(0) # Get the first song
-        
+    def _start_next_song(self):
+        """
+        Pops the next song and starts it. Caller holds the lock.
+        Returns None on success, or an error message.
+        """
+        song = self.queue.popleft() # Get the first song
+        metrics.set_gauge("audio.queue_depth", len(self.queue))
+        problem = self._broken_reason(song)
+        if problem:
+            self.is_playing = False
+            self.current_song = None
+            metrics.increment("audio.skipped_broken")
+            return f"⏭️ Skipped '{song.title}': {problem}"
+        start = time.perf_counter()
         try:
-            pygame.mixer.music.load(song.filepath)
-            pygame.mixer.music.play()
-            song.play() # This increments the play count
-            self.is_playing = True
-            print(f"▶️ Now playing: {song.title}")
+            self._load(song.filepath)
+            self._clear_end_events()
+            self.backend.play()
+            self._apply_volume(song) # After play(): pygame resets the volume when music is loaded
         except Exception as e:
-            print(f"❌ Error playing file {song.filepath}: {e}")
             self.is_playing = False
+            self.current_song = None
+            metrics.increment("audio.play_errors")
+            if self.validator is not None:
+                self.validator.mark_broken(song.filepath, f"failed to load ({e})")
+            return f"❌ Error playing file {song.filepath}: {e}"
+        metrics.observe_ms("audio.load_to_play", (time.perf_counter() - start) * 1000)
+        metrics.increment("audio.tracks_started")
+        self._count_play(song)
+        self._track_serial += 1
+        self.is_playing = True
+        self._engine_wake.set()
+        self.current_song = self._last_song = song
+        self._queued_song = None
+        self._prefetched_path = None
+        self._prefetch_next()
+        return None
+
+    def play_next_from_queue(self):
+        """
+        Plays the next song in the queue.
+        If a song is already playing, it does nothing.
+        If the queue is empty (and autoplay has nothing to add), it stops.
+        """
+        with self._lock:
+            # 1. Don't interrupt a song that is already playing
+            if self.is_playing and self.backend.get_busy():
+                print("(Music is already playing.)")
+                return
+
+            # 2. Check if the queue is empty (autoplay may refill it)
+            if len(self.queue) == 0:
+                added = self._refill_from_autoplay()
+                if not added:
+                    self.is_playing = False
+                    print("Queue is empty.")
+                    return
+                print(f"📻 Radio queued {added} songs like '{self._last_song.title}'.")
+
+            # 3. Pop the next song and play it, skipping any that can't be played
+            error = self._start_next_song()
+            while error and self.queue:
+                print(error)
+                error = self._start_next_song()
+            self._announce_now_playing()
+            if error:
+                print(error)
+            else:
+                print(f"▶️ Now playing: {self.current_song.title}")
             
     def stop(self):
         """
         Stops the music and clears the entire queue.
         """
-        self.queue = []
-        pygame.mixer.music.stop()
-        self.is_playing = False
+        with self._lock:
+            self.queue.clear()
+            if self._backend is not None:
+                self._backend.stop()
+            self._clear_end_events()
+            self.is_playing = False
+            self.current_song = None
+            self._queued_song = None
+            self._prefetched_path = None
+            self._announce_now_playing()
+        metrics.set_gauge("audio.queue_depth", 0)
         print("⏹️ Music stopped and queue cleared.")
 
-    def get_queue_display(self):
+    def get_now_playing(self):
+        """
+        Returns a one-line description of the song that is playing.
         """
-        Returns a formatted string of songs currently in the queue.
+        song = self.current_song
+        if song is None:
+            return "⏸️ Nothing playing."
+        return f"▶️ Now playing: {song.get_info()}"
+
+    def get_queue_window(self, start=0, limit=20):
         """
-        if not self.queue:
+        Returns (queue length, list of at most `limit` songs from position
+        `start`, 0-based) as one consistent snapshot.
+        """
+        with self._lock:
+            return len(self.queue), list(islice(self.queue, start, start + limit))
+
+    def get_queue_display(self, start=0, limit=20):
+        """
+        Returns a formatted string of the songs in the queue, starting at
+        position `start` (0-based) and showing at most `limit` of them.
+        """
+        queue_length, window = self.get_queue_window(start, limit)
+        if not queue_length:
             return "Queue is empty."
-            
-        result = "--- 🎵 Current Queue ---\n"
-        for i, song in enumerate(self.queue, 1):
-            result += f"{i}. {song.get_info()}\n"
+
+        lines = [f"{i}. {song.get_info()}" for i, song in enumerate(window, start + 1)]
+        result = "--- 🎵 Current Queue ---\n" + "\n".join(lines) + "\n"
+        hidden = queue_length - start - len(lines)
+        if hidden > 0:
+            result += f"... and {hidden} more ({queue_length} songs in queue)\n"
         return result
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Library Benchmark
+Times the library, persistence and queue hot paths on synthetic catalogs
+(1k, 100k and 1M songs by default) and writes the results as JSON, so a run
+can be compared against an earlier one to catch regressions.
+
+Usage:
+    python benchmarks/bench_library.py [--sizes 1000,100000] [--repeat 3] [--output run.json]
+    python benchmarks/bench_library.py --baseline old.json    # run, then compare with old.json
+    python benchmarks/bench_library.py --compare old.json new.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_backend import NullAudioBackend
+from audio_player import AudioPlayer
+from music_library import MusicLibrary
+from player import load_songs_from_file, save_songs_to_file
+
+DEFAULT_SIZES = (1000, 100_000, 1_000_000)
+LOOKUPS = 1000 # get_song hits and misses per run
+SEARCHES = 100
+RENAMES = 200
+QUEUE_SONGS = 5000
+GENRES = ["Rock", "Pop", "Indie", "Hardcore", "Jazz", "Blues", "Metal", "Folk", "Soul", "Funk",
+          "Punk", "Emo", "Ambient", "House", "Techno", "Disco", "Reggae", "Country", "Classical", "Rap"]
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "to", "vel", "dor", "an", "qu", "is", "ber", "na", "ti", "ol"]
+
+
+def _word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_rows(size, seed):
+    """Returns `size` deterministic (title, artist, duration, genre, filepath) rows."""
+    rng = random.Random(seed)
+    artists = [f"{_word(rng)} {_word(rng)}" for _ in range(max(size // 10, 1))]
+    rows = []
+    for number in range(size):
+        title = f"{_word(rng)} {_word(rng)} {number}"
+        artist = rng.choice(artists)
+        rows.append((title, artist, rng.randint(60, 600), rng.choice(GENRES), f"/music/{artist}/{title}.mp3"))
+    return rows
+
+
+def write_songs_file(rows, filename):
+    with open(filename, "w", encoding="utf-8") as file:
+        file.write("TITLE|ARTIST|DURATION|GENRE|FILEPATH\n")
+        for title, artist, duration, genre, filepath in rows:
+            file.write(f"{title}|{artist}|{duration}|{genre}|{filepath}\n")
+
+
+def timed(function, repeat, setup=None):
+    """Median wall time of `function(state)` over `repeat` runs; setup() builds a fresh state."""
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(state)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_size(size, repeat, seed, workdir):
+    rows = make_rows(size, seed)
+    songs_file = os.path.join(workdir, f"songs_{size}.txt")
+    write_songs_file(rows, songs_file)
+    rng = random.Random(seed + 1)
+    results = {}
+
+    def record(name, seconds, ops=1):
+        results[name] = {"seconds": seconds, "ops": ops, "per_op_us": seconds / ops * 1e6}
+
+    def loaded():
+        library = MusicLibrary()
+        load_songs_from_file(library, songs_file)
+        return library
+
+    record("load_songs_from_file", timed(lambda library: load_songs_from_file(library, songs_file),
+                                         repeat, MusicLibrary), size)
+    library = loaded()
+    save_file = os.path.join(workdir, f"save_{size}.txt")
+    record("save_songs_to_file", timed(lambda _: save_songs_to_file(library, save_file), repeat), size)
+
+    hits = [rng.choice(rows)[0] for _ in range(LOOKUPS)]
+    misses = [f"zz{_word(rng).lower()}" for _ in range(LOOKUPS)]
+    record("get_song_hit", timed(lambda _: [library.get_song(title) for title in hits], repeat), LOOKUPS)
+    record("get_song_prefix_miss", timed(lambda _: [library.get_song(text) for text in misses], repeat), LOOKUPS)
+
+    artist_queries = [rng.choice(rows)[1].split()[0][:4] for _ in range(SEARCHES)]
+    genre_queries = [rng.choice(GENRES)[:3] for _ in range(SEARCHES)]
+    record("search_by_artist", timed(lambda _: [library.search_by_artist(q) for q in artist_queries],
+                                     repeat), SEARCHES)
+    record("search_by_genre", timed(lambda _: [library.search_by_genre(q) for q in genre_queries],
+                                    repeat), SEARCHES)
+    record("get_sorted_song_list", timed(lambda _: library.get_sorted_song_list(), repeat), size)
+    record("show_all_songs", timed(lambda _: library.show_all_songs(), repeat), size)
+
+    def rename_all(library):
+        for number, title in enumerate(renamed):
+            library.edit_song(library.get_song(title), "title", f"{title} (Remix {number})")
+
+    renamed = [rows[index][0] for index in rng.sample(range(size), min(RENAMES, size))]
+    record("edit_song_rename", timed(rename_all, repeat, loaded), len(renamed))
+
+    def churn(player):
+        queue_rng = random.Random(seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            player.add_many_to_queue(queue_songs)
+            player.play_next_from_queue()
+            for _ in range(QUEUE_SONGS // 10):
+                length = len(player.queue)
+                player.move_in_queue(queue_rng.randint(1, length), queue_rng.randint(1, length))
+                player.play_after_current(player.remove_from_queue(queue_rng.randint(1, length)))
+            player.shuffle_queue()
+            player.stop()
+        player.shutdown()
+
+    queue_songs = [library.get_song(row[0]) for row in rows[:QUEUE_SONGS]]
+    record("queue_churn", timed(churn, repeat,
+                                lambda: AudioPlayer(auto_advance=False, backend=NullAudioBackend())),
+           QUEUE_SONGS // 10 * 2)
+    return results
+
+
+def run(sizes, repeat, seed):
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "seed": seed, "repeat": repeat, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"Benchmarking {size} songs...", file=sys.stderr)
+            report["results"][str(size)] = bench_size(size, repeat, seed, workdir)
+    return report
+
+
+def compare(baseline, current, threshold, out=sys.stdout):
+    """Prints old vs new times per benchmark. Returns the number of regressions."""
+    regressions = 0
+    print(f"{'size':>8}  {'benchmark':<22} {'baseline':>12} {'current':>12} {'change':>8}", file=out)
+    for size, benches in current["results"].items():
+        for name, result in benches.items():
+            old = baseline["results"].get(size, {}).get(name)
+            if old is None:
+                continue
+            ratio = result["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  ⚠️ slower"
+                regressions += 1
+            print(f"{size:>8}  {name:<22} {old['seconds'] * 1000:10.2f}ms {result['seconds'] * 1000:10.2f}ms "
+                  f"{(ratio - 1) * 100:+7.1f}%{flag}", file=out)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated catalog sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (median is kept)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="only compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown ratio reported as a regression (default 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as old_file, open(args.compare[1]) as new_file:
+            return 1 if compare(json.load(old_file), json.load(new_file), args.threshold) else 0
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    report = run(sizes, args.repeat, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline["meta"].get("seed") != args.seed:
+            print("⚠️ Baseline used a different seed; results are not directly comparable.", file=sys.stderr)
+        # Keep stdout pure JSON when the results are printed there.
+        out = sys.stdout if args.output else sys.stderr
+        return 1 if compare(baseline, report, args.threshold, out) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+API Load Test
+Hammers api_server.py with many concurrent keep-alive clients and reports
+requests per second and latency percentiles, overall and per endpoint.
+
+By default a server is started in a subprocess with a silent audio backend
+and a generated library; pass --url to test a server that is already running.
+
+Usage: python benchmarks/load_test.py [--clients 50] [--seconds 10] [--songs 10000] [--url 127.0.0.1:8765]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_library import make_rows, write_songs_file
+
+# (weight, name, method, path template, body) -- {title} and {word} are filled in per request.
+REQUEST_MIX = [
+    (30, "get_song", "GET", "/songs/{title}", None),
+    (20, "list_songs", "GET", "/songs?start={start}&limit=20", None),
+    (15, "search_artist", "GET", "/songs?artist={word}&limit=20", None),
+    (10, "fuzzy_search", "GET", "/songs?q={word}&limit=10", None),
+    (10, "now_playing", "GET", "/now-playing?timeout=0", None),
+    (8, "queue_add", "POST", "/queue", {"title": "{title}"}),
+    (5, "get_queue", "GET", "/queue?limit=20", None),
+    (2, "queue_remove", "DELETE", "/queue/1", None),
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _request(reader, writer, method, path, body):
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(host, port, deadline, rows, rng, samples, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    weights = [entry[0] for entry in REQUEST_MIX]
+    try:
+        while time.perf_counter() < deadline:
+            _, name, method, template, body = rng.choices(REQUEST_MIX, weights)[0]
+            row = rng.choice(rows)
+            fill = {"title": row[0].replace(" ", "%20"), "word": row[1].split()[0][:4],
+                    "start": rng.randrange(max(len(rows) - 20, 1))}
+            path = template.format(**fill)
+            if body is not None:
+                body = {key: value.format(title=row[0]) for key, value in body.items()}
+            start = time.perf_counter()
+            status = await _request(reader, writer, method, path, body)
+            samples.setdefault(name, []).append(time.perf_counter() - start)
+            if status >= 500 or (status >= 400 and name not in ("queue_remove",)):
+                errors[name] = errors.get(name, 0) + 1
+    finally:
+        writer.close()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def _summary(latencies, seconds):
+    return {"requests": len(latencies), "rps": len(latencies) / seconds,
+            "p50_ms": _percentile(latencies, 0.50) * 1000, "p99_ms": _percentile(latencies, 0.99) * 1000,
+            "mean_ms": statistics.fmean(latencies) * 1000}
+
+
+async def run_load(host, port, clients, seconds, rows, seed):
+    samples = {}
+    errors = {}
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, deadline, rows, random.Random(seed + number), samples, errors)
+                           for number in range(clients)))
+    elapsed = time.perf_counter() - started
+    all_latencies = [value for values in samples.values() for value in values]
+    return {"clients": clients, "seconds": elapsed, "errors": errors,
+            "overall": _summary(all_latencies, elapsed),
+            "endpoints": {name: _summary(values, elapsed) for name, values in sorted(samples.items())}}
+
+
+def _start_server(songs_file, port):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "api_server.py"), "--port", str(port),
+                               "--null-audio", "--track-seconds", "0.5", "--library", songs_file],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("API server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for api_server.py")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--songs", type=int, default=10_000, help="size of the generated library")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="host:port of a running server (its library should be the "
+                                      "generated one for the same --songs and --seed)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    rows = make_rows(args.songs, args.seed)
+    server = None
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            host, _, port = args.url.rpartition(":")
+            port = int(port)
+        else:
+            songs_file = os.path.join(workdir, "songs.txt")
+            write_songs_file(rows, songs_file)
+            host, port = "127.0.0.1", _free_port()
+            server = _start_server(songs_file, port)
+        try:
+            result = asyncio.run(run_load(host, port, args.clients, args.seconds, rows, args.seed))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    overall = result["overall"]
+    print(f"{args.clients} clients, {result['seconds']:.1f}s: {overall['requests']} requests, "
+          f"{overall['rps']:.0f} req/s, p50 {overall['p50_ms']:.2f} ms, p99 {overall['p99_ms']:.2f} ms")
+    for name, summary in result["endpoints"].items():
+        print(f"  {name:<14} {summary['requests']:>7} req  {summary['rps']:8.0f} req/s  "
+              f"p50 {summary['p50_ms']:7.2f} ms  p99 {summary['p99_ms']:7.2f} ms")
+    if result["errors"]:
+        print(f"⚠️ Errors: {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Startup Benchmark
+Measures how long Musicify takes to get to the main menu (import main, create
+the library and player, load songs.txt) in fresh interpreters, and separately
+how long the first playback takes to bring up the audio backend.
+
+Usage: python benchmarks/startup_benchmark.py [runs] [songs file]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+from music_library import MusicLibrary
+from audio_player import AudioPlayer
+from player import load_songs_from_file
+library = MusicLibrary()
+player = AudioPlayer()
+load_songs_from_file(library, {songs_file!r})
+ready = time.perf_counter()
+player.backend
+backend_ready = time.perf_counter()
+player.shutdown()
+print(ready - start, backend_ready - ready, player.backend.name)
+"""
+
+
+def run_once(songs_file, env):
+    output = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET.format(songs_file=songs_file)],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    startup, backend, name = output.strip().splitlines()[-1].split()
+    return float(startup), float(backend), name
+
+
+def measure(label, runs, songs_file, extra_env):
+    env = dict(os.environ, **extra_env)
+    results = [run_once(songs_file, env) for _ in range(runs)]
+    startup_ms = statistics.median(result[0] for result in results) * 1000
+    backend_ms = statistics.median(result[1] for result in results) * 1000
+    print(f"{label:<10} startup {startup_ms:8.1f} ms   first playback backend ({results[0][2]}) {backend_ms:8.1f} ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    songs_file = os.path.abspath(sys.argv[2]) if len(sys.argv) > 2 else os.path.join(ROOT, "songs.txt")
+    print(f"Median of {runs} runs, songs file: {songs_file}")
+    measure("default", runs, songs_file, {})
+    measure("headless", runs, songs_file, {"MUSICIFY_AUDIO": "null"})
+
+
+if __name__ == "__main__":
+    main()
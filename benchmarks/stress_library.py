@@ -0,0 +1,208 @@
+"""
+Library Stress Test
+Runs many reader and writer threads against one MusicLibrary and checks that
+readers only ever see consistent states (a renamed song is there under exactly
+one of its titles, listings are sorted without duplicates, search results
+match their query) and that the indexes, genre list and play rankings agree
+with the songs once the writers stop.
+
+Usage: python benchmarks/stress_library.py [--songs 20000] [--readers 8] [--writers 4] [--seconds 10]
+Exits with status 1 if any check failed.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import metrics
+from bench_library import GENRES, make_rows
+from music_library import MusicLibrary
+
+TWINS_PER_WRITER = 20 # Songs each writer keeps renaming between two titles
+
+
+def _twin_titles(writer, number):
+    return f"Twin {writer}-{number} A", f"Twin {writer}-{number} B"
+
+
+class Failures:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.messages = []
+
+    def add(self, message):
+        with self._lock:
+            if len(self.messages) < 20:
+                self.messages.append(message)
+            else:
+                self.messages[-1] = f"... and more ({message})"
+
+
+def writer(library, number, rows, deadline, rng, failures, counts):
+    twins = [_twin_titles(number, twin) for twin in range(TWINS_PER_WRITER)]
+    added = []
+    ops = 0
+    try:
+        while time.perf_counter() < deadline:
+            action = rng.random()
+            if action < 0.25:
+                a, b = rng.choice(twins)
+                song = library.all_songs.get(a.lower()) or library.all_songs.get(b.lower())
+                library.edit_song(song, "title", b if song.title == a else a)
+            elif action < 0.40:
+                title = f"Added {number}-{ops}"
+                library.add_song(title, rng.choice(rows)[1], rng.randint(60, 600), rng.choice(GENRES), "/x.mp3")
+                added.append(title)
+            elif action < 0.50 and added:
+                library.delete_song(added.pop(rng.randrange(len(added))))
+            elif action < 0.60:
+                batch = [(f"Bulk {number}-{ops}-{i}", rng.choice(rows)[1], rng.randint(60, 600),
+                          rng.choice(GENRES), "/x.mp3") for i in range(20)]
+                library.add_songs_bulk(batch)
+                added.extend(row[0] for row in batch)
+            elif action < 0.75:
+                song = library.get_song(rng.choice(rows)[0])
+                field, value = rng.choice([("genre", rng.choice(GENRES) + rng.choice(["", " Revival"])),
+                                           ("artist", rng.choice(rows)[1]),
+                                           ("duration", str(rng.randint(60, 600)))])
+                library.edit_song(song, field, value)
+            else:
+                library.record_play(library.get_song(rng.choice(rows)[0]))
+            ops += 1
+    except Exception:
+        failures.add(f"writer {number} crashed:\n{traceback.format_exc()}")
+    counts[f"writer {number}"] = ops
+
+
+def reader(library, number, rows, writers, deadline, rng, failures, counts):
+    twins = [_twin_titles(w, twin) for w in range(writers) for twin in range(TWINS_PER_WRITER)]
+    ops = 0
+    try:
+        while time.perf_counter() < deadline:
+            action = rng.random()
+            if action < 0.15:
+                # A listing must be sorted, without duplicates, and hold each twin exactly once.
+                songs = library.get_sorted_song_list()
+                keys = [song.title.lower() for song in songs]
+                if keys != sorted(set(keys)):
+                    failures.add(f"reader {number}: listing not sorted or has duplicates")
+                present = set(keys)
+                for a, b in twins:
+                    if (a.lower() in present) == (b.lower() in present):
+                        failures.add(f"reader {number}: twin '{a}' seen under {'both' if a.lower() in present else 'neither'} titles")
+            elif action < 0.35:
+                genre = rng.choice(GENRES)
+                for song in library.search_by_genre(genre):
+                    if genre.lower() not in song.genre.lower():
+                        failures.add(f"reader {number}: genre search '{genre}' returned {song.genre}")
+            elif action < 0.55:
+                text = rng.choice(rows)[1].split()[0][:4].lower()
+                low = rng.randint(60, 400)
+                for song in library.query(artist=text, min_duration=low, max_duration=low + 120, limit=50):
+                    if text not in song.artist.lower() or not low <= int(song.duration) <= low + 120:
+                        failures.add(f"reader {number}: query returned {song.get_info()}")
+            elif action < 0.70:
+                a, b = rng.choice(twins)
+                if library.get_song(a) is None and library.get_song(b) is None:
+                    failures.add(f"reader {number}: twin '{a}' not found under either title")
+            elif action < 0.80:
+                library.fuzzy_search(rng.choice(rows)[0][:8], limit=5)
+            elif action < 0.90:
+                counts_seen = [song.get_play_count() for song in library.top_played(10)]
+                if counts_seen != sorted(counts_seen, reverse=True):
+                    failures.add(f"reader {number}: top played out of order {counts_seen}")
+            else:
+                genres = library.get_all_genres()
+                if genres != sorted(set(genres)):
+                    failures.add(f"reader {number}: genre list not sorted or has duplicates")
+            ops += 1
+    except Exception:
+        failures.add(f"reader {number} crashed:\n{traceback.format_exc()}")
+    counts[f"reader {number}"] = ops
+
+
+def check_final_state(library, failures):
+    """With no writers left, every index must agree with a plain scan of the songs."""
+    songs = dict(library.all_songs)
+    if library._sorted_keys != sorted(songs):
+        failures.add("final: sorted keys do not match the songs")
+    genres = {song.genre for song in songs.values()}
+    if library.genres != genres:
+        failures.add(f"final: genres {sorted(library.genres ^ genres)} out of sync")
+    for genre in GENRES:
+        expected = {key for key, song in songs.items() if genre.lower() in song.genre.lower()}
+        if {song.title.lower() for song in library.search_by_genre(genre)} != expected:
+            failures.add(f"final: genre search '{genre}' does not match a scan")
+    expected = sorted((int(song.duration), key) for key, song in songs.items() if 200 <= int(song.duration) <= 260)
+    found = library.query(min_duration=200, max_duration=260, order_by="duration")
+    if [(int(song.duration), song.title.lower()) for song in found] != expected:
+        failures.add("final: duration query does not match a scan")
+    top = [song.get_play_count() for song in library.top_played(20)]
+    expected = sorted((song.get_play_count() for song in songs.values() if song.get_play_count()), reverse=True)[:20]
+    if top != expected:
+        failures.add(f"final: top played {top} != {expected}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency stress test for MusicLibrary")
+    parser.add_argument("--songs", type=int, default=20_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = make_rows(args.songs, args.seed)
+    library = MusicLibrary()
+    library.add_songs_bulk(rows)
+    library.add_songs_bulk([(title, "Twin Artist", 200, "Rock", "/twin.mp3")
+                            for number in range(args.writers)
+                            for twin in range(TWINS_PER_WRITER)
+                            for title in _twin_titles(number, twin)[:1]])
+    library.fuzzy_search("warm up", limit=1) # Build the fuzzy index up front so it is stressed too
+
+    failures = Failures()
+    counts = {}
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=writer, args=(library, number, rows, deadline,
+                                                     random.Random(args.seed + number), failures, counts))
+               for number in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(library, number, rows, args.writers, deadline,
+                                                      random.Random(args.seed + 1000 + number), failures, counts))
+                for number in range(args.readers)]
+    # Small switch interval: threads interleave far more often than by default.
+    sys.setswitchinterval(1e-5)
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    sys.setswitchinterval(0.005)
+    check_final_state(library, failures)
+
+    reads = sum(ops for name, ops in counts.items() if name.startswith("reader"))
+    writes = sum(ops for name, ops in counts.items() if name.startswith("writer"))
+    retries = metrics.snapshot()["counters"].get("library.read_retries", 0)
+    print(f"{args.readers} readers, {args.writers} writers, {elapsed:.1f}s, {len(library.all_songs)} songs at the end")
+    print(f"  reads:  {reads} ({reads / elapsed:.0f}/s), {retries} retried after overlapping a write")
+    print(f"  writes: {writes} ({writes / elapsed:.0f}/s)")
+    if failures.messages:
+        print(f"❌ {len(failures.messages)} check(s) failed:")
+        for message in failures.messages:
+            print(f"  {message}")
+        return 1
+    print("✅ All consistency checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""
+Importer Module
+Adds a whole music folder to the library by reading each file's own tags
+(ID3, Vorbis comments, WAV INFO) and working out its duration from the file
+headers, instead of typing every song in by hand.
+"""
+
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+AUDIO_EXTENSIONS = (".mp3", ".ogg", ".oga", ".opus", ".wav")
+SCAN_CACHE_FILE = ".scan_cache.json"
+UNKNOWN_ARTIST = "Unknown Artist"
+UNKNOWN_GENRE = "Unknown"
+_TAIL_BYTES = 64 * 1024
+
+# --- MP3 ---
+# Bitrates in kbit/s for Layer III, indexed by the 4-bit header field.
+_MPEG1_L3_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0)
+_MPEG2_L3_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_ID3_TEXT_FRAMES = {"TIT2": "title", "TT2": "title", "TPE1": "artist", "TP1": "artist",
+                    "TCON": "genre", "TCO": "genre", "TLEN": "length", "TLE": "length"}
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_id3_text(data):
+    if not data:
+        return ""
+    encoding, body = data[0], data[1:]
+    if encoding == 1:
+        text = body.decode("utf-16", "replace")
+    elif encoding == 2:
+        text = body.decode("utf-16-be", "replace")
+    elif encoding == 3:
+        text = body.decode("utf-8", "replace")
+    else:
+        text = body.decode("latin-1")
+    return text.split("\0")[0].strip()
+
+
+def _clean_id3_genre(genre):
+    # ID3 genres can be "(17)", "(17)Rock" or plain text; keep the text part.
+    if genre.startswith("(") and ")" in genre:
+        rest = genre[genre.index(")") + 1:].strip()
+        return rest or genre
+    return genre
+
+
+def _read_id3v2(file):
+    """Returns (tags, tag_size) for an ID3v2 tag at the start of the file."""
+    header = file.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return {}, 0
+    major = header[3]
+    size = _syncsafe(header[6:10])
+    body = file.read(size)
+    tags = {}
+    position = 0
+    id_length, header_length = (3, 6) if major == 2 else (4, 10)
+    while position + header_length <= len(body):
+        frame_id = body[position:position + id_length]
+        if not frame_id.strip(b"\0"):
+            break # Padding
+        if major == 2:
+            frame_size = int.from_bytes(body[position + 3:position + 6], "big")
+        elif major == 4:
+            frame_size = _syncsafe(body[position + 4:position + 8])
+        else:
+            frame_size = int.from_bytes(body[position + 4:position + 8], "big")
+        data = body[position + header_length:position + header_length + frame_size]
+        name = _ID3_TEXT_FRAMES.get(frame_id.decode("latin-1"))
+        if name and name not in tags:
+            tags[name] = _decode_id3_text(data)
+        position += header_length + frame_size
+    return tags, 10 + size
+
+
+def _read_id3v1(file, file_size):
+    if file_size < 128:
+        return {}
+    file.seek(file_size - 128)
+    data = file.read(128)
+    if data[:3] != b"TAG":
+        return {}
+    field = lambda raw: raw.split(b"\0")[0].decode("latin-1").strip()
+    return {"title": field(data[3:33]), "artist": field(data[33:63])}
+
+
+def _mp3_duration(file, audio_start, file_size):
+    """Duration in seconds from the first frame header (Xing/Info frame count, else CBR)."""
+    file.seek(audio_start)
+    data = file.read(8192)
+    for offset in range(len(data) - 4):
+        if data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+            continue
+        version_bits = (data[offset + 1] >> 3) & 0x3
+        layer_bits = (data[offset + 1] >> 1) & 0x3
+        bitrate_index = data[offset + 2] >> 4
+        rate_index = (data[offset + 2] >> 2) & 0x3
+        if version_bits == 1 or layer_bits != 1 or rate_index == 3 or bitrate_index in (0, 15):
+            continue # Not a valid Layer III header
+        mpeg1 = version_bits == 3
+        sample_rate = _SAMPLE_RATES[version_bits][rate_index]
+        samples_per_frame = 1152 if mpeg1 else 576
+        mono = (data[offset + 3] >> 6) == 3
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        xing = offset + 4 + side_info
+        if data[xing:xing + 4] in (b"Xing", b"Info"):
+            flags = int.from_bytes(data[xing + 4:xing + 8], "big")
+            if flags & 1:
+                frames = int.from_bytes(data[xing + 8:xing + 12], "big")
+                return frames * samples_per_frame / sample_rate
+        bitrate = (_MPEG1_L3_BITRATES if mpeg1 else _MPEG2_L3_BITRATES)[bitrate_index] * 1000
+        return (file_size - audio_start - offset) * 8 / bitrate
+    return 0
+
+
+def _read_mp3(file, file_size):
+    tags, tag_size = _read_id3v2(file)
+    if not tags.get("title") or not tags.get("artist"):
+        for name, value in _read_id3v1(file, file_size).items():
+            if not tags.get(name):
+                tags[name] = value
+    duration = 0
+    length = tags.pop("length", "")
+    if length.isdigit():
+        duration = int(length) / 1000
+    if not duration:
+        duration = _mp3_duration(file, tag_size, file_size)
+    if "genre" in tags:
+        tags["genre"] = _clean_id3_genre(tags["genre"])
+    tags["duration"] = duration
+    return tags
+
+
+# --- Ogg (Vorbis / Opus) ---
+def _parse_vorbis_comments(data):
+    tags = {}
+    try:
+        vendor_length = struct.unpack_from("<I", data, 0)[0]
+        position = 4 + vendor_length
+        count = struct.unpack_from("<I", data, position)[0]
+        position += 4
+        for _ in range(count):
+            length = struct.unpack_from("<I", data, position)[0]
+            position += 4
+            comment = data[position:position + length].decode("utf-8", "replace")
+            position += length
+            key, _, value = comment.partition("=")
+            name = {"TITLE": "title", "ARTIST": "artist", "GENRE": "genre"}.get(key.upper())
+            if name and name not in tags:
+                tags[name] = value.strip()
+    except struct.error:
+        pass # Comment block cut short; keep what was read
+    return tags
+
+
+def _read_ogg(file, file_size):
+    head = file.read(_TAIL_BYTES)
+    if head[:4] != b"OggS":
+        return {}
+    tags = {}
+    sample_rate = 0
+    if b"\x01vorbis" in head:
+        start = head.index(b"\x01vorbis") + 7
+        sample_rate = struct.unpack_from("<I", head, start + 5)[0]
+        if b"\x03vorbis" in head:
+            tags = _parse_vorbis_comments(head[head.index(b"\x03vorbis") + 7:])
+    elif b"OpusHead" in head:
+        sample_rate = 48000 # Opus granule positions always count 48 kHz samples
+        if b"OpusTags" in head:
+            tags = _parse_vorbis_comments(head[head.index(b"OpusTags") + 8:])
+    file.seek(max(0, file_size - _TAIL_BYTES))
+    tail = file.read()
+    last_page = tail.rfind(b"OggS")
+    if sample_rate and last_page >= 0 and last_page + 14 <= len(tail):
+        granule = struct.unpack_from("<q", tail, last_page + 6)[0]
+        tags["duration"] = max(granule, 0) / sample_rate
+    return tags
+
+
+# --- WAV ---
+def _read_wav(file, file_size):
+    header = file.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return {}
+    tags = {}
+    byte_rate = 0
+    data_size = 0
+    while True:
+        chunk = file.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = file.read(chunk_size)
+            byte_rate = struct.unpack_from("<I", fmt, 8)[0]
+        elif chunk_id == b"data":
+            data_size = min(chunk_size, file_size - file.tell())
+            file.seek(chunk_size, os.SEEK_CUR)
+        elif chunk_id == b"LIST":
+            body = file.read(chunk_size)
+            if body[:4] == b"INFO":
+                position = 4
+                while position + 8 <= len(body):
+                    info_id = body[position:position + 4]
+                    info_size = struct.unpack_from("<I", body, position + 4)[0]
+                    value = body[position + 8:position + 8 + info_size].split(b"\0")[0]
+                    name = {b"INAM": "title", b"IART": "artist", b"IGNR": "genre"}.get(info_id)
+                    if name:
+                        tags[name] = value.decode("utf-8", "replace").strip()
+                    position += 8 + info_size + (info_size & 1)
+        else:
+            file.seek(chunk_size, os.SEEK_CUR)
+        if chunk_size & 1:
+            file.seek(1, os.SEEK_CUR) # Chunks are word-aligned
+    if byte_rate:
+        tags["duration"] = data_size / byte_rate
+    return tags
+
+
+_READERS = {".mp3": _read_mp3, ".ogg": _read_ogg, ".oga": _read_ogg, ".opus": _read_ogg, ".wav": _read_wav}
+
+
+def read_tags(filepath):
+    """
+    Reads (title, artist, duration, genre) from an audio file's headers.
+    Missing tags fall back to the file name, "Unknown Artist" and "Unknown".
+    Raises OSError if the file can't be read.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    file_size = os.path.getsize(filepath)
+    with open(filepath, "rb") as file:
+        try:
+            tags = _READERS[extension](file, file_size)
+        except (struct.error, ValueError, IndexError, KeyError):
+            tags = {} # Damaged header; fall back to the defaults below
+    title = tags.get("title") or os.path.splitext(os.path.basename(filepath))[0]
+    artist = tags.get("artist") or UNKNOWN_ARTIST
+    genre = tags.get("genre") or UNKNOWN_GENRE
+    # The text format uses '|' as separator, so it can't appear in a field.
+    clean = lambda text: text.replace("|", "/").replace("\n", " ").strip()
+    return clean(title), clean(artist), int(round(tags.get("duration") or 0)), clean(genre)
+
+
+# --- Scanning ---
+def _find_audio_files(root):
+    """Yields (path, mtime_ns, size) for every audio file under root."""
+    pending = [root]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                        stat = entry.stat()
+                        yield os.path.abspath(entry.path), stat.st_mtime_ns, stat.st_size
+                except OSError:
+                    continue
+
+
+def _load_scan_cache(cache_file):
+    try:
+        with open(cache_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_scan_cache(cache, cache_file):
+    temp_filename = cache_file + ".tmp"
+    with open(temp_filename, "w", encoding="utf-8") as file:
+        json.dump(cache, file)
+    os.replace(temp_filename, cache_file)
+
+
+def scan_directory(root, cache_file=SCAN_CACHE_FILE, workers=8):
+    """
+    Reads the tags of every audio file under `root` in a thread pool.
+    Results are cached by path, keyed on mtime and size, so a re-scan only
+    opens new or changed files. Returns (rows, stats) where rows are
+    (title, artist, duration, genre, filepath) tuples.
+    """
+    cache = _load_scan_cache(cache_file) if cache_file else {}
+    rows = []
+    to_read = []
+    stats = {"files": 0, "cached": 0, "read": 0, "failed": 0}
+    for path, mtime_ns, size in _find_audio_files(root):
+        stats["files"] += 1
+        cached = cache.get(path)
+        if cached and cached[0] == mtime_ns and cached[1] == size:
+            title, artist, duration, genre = cached[2:]
+            rows.append((title, artist, duration, genre, path))
+            stats["cached"] += 1
+        else:
+            to_read.append((path, mtime_ns, size))
+
+    def read(item):
+        try:
+            return item, read_tags(item[0])
+        except OSError:
+            return item, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (path, mtime_ns, size), tags in pool.map(read, to_read):
+            if tags is None:
+                stats["failed"] += 1
+                continue
+            title, artist, duration, genre = tags
+            cache[path] = [mtime_ns, size, title, artist, duration, genre]
+            rows.append((title, artist, duration, genre, path))
+            stats["read"] += 1
+
+    if cache_file and stats["read"]:
+        _save_scan_cache(cache, cache_file)
+    return rows, stats
+
+
+def import_directory(library, root, cache_file=SCAN_CACHE_FILE, workers=8, report=None):
+    """
+    Scans `root` and bulk-adds every song not already in the library.
+    Songs whose title is already taken are skipped and, if `report` is a list,
+    recorded there as {"path": ..., "reason": ...}.
+    """
+    if not os.path.isdir(root):
+        return f"❌ '{root}' is not a folder."
+    rows, stats = scan_directory(root, cache_file, workers)
+    known_paths = {song.filepath for song in library.get_all_songs()} if rows else set()
+    new_rows = [row for row in rows if row[4] not in known_paths]
+    skipped = []
+    added = library.add_songs_bulk(new_rows, on_reject=lambda row, reason: skipped.append(
+        {"path": row[4], "reason": reason}))
+    if report is not None:
+        report.extend(skipped)
+    return (f"✅ Imported {added} new songs from {stats['files']} files "
+            f"({stats['read']} read, {stats['cached']} unchanged, {stats['failed']} unreadable, "
+            f"{len(skipped)} skipped)")
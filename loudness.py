@@ -0,0 +1,233 @@
+"""
+Loudness Module
+Measures how loud each song file is (RMS and peak level) so the player can
+turn loud tracks down to a common level. Files are decoded and measured with
+NumPy in a pool of worker processes, and the results are cached by path (with
+mtime and size), so only new or changed files are analyzed again. During
+playback the player only looks the volume up; nothing is decoded then.
+"""
+
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+LOUDNESS_CACHE_FILE = ".loudness_cache.json"
+TARGET_RMS_DB = -20.0 # Level every track is turned down to; quieter ones play at full volume
+MIN_VOLUME = 0.05
+_BATCH_SIZE = 16 # Files per worker task; decoding one takes long enough that batches can be small
+_WAV_CHUNK_FRAMES = 1 << 18 # Frames read at a time, so long WAVs don't need to fit in memory
+# Workers are started fresh rather than forked: the player's threads may hold locks at fork time.
+_POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _sample_chunks(filepath):
+    """
+    Yields the samples of an audio file as float arrays scaled to [-1, 1].
+    WAV files are read with the wave module; anything else is decoded by
+    pygame.mixer.Sound (with a dummy audio driver, so no device is opened).
+    """
+    import numpy as np
+    if os.path.splitext(filepath)[1].lower() == ".wav":
+        with wave.open(filepath, "rb") as file:
+            width = file.getsampwidth()
+            while True:
+                raw = file.readframes(_WAV_CHUNK_FRAMES)
+                if not raw:
+                    return
+                if width == 1:
+                    yield (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+                elif width == 3:
+                    data = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+                    samples = (data[:, 0] << 8) | (data[:, 1] << 16) | (data[:, 2] << 24)
+                    yield (samples >> 8).astype(np.float32) / (1 << 23)
+                else:
+                    dtype = {2: np.int16, 4: np.int32}[width]
+                    yield np.frombuffer(raw, dtype=dtype).astype(np.float32) / -np.iinfo(dtype).min
+        return
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    samples = pygame.sndarray.array(pygame.mixer.Sound(filepath))
+    if np.issubdtype(samples.dtype, np.integer):
+        info = np.iinfo(samples.dtype)
+        samples = (samples.astype(np.float32) - (info.max + info.min + 1) / 2) / ((info.max - info.min + 1) / 2)
+    yield samples.astype(np.float32, copy=False).ravel()
+
+
+def measure_file(filepath):
+    """Returns (rms_db, peak_db) of a file in dBFS, or (None, None) if it is silent."""
+    import numpy as np
+    total = 0.0
+    count = 0
+    peak = 0.0
+    for samples in _sample_chunks(filepath):
+        if not samples.size:
+            continue
+        total += float(np.dot(samples, samples))
+        count += samples.size
+        peak = max(peak, float(np.abs(samples).max()))
+    if not count or total == 0:
+        return None, None
+    return 20 * math.log10(math.sqrt(total / count)), 20 * math.log10(peak)
+
+
+def volume_for(rms_db):
+    """The playback volume (0-1) that brings a track with this RMS level to TARGET_RMS_DB."""
+    if rms_db is None:
+        return 1.0
+    return min(max(10 ** ((TARGET_RMS_DB - rms_db) / 20), MIN_VOLUME), 1.0)
+
+
+def analyze_file(filepath, cached=None):
+    """
+    Returns [mtime_ns, size, rms_db, peak_db, volume, problem] for one file.
+    A `cached` result with the same mtime and size is reused without decoding.
+    """
+    try:
+        info = os.stat(filepath)
+    except OSError as e:
+        return [None, None, None, None, 1.0, f"cannot access file ({e.strerror})"]
+    if cached is not None and cached[0] == info.st_mtime_ns and cached[1] == info.st_size:
+        return cached
+    try:
+        rms_db, peak_db = measure_file(filepath)
+    except ImportError as e:
+        # NumPy or pygame missing: not the file's fault, so no mtime and it is tried again next time.
+        return [None, None, None, None, 1.0, f"cannot decode file ({e})"]
+    except Exception as e:
+        return [info.st_mtime_ns, info.st_size, None, None, 1.0, f"cannot decode file ({e})"]
+    return [info.st_mtime_ns, info.st_size, rms_db, peak_db, volume_for(rms_db), None]
+
+
+def _analyze_batch(items):
+    return [(path, analyze_file(path, cached)) for path, cached in items]
+
+
+# --- LoudnessAnalyzer Class ---
+class LoudnessAnalyzer:
+    """
+    Keeps the measured loudness of song files. analyze() measures files in a
+    process pool; AudioPlayer asks volume() for the level to play a file at,
+    and schedule() to have an upcoming file measured in the background.
+    """
+
+    def __init__(self, cache_file=LOUDNESS_CACHE_FILE, workers=None):
+        self.cache_file = cache_file
+        self.workers = workers or os.cpu_count() or 1
+        self._results = self._load_cache() # Key: filepath, Value: [mtime_ns, size, rms_db, peak_db, volume, problem]
+        self._lock = threading.Lock()
+        self._pool = None # For schedule(); created on first use
+        self._pending = set()
+        self._has_numpy = None # Checked on the first schedule()
+
+    def _load_cache(self):
+        if not self.cache_file:
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            data = json.dumps(self._results)
+        temp_filename = self.cache_file + ".tmp"
+        with open(temp_filename, "w", encoding="utf-8") as file:
+            file.write(data)
+        os.replace(temp_filename, self.cache_file)
+
+    # --- Lookups ---
+    def volume(self, filepath):
+        """The volume to play `filepath` at: 1.0 if it hasn't been analyzed."""
+        result = self._results.get(filepath)
+        return result[4] if result is not None else 1.0
+
+    def result(self, filepath):
+        return self._results.get(filepath)
+
+    # --- Analysis ---
+    def analyze(self, filepaths, recheck=False):
+        """
+        Measures the given files in worker processes. Without `recheck`, only
+        files never analyzed before are looked at; with it, every file is
+        stat'ed again but only decoded if its mtime or size changed.
+        Returns how many were analyzed. Raises ImportError without NumPy.
+        """
+        if importlib.util.find_spec("numpy") is None: # Fail here, not once per file in the workers
+            raise ImportError("No module named 'numpy'")
+        pending = list(dict.fromkeys(filepaths))
+        if not recheck:
+            pending = [path for path in pending if path not in self._results]
+        if not pending:
+            return 0
+        items = ((path, self._results.get(path)) for path in pending)
+        batches = iter(lambda: list(islice(items, _BATCH_SIZE)), [])
+        analyzed = 0
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=_POOL_CONTEXT) as pool:
+            for results in pool.map(_analyze_batch, batches):
+                with self._lock:
+                    for path, result in results:
+                        if result[0] is not None: # Not stat'able or not decodable here: try again next time
+                            self._results[path] = result
+                analyzed += len(results)
+        if analyzed:
+            self.save()
+        return analyzed
+
+    def analyze_library(self, library, recheck=False):
+        return self.analyze((song.filepath for song in library.get_all_songs()), recheck)
+
+    def schedule(self, filepath):
+        """Measures `filepath` in the background if it never was. Never blocks."""
+        if self._has_numpy is None:
+            self._has_numpy = importlib.util.find_spec("numpy") is not None
+        if not self._has_numpy:
+            return
+        with self._lock:
+            if filepath in self._results or filepath in self._pending:
+                return
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=1, mp_context=_POOL_CONTEXT)
+            self._pending.add(filepath)
+        try:
+            future = self._pool.submit(analyze_file, filepath)
+        except RuntimeError:
+            return # Shut down
+        future.add_done_callback(lambda done: self._scheduled_done(filepath, done))
+
+    def _scheduled_done(self, filepath, future):
+        with self._lock:
+            self._pending.discard(filepath)
+            if not future.cancelled() and future.exception() is None and future.result()[0] is not None:
+                self._results[filepath] = future.result()
+
+    def shutdown(self):
+        """Stops the background worker and saves what it measured."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        self.save()
+
+    def format_report(self, library):
+        measured = [(song, self._results[song.filepath]) for song in library.get_all_songs()
+                    if song.filepath in self._results]
+        if not measured:
+            return "No tracks analyzed yet."
+        problems = [(song, result[5]) for song, result in measured if result[5]]
+        adjusted = sum(1 for _, result in measured if result[4] < 1.0)
+        lines = [f"✅ {len(measured)} track(s) analyzed; {adjusted} will be turned down to match."]
+        if problems:
+            lines.append(f"⚠️ {len(problems)} track(s) could not be analyzed:")
+            lines.extend(f"{i}. {song.title} - {song.filepath}: {problem}"
+                         for i, (song, problem) in enumerate(problems, 1))
+        return "\n".join(lines)
\ No newline at end of file
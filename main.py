@@ -2,16 +2,64 @@
 main program file | untuk menjalankan program run file ini ya
 """
 
-import pygame
-from music_library import MusicLibrary
-from player import (load_songs_from_file, save_songs_to_file)
+from music_library import MusicLibrary, _format_duration
+from player import (load_songs_from_file, save_songs_to_file, SongJournal, SongsFileWatcher,
+                    load_songs_from_catalog, save_songs_to_catalog, load_songs_from_database)
 from audio_player import AudioPlayer
+from importer import import_directory
+from track_check import TrackValidator
+from loudness import LoudnessAnalyzer
+from radio import Radio
+import metrics
 import os
 import time
 
+SONGS_FILE = "songs.txt"
+CATALOG_FILE = "songs.bin" # Optional binary catalog, used instead of songs.txt when present
+DATABASE_FILE = "songs.db" # Optional SQLite database, preferred over both when present
+
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
+# --- HELPER: LIBRARY STORAGE ---
+def open_library(library):
+    """
+    memuat lagu dari songs.db, songs.bin atau songs.txt (yang ada duluan)
+    Returns (save, messages): a function that saves the library on exit, and
+    one that returns the messages of songs.txt reloads not shown yet.
+    """
+    if os.path.exists(DATABASE_FILE):
+        print(load_songs_from_database(library, DATABASE_FILE))
+        def save():
+            library.all_songs.close()
+            return f"✅ All changes are already stored in {DATABASE_FILE}"
+        return save, list
+
+    watcher = None
+    if os.path.exists(CATALOG_FILE):
+        print(load_songs_from_catalog(library, CATALOG_FILE))
+        journal = SongJournal(CATALOG_FILE)
+        save_to, filename = save_songs_to_catalog, CATALOG_FILE
+    else:
+        print(load_songs_from_file(library, SONGS_FILE))
+        journal = SongJournal(SONGS_FILE)
+        save_to, filename = save_songs_to_file, SONGS_FILE
+        # songs.txt may be edited by hand while the program runs
+        watcher = SongsFileWatcher(library, SONGS_FILE)
+        watcher.start()
+    journal.attach(library)
+
+    def save():
+        if watcher is not None:
+            watcher.stop()
+            reloaded = watcher.poll() # Pick up a last outside edit instead of overwriting it
+            if reloaded:
+                print(reloaded)
+        result = save_to(library, filename, journal=journal)
+        journal.close()
+        return result
+    return save, (watcher.pending_messages if watcher is not None else list)
+
 # --- HELPER: DURATION PARSER ---
 def parse_duration(duration_str):
     """
@@ -30,58 +78,97 @@ def parse_duration(duration_str):
         return int(duration_str)
 
 # --- HELPER: SONG SELECTOR ---
+PICKER_PAGE_SIZE = 15
+
+def filter_songs(library, text):
+    """lagu yang judulnya diawali `text` atau artisnya mengandung `text`, urut judul"""
+    matches = {song.title.lower(): song for song in library.get_songs_by_prefix(text)}
+    for song in library.search_by_artist(text):
+        matches.setdefault(song.title.lower(), song)
+    return [matches[key] for key in sorted(matches)]
+
 def select_song_from_list(library, prompt="Choose a song:"):
     """
-    tampilan daftar lagu dengan nomor untuk dipilih user
+    tampilan daftar lagu dengan nomor untuk dipilih user, per halaman
+    Only the visible page is fetched from the library's title order. Typing
+    /text narrows the list to titles starting with (or artists containing) text.
     """
-    song_list = library.get_sorted_song_list()
-    if not song_list:
+    if library.song_count() == 0:
         print("❌ No songs in library to choose from.")
         time.sleep(2)
         return None
-    clear_screen()
-    print(f"--- {prompt} ---")
-    for i, song in enumerate(song_list, 1):
-        print(f"{i}. {song.get_info()}")
-    print("\n0. Cancel")
-    print("="*30)
-    choice = input("Enter number: ").strip()
-    try:
-        choice_num = int(choice)
-        if choice_num == 0:
-            return None
-        if 1 <= choice_num <= len(song_list):
-            return song_list[choice_num - 1] # Return the actual Song object
+    page = 0
+    filter_text = ""
+    matches = None # None = the whole library
+    while True:
+        total = len(matches) if matches is not None else library.song_count()
+        page_count = max(1, (total + PICKER_PAGE_SIZE - 1) // PICKER_PAGE_SIZE)
+        page = min(page, page_count - 1)
+        start = page * PICKER_PAGE_SIZE
+        if matches is not None:
+            page_songs = matches[start:start + PICKER_PAGE_SIZE]
         else:
-            print("❌ Invalid number.")
+            page_songs = library.get_sorted_song_list(start, start + PICKER_PAGE_SIZE)
+
+        clear_screen()
+        print(f"--- {prompt} ---")
+        if filter_text:
+            print(f"Filter: '{filter_text}' ({total} match(es))")
+        print("\n".join(f"{i}. {song.get_info()}" for i, song in enumerate(page_songs, start + 1)))
+        print(f"\nPage {page + 1}/{page_count}")
+        print("n. Next Page   p. Previous Page   /text. Filter   /. Clear Filter")
+        print("0. Cancel")
+        print("="*30)
+        choice = input("Enter number: ").strip()
+
+        if choice.lower() == 'n':
+            page += 1
+            continue
+        if choice.lower() == 'p':
+            page = max(0, page - 1)
+            continue
+        if choice.startswith('/'):
+            filter_text = choice[1:].strip()
+            matches = filter_songs(library, filter_text) if filter_text else None
+            page = 0
+            continue
+        try:
+            choice_num = int(choice)
+        except ValueError:
+            print("❌ Invalid input. Please enter a number.")
             time.sleep(1.5)
+            continue
+        if choice_num == 0:
             return None
-    except ValueError:
-        print("❌ Invalid input. Please enter a number.")
+        if 1 <= choice_num <= total:
+            if matches is not None:
+                return matches[choice_num - 1]
+            return library.get_sorted_song_list(choice_num - 1, choice_num)[0] # Return the actual Song object
+        print("❌ Invalid number.")
         time.sleep(1.5)
-        return None
 
 # ===================================================================
 # --- SUB-MENU 1: PLAYER MENU ---
 # ===================================================================
-def show_player_menu(library, player):
+def show_player_menu(library, player, radio):
     """sub menu player"""
     while True:
         clear_screen()
-        # Auto-play next song if one just finished
-        player.play_next_from_queue() 
-        
+        # The player's background thread moves on to the next song by itself.
         print("\n--- ▶️ Player Menu ---")
+        print(player.get_now_playing())
         print(player.get_queue_display()) # Show the queue at the top
         print("="*30)
         print("1. Play Next Song in Queue")
         print("2. Add Song to Queue")
         print("3. Play Song Immediately (Clears Queue)")
         print("4. Stop Music (Clears Queue)")
-        print("5. Back to Main Menu")
+        print("5. Manage Queue")
+        print(f"6. 📻 Radio (Autoplay Similar Songs): {'On' if player.autoplay else 'Off'}")
+        print("7. Back to Main Menu")
         print("="*30)
         
-        choice = input("Enter your choice (1-5): ").strip()
+        choice = input("Enter your choice (1-7): ").strip()
 
         if choice == '1':
             # --- Play Next ---
@@ -114,16 +201,112 @@ def show_player_menu(library, player):
             input("\nPress Enter to return...")
 
         elif choice == '5':
+            # --- Manage Queue ---
+            show_queue_menu(library, player)
+
+        elif choice == '6':
+            # --- Radio ---
+            toggle_radio(player, radio)
+            input("\nPress Enter to return...")
+
+        elif choice == '7':
             # --- Back ---
             break
         else:
-            print("❌ Invalid choice. Please select from 1-5.")
+            print("❌ Invalid choice. Please select from 1-7.")
+            time.sleep(1.5)
+
+def toggle_radio(player, radio):
+    """nyalakan / matikan radio: antrean diisi lagu yang mirip saat habis"""
+    if player.autoplay is not None:
+        player.set_autoplay(None)
+        print("📻 Radio off.")
+        return
+    try:
+        radio.prepare()
+    except ImportError:
+        print("❌ Radio needs NumPy. Install it with: pip install numpy")
+        return
+    player.set_autoplay(radio.next_songs)
+    print("📻 Radio on: when the queue runs out, similar songs are added.")
+
+QUEUE_PAGE_SIZE = 20
+
+def read_queue_position(prompt):
+    """minta nomor posisi di queue, None kalau input bukan angka"""
+    try:
+        return int(input(prompt).strip())
+    except ValueError:
+        print("❌ Invalid input. Please enter a number.")
+        return None
+
+def show_queue_menu(library, player):
+    """sub menu untuk mengatur queue (halaman per 20 lagu)"""
+    page_start = 0
+    while True:
+        clear_screen()
+        queue_length = len(player.queue)
+        if page_start >= queue_length:
+            page_start = max(0, (queue_length - 1) // QUEUE_PAGE_SIZE * QUEUE_PAGE_SIZE)
+        print("\n--- 📜 Manage Queue ---")
+        print(player.get_queue_display(page_start, QUEUE_PAGE_SIZE))
+        print(player.get_gap_report())
+        print("="*30)
+        print("1. Play Song Next (Front of Queue)")
+        print("2. Add Whole Genre to Queue")
+        print("3. Remove Song from Queue")
+        print("4. Move Song in Queue")
+        print("5. Shuffle Queue")
+        print("n. Next Page    p. Previous Page")
+        print("6. Back")
+        print("="*30)
+
+        choice = input("Enter your choice (1-6, n, p): ").strip().lower()
+
+        if choice == '1':
+            song = select_song_from_list(library, "Select a Song to Play Next")
+            if song:
+                player.play_after_current(song)
+            else:
+                print("Action cancelled.")
+            input("\nPress Enter to return...")
+        elif choice == '2':
+            genre = input("Enter genre: ").strip()
+            songs = library.search_by_genre(genre) if genre else []
+            if songs:
+                player.add_many_to_queue(songs)
+            else:
+                print("❌ No songs found for that genre.")
+            input("\nPress Enter to return...")
+        elif choice == '3':
+            position = read_queue_position("Queue position to remove: ")
+            if position is not None:
+                player.remove_from_queue(position)
+            input("\nPress Enter to return...")
+        elif choice == '4':
+            from_position = read_queue_position("Move from position: ")
+            to_position = read_queue_position("Move to position: ") if from_position is not None else None
+            if to_position is not None:
+                player.move_in_queue(from_position, to_position)
+            input("\nPress Enter to return...")
+        elif choice == '5':
+            player.shuffle_queue()
+            input("\nPress Enter to return...")
+        elif choice == 'n':
+            if page_start + QUEUE_PAGE_SIZE < queue_length:
+                page_start += QUEUE_PAGE_SIZE
+        elif choice == 'p':
+            page_start = max(0, page_start - QUEUE_PAGE_SIZE)
+        elif choice == '6':
+            break
+        else:
+            print("❌ Invalid choice. Please select from 1-6, n or p.")
             time.sleep(1.5)
 
 # ===================================================================
 # --- SUB-MENU 2: LIBRARY MENU ---
 # ===================================================================
-def show_library_menu(library):
+def show_library_menu(library, validator, loudness):
     """Handles all logic for the Library sub-menu."""
     while True:
         clear_screen()
@@ -133,10 +316,14 @@ def show_library_menu(library):
         print("3. Edit a Song")
         print("4. Delete a Song")
         print("5. Search Songs")
-        print("6. Back to Main Menu")
+        print("6. Import Music Folder")
+        print("7. Top Played Songs")
+        print("8. Check for Broken Tracks")
+        print("9. Analyze Loudness (Even Out Volume)")
+        print("10. Back to Main Menu")
         print("="*30)
         
-        choice = input("Enter your choice (1-6): ").strip()
+        choice = input("Enter your choice (1-10): ").strip()
         
         if choice == '1':
             show_all_songs(library)
@@ -149,9 +336,17 @@ def show_library_menu(library):
         elif choice == '5':
             search_songs(library)
         elif choice == '6':
+            import_music_folder(library)
+        elif choice == '7':
+            show_top_played(library)
+        elif choice == '8':
+            check_tracks(library, validator)
+        elif choice == '9':
+            analyze_loudness(library, loudness)
+        elif choice == '10':
             break
         else:
-            print("❌ Invalid choice. Please select from 1-6.")
+            print("❌ Invalid choice. Please select from 1-10.")
             time.sleep(1.5)
 
 # --- (Library Functions: These are now called by show_library_menu) ---
@@ -192,6 +387,99 @@ def add_new_song(library):
     print(f"\n{result}")
     input("\nPress Enter to return...")
 
+TOP_PLAYED_COUNT = 10
+
+def show_top_played(library):
+    clear_screen()
+    print("--- 🏆 Top Played Songs ---")
+    print("1. Overall")
+    print("2. By Genre")
+    print("3. By Artist")
+    print("4. Back")
+    choice = input("Enter your choice (1-4): ").strip()
+    if choice == '1':
+        results = library.top_played(TOP_PLAYED_COUNT)
+        heading = "Overall"
+    elif choice == '2':
+        genre = input("Enter genre: ").strip()
+        results = library.top_played(TOP_PLAYED_COUNT, genre=genre)
+        heading = f"Genre: {genre}"
+    elif choice == '3':
+        artist = input("Enter artist: ").strip()
+        results = library.top_played(TOP_PLAYED_COUNT, artist=artist)
+        heading = f"Artist: {artist}"
+    else:
+        return
+    print(f"\n--- Top {TOP_PLAYED_COUNT} ({heading}) ---")
+    if not results:
+        print("No songs played yet.")
+    for i, song in enumerate(results, 1):
+        last_played = time.strftime("%Y-%m-%d %H:%M", time.localtime(song.get_last_played()))
+        print(f"{i}. {song.get_info()} [Played: {song.get_play_count()}x, last {last_played}]")
+    input("\nPress Enter to return...")
+
+BROKEN_REPORT_LINES = 50
+
+def check_tracks(library, validator):
+    clear_screen()
+    print("--- 🩺 Check for Broken Tracks ---")
+    print("1. Check songs not checked yet")
+    print("2. Re-check all songs")
+    print("3. Back")
+    choice = input("Enter your choice (1-3): ").strip()
+    if choice not in ('1', '2'):
+        return
+    print("\nChecking files...")
+    started = time.perf_counter()
+    checked = validator.check_library(library, recheck=(choice == '2'))
+    print(f"Checked {checked} file(s) in {time.perf_counter() - started:.1f}s.\n")
+    report = validator.format_report(library).splitlines()
+    print("\n".join(report[:BROKEN_REPORT_LINES + 1]))
+    if len(report) > BROKEN_REPORT_LINES + 1:
+        print(f"... and {len(report) - BROKEN_REPORT_LINES - 1} more")
+    input("\nPress Enter to return...")
+
+def analyze_loudness(library, loudness):
+    clear_screen()
+    print("--- 🔊 Analyze Loudness ---")
+    print("Measured songs play at an even volume; loud ones are turned down.")
+    print("1. Analyze songs not analyzed yet")
+    print("2. Re-analyze all songs")
+    print("3. Back")
+    choice = input("Enter your choice (1-3): ").strip()
+    if choice not in ('1', '2'):
+        return
+    print("\nAnalyzing files (this can take a while)...")
+    started = time.perf_counter()
+    try:
+        analyzed = loudness.analyze_library(library, recheck=(choice == '2'))
+    except ImportError:
+        print("❌ Loudness analysis needs NumPy. Install it with: pip install numpy")
+    else:
+        print(f"Analyzed {analyzed} file(s) in {time.perf_counter() - started:.1f}s.\n")
+        report = loudness.format_report(library).splitlines()
+        print("\n".join(report[:BROKEN_REPORT_LINES + 2]))
+        if len(report) > BROKEN_REPORT_LINES + 2:
+            print(f"... and {len(report) - BROKEN_REPORT_LINES - 2} more")
+    input("\nPress Enter to return...")
+
+def import_music_folder(library):
+    clear_screen()
+    print("--- 📂 Import Music Folder ---")
+    folder = input("Enter the folder to scan (e.g., /Users/me/music): ").strip()
+    if not folder:
+        return
+
+    print("\nScanning...")
+    skipped = []
+    result = import_directory(library, os.path.expanduser(folder), report=skipped)
+    print(f"\n{result}")
+    for entry in skipped[:10]:
+        print(f"  - {entry['path']}: {entry['reason']}")
+    if len(skipped) > 10:
+        print(f"  ... and {len(skipped) - 10} more")
+    input("\nPress Enter to return...")
+
 def edit_song(library):
     song = select_song_from_list(library, "Select a Song to Edit")
     if not song:
@@ -252,14 +540,22 @@ def delete_song(library):
         print("Delete cancelled.")
     input("\nPress Enter to return...")
 
+FUZZY_RESULTS = 10
+FILTER_RESULTS = 50
+
 def search_songs(library):
     clear_screen()
     print("--- 🔍 Search Songs ---")
     print("1. Search by Artist")
     print("2. Search by Genre")
-    print("3. Back")
-    choice = input("Enter your choice (1-3): ").strip()
-    if choice == '3':
+    print("3. Search by Title or Artist (typos allowed)")
+    print("4. Filter by Artist, Genre and Duration")
+    print("5. Back")
+    choice = input("Enter your choice (1-5): ").strip()
+    if choice == '5':
+        return
+    if choice == '4':
+        filter_songs_by_fields(library)
         return
     term = input("Enter search term: ").strip()
     if not term:
@@ -274,6 +570,9 @@ def search_songs(library):
     elif choice == '2':
         results = library.search_by_genre(term)
         search_type = "Genre"
+    elif choice == '3':
+        results = library.fuzzy_search(term, limit=FUZZY_RESULTS)
+        search_type = "Best matches"
     else:
         print("❌ Invalid choice.")
         time.sleep(2)
@@ -286,48 +585,94 @@ def search_songs(library):
             print(f"{i}. {song.get_info()}")
     input("\nPress Enter to return...")
 
+def read_duration_bound(prompt):
+    """durasi batas (M:SS atau detik); kosong = tanpa batas. Raises ValueError."""
+    text = input(prompt).strip()
+    return parse_duration(text) if text else None
+
+def filter_songs_by_fields(library):
+    """gabungan filter: artis mengandung X, genre = Y, durasi antara A dan B, urut judul"""
+    print("Leave a field empty to not filter on it.")
+    artist = input("Artist contains: ").strip()
+    genre = input("Genre is: ").strip()
+    try:
+        min_duration = read_duration_bound("Shortest duration (e.g., 3:00): ")
+        max_duration = read_duration_bound("Longest duration (e.g., 5:00): ")
+    except ValueError as e:
+        print(f"❌ Invalid duration: {e}")
+        input("\nPress Enter to return...")
+        return
+    order_by = "duration" if input("Sort by (1) Title or (2) Duration? [1]: ").strip() == '2' else "title"
+    results = library.query(artist=artist, genre=genre, min_duration=min_duration,
+                            max_duration=max_duration, order_by=order_by, limit=FILTER_RESULTS + 1)
+    if len(results) > FILTER_RESULTS:
+        print(f"\n--- More than {FILTER_RESULTS} songs found; showing the first {FILTER_RESULTS} ---")
+        results = results[:FILTER_RESULTS]
+    else:
+        print(f"\n--- Found {len(results)} song(s) ---")
+    if not results:
+        print("No songs found.")
+    for i, song in enumerate(results, 1):
+        print(f"{i}. {song.get_info()}")
+    input("\nPress Enter to return...")
+
+def show_stats():
+    clear_screen()
+    print(metrics.format_report())
+    metrics_file = os.environ.get(metrics.METRICS_ENV)
+    if metrics_file:
+        metrics.dump(metrics_file)
+        print(f"\n✅ Also written to {metrics_file}")
+    input("\nPress Enter to return...")
+
 # ===================================================================
 # --- MAIN APPLICATION LOOP ---
 # ===================================================================
 def main():
     """fungsi utama yang akan di run untuk menjalankan program nya"""
-    pygame.init()
     library = MusicLibrary()
-    player = AudioPlayer()
+    validator = TrackValidator()
+    loudness = LoudnessAnalyzer()
+    player = AudioPlayer(validator=validator, loudness=loudness, library=library)
     
-    print(load_songs_from_file(library))
+    save_library, library_messages = open_library(library)
+    radio = Radio(library)
     
     print("\nWelcome to Musicify!")
     input("Press Enter to start...")
 
     while True:
         clear_screen()
-        # Auto-play next song
-        player.play_next_from_queue()
-        
         print("\n" + "="*30)
         print("     🎵 Musicify 🎵")
         print("="*30)
+        print(player.get_now_playing())
+        for message in library_messages():
+            print(message)
         print("1. ▶️ Player")
         print("2. 📚 Library")
-        print("3. 💾 Save and Exit")
+        print("3. 📊 Stats")
+        print("4. 💾 Save and Exit")
         print("="*30)
         
-        choice = input("Enter your choice (1-3): ").strip()
+        choice = input("Enter your choice (1-4): ").strip()
 
         if choice == '1':
-            show_player_menu(library, player)
+            show_player_menu(library, player, radio)
         elif choice == '2':
-            show_library_menu(library)
+            show_library_menu(library, validator, loudness)
         elif choice == '3':
-            print(save_songs_to_file(library))
+            show_stats()
+        elif choice == '4':
+            print(save_library())
             print("\n✅ Data saved. Goodbye!")
             break
         else:
-            print("❌ Invalid choice. Please select from 1-3.")
+            print("❌ Invalid choice. Please select from 1-4.")
             time.sleep(1.5)
 
-    pygame.quit()
+    player.shutdown()
+    loudness.shutdown()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    metrics.run_main(main)
\ No newline at end of file
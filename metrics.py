@@ -0,0 +1,202 @@
+"""
+Metrics Module
+Counters, gauges and latency histograms for the library, file I/O and the
+player. Recording is a dict update under a lock, cheap enough to leave on.
+
+    MUSICIFY_METRICS=metrics.json python main.py   # dump on exit (and on SIGUSR1)
+    MUSICIFY_PROFILE=main.prof python main.py      # run main() under cProfile
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_ENV = "MUSICIFY_METRICS"
+PROFILE_ENV = "MUSICIFY_PROFILE"
+# Histogram bucket upper bounds in milliseconds; the last bucket is everything above.
+BUCKET_BOUNDS_MS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+
+# --- Histogram Class ---
+class _Histogram:
+    """Fixed-bucket latency histogram; percentiles are reported as bucket upper bounds."""
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def observe(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+
+    def percentile(self, fraction):
+        target = fraction * self.count
+        seen = 0
+        for position, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return BUCKET_BOUNDS_MS[position] if position < len(BUCKET_BOUNDS_MS) else self.max
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "avg_ms": self.total / self.count, "min_ms": self.min,
+                "max_ms": self.max, "p50_ms": self.percentile(0.5), "p95_ms": self.percentile(0.95),
+                "p99_ms": self.percentile(0.99)}
+
+
+# --- Recording ---
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name, value):
+    _gauges[name] = value # A single store; no lock needed
+
+
+def observe_ms(name, ms):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.observe(ms)
+
+
+class _Timer:
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe_ms(self.name, (time.perf_counter() - self._start) * 1000)
+        return False
+
+    def __call__(self, function):
+        name = self.name
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe_ms(name, (perf_counter() - start) * 1000)
+        return wrapper
+
+
+def timed(name):
+    """
+    Records the duration of a block (with timed("name"): ...) or of every call
+    to a function (@timed("name")) into the histogram `name`.
+    """
+    return _Timer(name)
+
+
+# --- Reporting ---
+def snapshot():
+    """Returns all metrics as a JSON-ready dict."""
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges),
+                "histograms": {name: histogram.summary() for name, histogram in _histograms.items()}}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+def format_report():
+    """Returns the metrics as readable text, one line per metric."""
+    data = snapshot()
+    lines = ["--- 📊 Metrics ---"]
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"{name:<32} {value}")
+    for name, value in sorted(data["gauges"].items()):
+        lines.append(f"{name:<32} {value:.1f}" if isinstance(value, float) else f"{name:<32} {value}")
+    for name, summary in sorted(data["histograms"].items()):
+        if summary["count"]:
+            lines.append(f"{name:<32} n={summary['count']} avg {summary['avg_ms']:.3f} ms, "
+                         f"p50 ≤{summary['p50_ms']} ms, p99 ≤{summary['p99_ms']} ms, max {summary['max_ms']:.3f} ms")
+    if len(lines) == 1:
+        lines.append("No metrics recorded yet.")
+    return "\n".join(lines)
+
+
+def dump(filename):
+    """Writes a snapshot to `filename` as JSON."""
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "w", encoding="utf-8") as file:
+        json.dump(dict(snapshot(), time=time.strftime("%Y-%m-%dT%H:%M:%S")), file, indent=2)
+    os.replace(temp_filename, filename)
+
+
+def install_dump(filename):
+    """Dumps the metrics to `filename` at exit and, where supported, on SIGUSR1."""
+    atexit.register(dump, filename)
+    try:
+        import signal
+        # The handler runs on the main thread between bytecodes, possibly while it holds
+        # _lock inside increment()/observe_ms(); dumping there would deadlock, so hand it off.
+        signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(
+            target=dump, args=(filename,), name="metrics-dump", daemon=True).start())
+    except (AttributeError, ValueError):
+        pass # No SIGUSR1 (Windows) or not on the main thread
+
+
+# --- Profiling ---
+def run_profiled(function, filename, top=25):
+    """
+    Runs function() under cProfile, saves the stats to `filename` (for
+    pstats/snakeviz) and prints the slowest calls by cumulative time.
+    """
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function)
+    finally:
+        profiler.dump_stats(filename)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(top)
+
+
+def run_main(function):
+    """
+    Entry point wrapper: installs the exit dump if MUSICIFY_METRICS is set and
+    profiles the run if MUSICIFY_PROFILE is set.
+    """
+    metrics_file = os.environ.get(METRICS_ENV)
+    if metrics_file:
+        install_dump(metrics_file)
+    profile_file = os.environ.get(PROFILE_ENV)
+    if profile_file:
+        return run_profiled(function, profile_file)
+    return function()
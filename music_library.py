@@ -3,7 +3,17 @@ Music Library Module (Simplified)
 Contains classes for Song and MusicLibrary
 Does NOT include playlists.
 """
+import functools
+import heapq
 import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections.abc import MutableMapping
+from contextlib import contextmanager, nullcontext
+
+import metrics
 
 # --- HELPER FUNCTION ---
 def _format_duration(total_seconds):
@@ -18,8 +28,309 @@ def _format_duration(total_seconds):
     except (ValueError, TypeError):
         return "0:00"
 
+def _trigrams(text):
+    """Returns the set of 3-character substrings of an (already lowercased) string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+_NO_KEYS = frozenset()
+_WORD_PATTERN = re.compile(r"\w+")
+FUZZY_EXPAND_LIMIT = 20000 # Matches for a word this common only re-rank other candidates
+QUERY_ORDERS = ("title", "duration")
+QUERY_PROBE_RATIO = 8 # A filter matching this many times more songs than the candidates left is checked per song
+
+def _words(text):
+    """Returns the words of an (already lowercased) string."""
+    return _WORD_PATTERN.findall(text)
+
+def _edit_distance(a, b, max_distance):
+    """Levenshtein distance between a and b, or max_distance + 1 if it is larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+# --- Substring Index ---
+class _SubstringIndex:
+    """
+    Answers "which songs have `query` somewhere in this field" without a full scan.
+    Distinct lowercased field values map to the song keys that carry them, and a
+    trigram index over those values narrows a query down to the values that can
+    possibly contain it.
+    """
+    def __init__(self):
+        self._keys_by_value = {}  # Key: "the adams", Value: {"konservatif", ...}
+        self._values_by_gram = {}  # Key: "ada", Value: {"the adams", ...}
+
+    def add(self, value, key):
+        value = value.lower()
+        keys = self._keys_by_value.get(value)
+        if keys is None:
+            keys = self._keys_by_value[value] = set()
+            for gram in _trigrams(value):
+                self._values_by_gram.setdefault(gram, set()).add(value)
+        keys.add(key)
+
+    def remove(self, value, key):
+        value = value.lower()
+        keys = self._keys_by_value.get(value)
+        if keys is None:
+            return
+        keys.discard(key)
+        if keys:
+            return
+        del self._keys_by_value[value]
+        for gram in _trigrams(value):
+            values = self._values_by_gram[gram]
+            values.discard(value)
+            if not values:
+                del self._values_by_gram[gram]
+
+    def matching_values(self, query_lower):
+        """Returns the distinct field values that contain `query_lower`."""
+        if len(query_lower) < 3:
+            # Too short for trigrams; distinct values are still far fewer than songs.
+            candidates = self._keys_by_value.keys()
+        else:
+            postings = []
+            for gram in _trigrams(query_lower):
+                values = self._values_by_gram.get(gram)
+                if not values:
+                    return []
+                postings.append(values)
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        return [value for value in candidates if query_lower in value]
+
+    def keys_for_value(self, value_lower):
+        """Returns the set of song keys whose field equals `value_lower` (do not modify it)."""
+        return self._keys_by_value.get(value_lower, _NO_KEYS)
+
+    def count(self, values):
+        """Returns how many songs carry one of `values` (from matching_values)."""
+        return sum(len(self._keys_by_value[value]) for value in values)
+
+    def keys_for(self, values):
+        keys = set()
+        for value in values:
+            keys.update(self._keys_by_value[value])
+        return keys
+
+    def search(self, query_lower):
+        """Returns the set of song keys whose field contains `query_lower`."""
+        return self.keys_for(self.matching_values(query_lower))
+
+# --- Range Index ---
+class _RangeIndex:
+    """
+    Answers "which songs have a value between low and high" (used for duration)
+    by bisecting (value, key) pairs kept sorted, and remembers each song's value
+    so a single song can be checked without looking it up.
+    """
+    def __init__(self):
+        self._entries = [] # Sorted (value, key) pairs
+        self.values = {} # Key: "konservatif", Value: 272
+
+    def add(self, value, key):
+        value = int(value)
+        self.values[key] = value
+        insort(self._entries, (value, key))
+
+    def add_unsorted(self, value, key):
+        """Like add, for bulk loads; call sort() once afterwards."""
+        value = int(value)
+        self.values[key] = value
+        self._entries.append((value, key))
+
+    def sort(self):
+        self._entries.sort()
+
+    def remove(self, key):
+        value = self.values.pop(key, None)
+        if value is None:
+            return
+        del self._entries[bisect_left(self._entries, (value, key))]
+
+    def range(self, low=None, high=None):
+        """Returns the (start, stop) positions of the entries with low <= value <= high (None = unbounded)."""
+        start = 0 if low is None else bisect_left(self._entries, (low,))
+        stop = len(self._entries) if high is None else bisect_left(self._entries, (high + 1,))
+        return start, max(start, stop)
+
+    def keys(self, start=0, stop=None):
+        """Returns the keys of entries [start:stop], ordered by value."""
+        return [key for _, key in self._entries[start:stop]]
+
+# --- Fuzzy Word Index ---
+class _FuzzyWordIndex:
+    """
+    Finds the words close to a (possibly misspelled or unfinished) query word.
+    Each distinct word maps to the field values containing it, and a trigram
+    index over the words (padded, so short words have trigrams too) narrows a
+    query down to a few candidates before edit distances are computed. The
+    vocabulary is far smaller than the library, so lookups don't grow with it.
+    With `values_are_keys` the values are song keys themselves (titles);
+    otherwise each value maps to the keys of the songs carrying it (artists).
+    """
+    def __init__(self, values_are_keys=False):
+        self._keys_by_value = None if values_are_keys else {}
+        self._values_by_word = {} # Key: "adams", Value: {"the adams", ...}
+        self._words_by_gram = {} # Key: " ad", Value: {"adams", ...}
+
+    def add(self, value, key):
+        value = value.lower()
+        if self._keys_by_value is not None:
+            keys = self._keys_by_value.get(value)
+            if keys is not None:
+                keys.add(key)
+                return
+            self._keys_by_value[value] = {key}
+        for word in _words(value):
+            values = self._values_by_word.get(word)
+            if values is None:
+                values = self._values_by_word[word] = set()
+                for gram in _trigrams(f" {word} "):
+                    self._words_by_gram.setdefault(gram, set()).add(word)
+            values.add(value)
+
+    def remove(self, value, key):
+        value = value.lower()
+        if self._keys_by_value is not None:
+            keys = self._keys_by_value.get(value)
+            if keys is None:
+                return
+            keys.discard(key)
+            if keys:
+                return
+            del self._keys_by_value[value]
+        for word in _words(value):
+            values = self._values_by_word.get(word)
+            if values is None:
+                continue
+            values.discard(value)
+            if values:
+                continue
+            del self._values_by_word[word]
+            for gram in _trigrams(f" {word} "):
+                words = self._words_by_gram[gram]
+                words.discard(word)
+                if not words:
+                    del self._words_by_gram[gram]
+
+    def match(self, token):
+        """
+        Returns [(word, similarity)] for indexed words within a small edit
+        distance of `token`, or starting with it. Similarity is in (0, 1].
+        """
+        max_distance = 0 if len(token) <= 2 else 1 if len(token) <= 5 else 2
+        candidates = set()
+        for gram in _trigrams(f" {token} "):
+            candidates.update(self._words_by_gram.get(gram, ()))
+        matches = []
+        for word in candidates:
+            distance = _edit_distance(token, word, max_distance)
+            if distance <= max_distance:
+                matches.append((word, 1 - distance / (len(token) + 1)))
+            elif len(token) >= 2 and word.startswith(token):
+                matches.append((word, 0.5 + 0.4 * len(token) / len(word)))
+        return matches
+
+    def keys_for(self, word):
+        """Returns the song keys whose value contains `word`, as a list of sets."""
+        values = self._values_by_word.get(word, ())
+        if self._keys_by_value is None:
+            return [values]
+        return [self._keys_by_value[value] for value in values]
+
+# --- Play Ranking ---
+class _PlayRanking:
+    """
+    The songs that have been played at least once, bucketed by play count.
+    A play moves a key to the next bucket (O(1), plus an O(log n) insert when
+    a new count appears), and "top N" walks the buckets from the highest
+    count down, so it never looks at more than N songs.
+    """
+    def __init__(self):
+        self._keys_by_count = {} # Key: 12, Value: {"konservatif": None, ...} (ordered set)
+        self._counts = [] # Distinct play counts, ascending
+
+    def update(self, key, old_count, new_count):
+        if old_count > 0:
+            keys = self._keys_by_count.get(old_count)
+            if keys is not None and key in keys:
+                del keys[key]
+                if not keys:
+                    del self._keys_by_count[old_count]
+                    del self._counts[bisect_left(self._counts, old_count)]
+        if new_count > 0:
+            keys = self._keys_by_count.get(new_count)
+            if keys is None:
+                keys = self._keys_by_count[new_count] = {}
+                insort(self._counts, new_count)
+            keys[key] = None
+
+    def top(self, n):
+        """Returns up to n keys, most played first."""
+        result = []
+        for count in reversed(self._counts):
+            for key in self._keys_by_count[count]:
+                result.append(key)
+                if len(result) >= n:
+                    return result
+        return result
+
+# --- Concurrency ---
+READ_ATTEMPTS = 3 # Lock-free tries before a read waits for the writer by taking its lock
+
+def _snapshot_read(method):
+    """
+    Runs a MusicLibrary read without taking its lock. Writers make `_version`
+    odd while they change anything and even again when done, so a read that
+    started and ended on the same even version saw one consistent library.
+    One that overlapped a write (or tripped over a collection changing under
+    it) is run again; after READ_ATTEMPTS tries it waits for the writer.
+    """
+    @functools.wraps(method)
+    def read(self, *args, **kwargs):
+        if self._writer == threading.get_ident():
+            return method(self, *args, **kwargs) # E.g. a listener reading during a write
+        for _ in range(READ_ATTEMPTS):
+            version = self._version
+            if version & 1:
+                time.sleep(0) # A write is in progress; let it finish
+                continue
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception:
+                if self._version == version:
+                    raise # A real error, not a torn read
+                result = None
+            if self._version == version:
+                return result
+            metrics.increment("library.read_retries")
+        with self._write_lock:
+            return method(self, *args, **kwargs)
+    return read
+
+def _locked_write(method):
+    """Runs a MusicLibrary change as one write (see MusicLibrary._writing)."""
+    @functools.wraps(method)
+    def write(self, *args, **kwargs):
+        with self._writing():
+            return method(self, *args, **kwargs)
+    return write
+
 # --- MediaItem Class ---
 class MediaItem:
+    __slots__ = ("title", "duration")
+
     def __init__(self, title, duration):
         self.title = title
         self.duration = duration
@@ -29,117 +340,748 @@ class MediaItem:
 
 # --- Song Class ---
 class Song(MediaItem):
+    __slots__ = ("artist", "genre", "filepath", "__play_count", "__last_played")
+
     def __init__(self, title, artist, duration, genre, filepath):
         super().__init__(title, duration)
         self.artist = artist
         self.genre = genre
         self.filepath = filepath
         self.__play_count = 0
+        self.__last_played = 0 # Unix time of the last play, 0 = never
         
     def play(self):
         self.__play_count += 1
+        self.__last_played = int(time.time())
         return f"🎵 Incrementing play count for: {self.title}"
     
     def get_play_count(self):
         return self.__play_count
+
+    def get_last_played(self):
+        return self.__last_played
+
+    def set_play_stats(self, play_count, last_played):
+        """Restores saved statistics (used when loading)."""
+        self.__play_count = int(play_count)
+        self.__last_played = int(last_played)
     
     def get_info(self):
         duration_str = _format_duration(self.duration)
         return f"{self.title} - {self.artist} ({self.genre}) [{duration_str}]"
     
     def to_string(self):
-        return (self.title, self.artist, str(self.duration), self.genre, self.filepath)
+        return (self.title, self.artist, str(self.duration), self.genre, self.filepath,
+                str(self.get_play_count()), str(self.get_last_played()))
+
+# --- SongStore Class ---
+class SongStore(MutableMapping):
+    """
+    Base class for storage backends that replace the in-memory dict behind
+    MusicLibrary.all_songs (see MusicLibrary.use_song_store).
+    A store is a key -> Song mapping; the hooks below have defaults that work
+    for any mapping and are overridden when a backend can do better.
+
+    A store that sets `serves_queries = True` also answers the lookups
+    (search, songs_by_prefix, sorted_songs, all_genres) itself, and the library
+    then keeps no indexes of its own.
+    """
+    serves_queries = False
+
+    def index_rows(self):
+        """Yields (key, artist, genre, duration) for every song, in insertion order."""
+        for key, song in self.items():
+            yield key, song.artist, song.genre, song.duration
+
+    def play_rows(self):
+        """Yields (key, artist, genre, play_count) for every song played at least once."""
+        for key, song in self.items():
+            play_count = song.get_play_count()
+            if play_count:
+                yield key, song.artist, song.genre, play_count
+
+    def rename_key(self, old_key, new_key, song):
+        """Moves `song` (already carrying its new title) from old_key to new_key."""
+        del self[old_key]
+        self[new_key] = song
+
+    def save_song(self, key, song):
+        """Called after a field of `song` was edited in place. Stores that keep
+        their own copy of the data write it back here."""
+
+    def record_play(self, key, song):
+        """Called after `song` was played. Stores that keep play counts on disk update them here."""
+
+    def batch(self):
+        """Context manager grouping many writes, e.g. into one transaction."""
+        return nullcontext()
+
+    def close(self):
+        """Releases open files or connections; called when the library switches to another store."""
+
+    def search(self, field, query_lower):
+        """Songs whose `field` ("artist" or "genre") contains query_lower, in insertion order."""
+        raise NotImplementedError
+
+    def songs_by_prefix(self, prefix, limit=None):
+        """Songs whose key starts with `prefix`, sorted by key."""
+        raise NotImplementedError
+
+    def sorted_songs(self, start=0, stop=None):
+        """The [start:stop] slice of all songs sorted by key."""
+        raise NotImplementedError
+
+    def all_genres(self):
+        """Sorted list of distinct genres."""
+        raise NotImplementedError
+
+    def top_played(self, n, field=None, value_lower=None):
+        """The n most played songs, optionally only those whose `field` equals value_lower."""
+        raise NotImplementedError
+
+    def query(self, artist_lower, genre_lower, min_duration, max_duration, order_by, limit):
+        """Songs matching every given filter, as described in MusicLibrary.query."""
+        raise NotImplementedError
 
 # --- MusicLibrary Class (SIMPLIFIED) ---
 class MusicLibrary:
+    """
+    Safe to use from several threads. Changes are serialized by one lock;
+    reads (lookups, searches, listings) don't take it and are retried if a
+    change overlapped them, so they never see e.g. half of a rename.
+    """
     def __init__(self):
         self.all_songs = {} # Key: "konservatif", Value: Song(...)
+        self._listeners = []
+        self._write_lock = threading.RLock()
+        self._writer = None # Thread id of the current writer
+        self._version = 0 # Odd while a write is in progress
+        self._reset_indexes()
+
+    @contextmanager
+    def _writing(self):
+        """Holds the write lock and marks the library as changing (nested writes count once)."""
+        with self._write_lock:
+            outermost = self._writer is None
+            if outermost:
+                self._writer = threading.get_ident()
+                self._version += 1
+            try:
+                yield
+            finally:
+                if outermost:
+                    self._version += 1
+                    self._writer = None
+
+    def exclusive(self):
+        """
+        Context manager that keeps every writer out for a while (e.g. during a
+        save that must match the journal). Readers are not affected.
+        """
+        return self._write_lock
+
+    def _reset_indexes(self):
         self.genres = set()
+        self._genre_counts = {} # Key: "Rock", Value: number of songs with that genre
+        self._artist_index = _SubstringIndex()
+        self._genre_index = _SubstringIndex()
+        self._duration_index = _RangeIndex()
+        self._insert_order = {} # Key: "konservatif", Value: insertion sequence number
+        self._next_order = 0
+        self._sorted_keys = [] # All keys of all_songs, kept sorted for bisect
+        self._indexes_ready = True
+        # Built on the first fuzzy search only; most sessions never need it.
+        self._title_words = _FuzzyWordIndex(values_are_keys=True)
+        self._artist_words = _FuzzyWordIndex()
+        self._fuzzy_ready = False
+        self._reset_rankings()
+
+    def _reset_rankings(self):
+        self._top_overall = _PlayRanking()
+        self._top_by_genre = {} # Key: "indie", Value: _PlayRanking
+        self._top_by_artist = {} # Key: "the adams", Value: _PlayRanking
+        self._rankings_ready = True
+
+    @_locked_write
+    def use_song_store(self, store):
+        """
+        Replaces all_songs with `store`, a SongStore such as a memory-mapped
+        catalog or a SQLite database. The indexes are rebuilt from it the first
+        time a search or listing needs them, so opening a huge store stays cheap;
+        stores that serve queries themselves never need them at all.
+        A SongStore being replaced is closed.
+        """
+        previous = self._store()
+        self.all_songs = store
+        if previous is not None and previous is not store:
+            previous.close()
+        self._reset_indexes()
+        self._indexes_ready = False
+        self._rankings_ready = False
+
+    def _store(self):
+        """Returns all_songs if it is a SongStore, else None (the default dict)."""
+        return self.all_songs if isinstance(self.all_songs, SongStore) else None
+
+    def _store_queries(self):
+        return isinstance(self.all_songs, SongStore) and self.all_songs.serves_queries
+
+    def _ensure_indexes(self):
+        if self._indexes_ready or self._store_queries():
+            return
+        with self._write_lock:
+            if not self._indexes_ready:
+                self._build_indexes()
+                # Set last: readers don't lock, and must not see a half-built index.
+                self._indexes_ready = True
+
+    def _build_indexes(self):
+        genre_counts = self._genre_counts
+        if self._store() is not None:
+            # Stores can list (key, artist, genre) without materializing every Song.
+            rows = self.all_songs.index_rows()
+        else:
+            rows = ((key, song.artist, song.genre, song.duration) for key, song in self.all_songs.items())
+        for key, artist, genre, duration in rows:
+            genre_counts[genre] = genre_counts.get(genre, 0) + 1
+            self._artist_index.add(artist, key)
+            self._genre_index.add(genre, key)
+            self._duration_index.add_unsorted(duration, key)
+            self._insert_order[key] = self._next_order
+            self._next_order += 1
+            self._sorted_keys.append(key)
+        self._sorted_keys.sort()
+        self._duration_index.sort()
+        self.genres.update(genre_counts)
+
+    def _ensure_fuzzy_index(self):
+        if self._fuzzy_ready:
+            return
+        with self._write_lock:
+            if not self._fuzzy_ready:
+                self._build_fuzzy_index()
+                self._fuzzy_ready = True
+
+    def _build_fuzzy_index(self):
+        if self._store() is not None:
+            rows = self.all_songs.index_rows()
+        else:
+            rows = ((key, song.artist, song.genre, song.duration) for key, song in self.all_songs.items())
+        for key, artist, _genre, _duration in rows:
+            self._title_words.add(key, key)
+            self._artist_words.add(artist, key)
+
+    def _ensure_rankings(self):
+        if self._rankings_ready or self._store_queries():
+            return
+        with self._write_lock:
+            if not self._rankings_ready:
+                self._build_rankings()
+                self._rankings_ready = True
+
+    def _build_rankings(self):
+        if self._store() is not None:
+            rows = self.all_songs.play_rows()
+        else:
+            rows = ((key, song.artist, song.genre, song.get_play_count())
+                    for key, song in self.all_songs.items() if song.get_play_count())
+        for key, artist, genre, play_count in rows:
+            self._rank(key, artist, genre, 0, play_count)
+
+    def _rank(self, key, artist, genre, old_count, new_count):
+        """Moves `key` from old_count to new_count in the overall, genre and artist rankings."""
+        self._top_overall.update(key, old_count, new_count)
+        for rankings, value in ((self._top_by_genre, genre.lower()), (self._top_by_artist, artist.lower())):
+            ranking = rankings.get(value)
+            if ranking is None:
+                ranking = rankings[value] = _PlayRanking()
+            ranking.update(key, old_count, new_count)
+
+    @metrics.timed("library.record_play")
+    @_locked_write
+    def record_play(self, song):
+        """
+        Counts one play of `song` (called by AudioPlayer when a track starts).
+        A song no longer in the library (deleted while queued) still counts the
+        play on its own, but there is nothing to rank or tell the listeners.
+        """
+        message = song.play()
+        key = song.title.lower()
+        if self.all_songs.get(key) != song:
+            return message
+        if self._rankings_ready:
+            play_count = song.get_play_count()
+            self._rank(key, song.artist, song.genre, play_count - 1, play_count)
+        if self._store() is not None:
+            self.all_songs.record_play(key, song)
+        self._notify("play", song, key)
+        return message
+
+    def add_listener(self, callback):
+        """
+        Registers callback(action, song, old_key, change) to run after every change.
+        `action` is "add", "edit", "delete" or "play"; `old_key` is the song's key
+        before the change (it only differs from the current one after a title rename).
+        For an "edit", `change` is (field, old value); otherwise it is None.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, action, song, old_key, change=None):
+        for callback in self._listeners:
+            callback(action, song, old_key, change)
+
+    def _index_song(self, key, song):
+        if self._rankings_ready:
+            self._rank(key, song.artist, song.genre, 0, song.get_play_count())
+        if self._fuzzy_ready:
+            self._title_words.add(key, key)
+            self._artist_words.add(song.artist, key)
+        if not self._indexes_ready:
+            return
+        self._count_genre(song.genre, 1)
+        self._artist_index.add(song.artist, key)
+        self._genre_index.add(song.genre, key)
+        self._duration_index.add(song.duration, key)
+        self._insert_order[key] = self._next_order
+        self._next_order += 1
+        insort(self._sorted_keys, key)
+
+    def _unindex_song(self, key, song):
+        if self._rankings_ready:
+            self._rank(key, song.artist, song.genre, song.get_play_count(), 0)
+        if self._fuzzy_ready:
+            self._title_words.remove(key, key)
+            self._artist_words.remove(song.artist, key)
+        if not self._indexes_ready:
+            return
+        self._count_genre(song.genre, -1)
+        self._artist_index.remove(song.artist, key)
+        self._genre_index.remove(song.genre, key)
+        self._duration_index.remove(key)
+        del self._insert_order[key]
+        del self._sorted_keys[bisect_left(self._sorted_keys, key)]
+
+    def _count_genre(self, genre, change):
+        """Keeps `genres` to the genres some song still has."""
+        count = self._genre_counts.get(genre, 0) + change
+        if count > 0:
+            self._genre_counts[genre] = count
+            self.genres.add(genre)
+        else:
+            self._genre_counts.pop(genre, None)
+            self.genres.discard(genre)
+
+    def _song_edited(self, song, key, change):
+        """Writes an in-place edit back to the store and tells the listeners."""
+        if self._store() is not None:
+            self.all_songs.save_song(key, song)
+        self._notify("edit", song, key, change)
+
+    def _reindex_field(self, index, old_value, new_value, key):
+        if self._indexes_ready:
+            index.remove(old_value, key)
+            index.add(new_value, key)
+
+    def _rerank_group(self, rankings, old_value, new_value, key, song):
+        play_count = song.get_play_count()
+        if not (self._rankings_ready and play_count):
+            return
+        old_ranking = rankings.get(old_value.lower())
+        if old_ranking is not None:
+            old_ranking.update(key, play_count, 0)
+        rankings.setdefault(new_value.lower(), _PlayRanking()).update(key, 0, play_count)
+
+    def _prefix_range(self, prefix):
+        """Returns the (start, stop) slice of _sorted_keys whose keys start with `prefix`."""
+        start = bisect_left(self._sorted_keys, prefix)
+        stop = start
+        while stop < len(self._sorted_keys) and self._sorted_keys[stop].startswith(prefix):
+            stop += 1
+        return start, stop
+
+    def _songs_for_keys(self, keys):
+        """Returns the songs for `keys` in library insertion order, like a full scan would."""
+        ordered = sorted(keys, key=self._insert_order.__getitem__)
+        return [self.all_songs[key] for key in ordered]
         
+    @metrics.timed("library.add_song")
+    @_locked_write
     def add_song(self, title, artist, duration, genre, filepath):
         key = title.lower()
         if key in self.all_songs:
             return f"⚠️ Song '{title}' already exists in library!"
         new_song = Song(title, artist, duration, genre, filepath)
         self.all_songs[key] = new_song
-        self.genres.add(genre)
+        self._index_song(key, new_song)
+        self._notify("add", new_song, key)
         return f"✅ Added song: {new_song.get_info()}"
     
+    @metrics.timed("library.add_songs_bulk")
+    @_locked_write
+    def add_songs_bulk(self, rows, on_reject=None):
+        """
+        Adds many (title, artist, duration, genre, filepath) rows in one pass;
+        rows may carry two more fields, the saved play count and last-played time.
+        Unlike add_song no message is built per song; rows that can't be added
+        are passed to on_reject(row, reason) instead. Returns the number added.
+        """
+        store = self._store()
+        with store.batch() if store is not None else nullcontext():
+            return self._add_rows(rows, on_reject)
+
+    def _add_rows(self, rows, on_reject):
+        all_songs = self.all_songs
+        genre_counts = self._genre_counts
+        indexed = self._indexes_ready
+        fuzzy = self._fuzzy_ready
+        ranked = self._rankings_ready
+        new_keys = []
+        added = 0
+        try:
+            for row in rows:
+                title, artist, duration, genre, filepath, *play_stats = row
+                key = title.lower()
+                if key in all_songs:
+                    if on_reject is not None:
+                        on_reject(row, "duplicate title")
+                    continue
+                song = Song(title, artist, duration, genre, filepath)
+                if play_stats:
+                    song.set_play_stats(*play_stats)
+                    if ranked and play_stats[0]:
+                        self._rank(key, artist, genre, 0, song.get_play_count())
+                all_songs[key] = song
+                if indexed:
+                    if genre not in genre_counts:
+                        self.genres.add(genre)
+                    genre_counts[genre] = genre_counts.get(genre, 0) + 1
+                    self._artist_index.add(artist, key)
+                    self._genre_index.add(genre, key)
+                    self._duration_index.add_unsorted(duration, key)
+                    self._insert_order[key] = self._next_order
+                    self._next_order += 1
+                    new_keys.append(key)
+                if fuzzy:
+                    self._title_words.add(key, key)
+                    self._artist_words.add(artist, key)
+                added += 1
+                if self._listeners:
+                    self._notify("add", song, key)
+        finally:
+            # One sort for the whole batch instead of an insort per song. Also done when
+            # `rows` raises partway (e.g. a decode error), so the indexes keep every added key.
+            if new_keys:
+                self._sorted_keys.extend(new_keys)
+                self._sorted_keys.sort()
+                self._duration_index.sort()
+        return added
+
+    @metrics.timed("library.get_song")
+    @_snapshot_read
     def get_song(self, title_input):
         key = title_input.lower()
         song = self.all_songs.get(key)
         if song:
             return song
-        for song_key, song_obj in self.all_songs.items():
-            if song_key.startswith(key):
-                return song_obj
+        # Fall back to the lexicographically first title that starts with the input.
+        if self._store_queries():
+            matches = self.all_songs.songs_by_prefix(key, limit=1)
+            return matches[0] if matches else None
+        self._ensure_indexes()
+        start = bisect_left(self._sorted_keys, key)
+        if start < len(self._sorted_keys) and self._sorted_keys[start].startswith(key):
+            return self.all_songs[self._sorted_keys[start]]
         return None
+
+    @metrics.timed("library.get_songs_by_prefix")
+    @_snapshot_read
+    def get_songs_by_prefix(self, title_prefix):
+        """Returns every song whose title starts with `title_prefix`, sorted by title."""
+        if self._store_queries():
+            return self.all_songs.songs_by_prefix(title_prefix.lower())
+        self._ensure_indexes()
+        start, stop = self._prefix_range(title_prefix.lower())
+        return [self.all_songs[key] for key in self._sorted_keys[start:stop]]
     
+    @metrics.timed("library.search_by_artist")
+    @_snapshot_read
     def search_by_artist(self, artist_input):
         query_lower = artist_input.lower()
-        results = [song for song in self.all_songs.values() 
-                   if query_lower in song.artist.lower()]
-        return results
+        if self._store_queries():
+            return self.all_songs.search("artist", query_lower)
+        self._ensure_indexes()
+        return self._songs_for_keys(self._artist_index.search(query_lower))
     
+    @metrics.timed("library.search_by_genre")
+    @_snapshot_read
     def search_by_genre(self, genre_input):
         query_lower = genre_input.lower()
-        results = [song for song in self.all_songs.values() 
-                   if query_lower in song.genre.lower()]
-        return results
+        if self._store_queries():
+            return self.all_songs.search("genre", query_lower)
+        self._ensure_indexes()
+        return self._songs_for_keys(self._genre_index.search(query_lower))
     
+    @metrics.timed("library.fuzzy_search")
+    @_snapshot_read
+    def fuzzy_search(self, query, limit=10):
+        """
+        Returns up to `limit` songs whose title and artist words best match
+        `query`, best first. Typos and unfinished words are tolerated
+        ("bohemain rhap" finds "Bohemian Rhapsody"): each query word adds the
+        similarity of its closest word in the song to the song's score.
+        """
+        tokens = list(dict.fromkeys(_words(query.lower())))
+        if not tokens or limit <= 0:
+            return []
+        self._ensure_fuzzy_index()
+        token_matches = []
+        for token in tokens:
+            postings = [] # (set of song keys, similarity)
+            for index in (self._title_words, self._artist_words):
+                for word, similarity in index.match(token):
+                    postings.extend((keys, similarity) for keys in index.keys_for(word))
+            token_matches.append((sum(len(keys) for keys, _ in postings), postings))
+        # Rarest words first: they pick the candidates, common ones only re-rank them.
+        token_matches.sort(key=lambda match: match[0])
+        scores = {}
+        for size, postings in token_matches:
+            best = {}
+            if size <= FUZZY_EXPAND_LIMIT or not scores:
+                for keys, similarity in postings:
+                    for key in keys:
+                        if best.get(key, 0) < similarity:
+                            best[key] = similarity
+            else:
+                for key in scores:
+                    for keys, similarity in postings:
+                        if key in keys and best.get(key, 0) < similarity:
+                            best[key] = similarity
+            for key, similarity in best.items():
+                scores[key] = scores.get(key, 0) + similarity
+        top = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [self.all_songs[key] for key, _ in top]
+
+    @_locked_write
+    def restore_play_stats(self, song, play_count, last_played):
+        """Sets a song's saved play count and last-played time (e.g. from a journal)."""
+        key = song.title.lower()
+        old_count = song.get_play_count()
+        song.set_play_stats(play_count, last_played)
+        if self._rankings_ready:
+            self._rank(key, song.artist, song.genre, old_count, song.get_play_count())
+        if self._store() is not None:
+            self.all_songs.save_song(key, song)
+
+    @metrics.timed("library.top_played")
+    @_snapshot_read
+    def top_played(self, n=10, genre=None, artist=None):
+        """
+        Returns the n most played songs, most played first, optionally only
+        those of one genre or artist (matched case-insensitively). Songs never
+        played are not included.
+        """
+        field, value = ("genre", genre) if genre is not None else ("artist", artist)
+        if value is not None:
+            value = value.lower()
+        if self._store_queries():
+            return self.all_songs.top_played(n, field if value is not None else None, value)
+        self._ensure_rankings()
+        if value is None:
+            ranking = self._top_overall
+        else:
+            ranking = (self._top_by_genre if field == "genre" else self._top_by_artist).get(value)
+            if ranking is None:
+                return []
+        return [self.all_songs[key] for key in ranking.top(n)]
+
+    @metrics.timed("library.query")
+    @_snapshot_read
+    def query(self, artist=None, genre=None, min_duration=None, max_duration=None, order_by="title", limit=None):
+        """
+        Returns the songs matching every given filter: `artist` contains the
+        text, `genre` equals it (both case-insensitive) and the duration is
+        between min_duration and max_duration seconds (inclusive, either may
+        be None). Sorted by `order_by` ("title" or "duration"), at most `limit`.
+        """
+        if order_by not in QUERY_ORDERS:
+            raise ValueError(f"Cannot order by '{order_by}'.")
+        artist_lower = artist.lower() if artist else None
+        genre_lower = genre.lower() if genre else None
+        if self._store_queries():
+            return self.all_songs.query(artist_lower, genre_lower, min_duration, max_duration, order_by, limit)
+        self._ensure_indexes()
+        keys = self._plan_query(artist_lower, genre_lower, min_duration, max_duration)
+        durations = self._duration_index.values
+        if keys is None:
+            # No filters: both orders are already kept sorted.
+            ordered = self._sorted_keys[:limit] if order_by == "title" else self._duration_index.keys(0, limit)
+        elif order_by == "title":
+            ordered = sorted(keys) if limit is None else heapq.nsmallest(limit, keys)
+        else:
+            sort_key = lambda key: (durations[key], key)
+            ordered = sorted(keys, key=sort_key) if limit is None else heapq.nsmallest(limit, keys, key=sort_key)
+        return [self.all_songs[key] for key in ordered]
+
+    def _plan_query(self, artist_lower, genre_lower, min_duration, max_duration):
+        """
+        Returns the set of keys matching all filters, or None if there are none.
+        Each filter's match count is known up front (hash lookup, bisect, or the
+        artist values the trigram index found), so the smallest one picks the
+        candidates and the others narrow them down, most selective first.
+        """
+        filters = [] # (match count, fetch() -> keys, test(key) -> bool)
+        if genre_lower is not None:
+            genre_keys = self._genre_index.keys_for_value(genre_lower)
+            filters.append((len(genre_keys), lambda: genre_keys, genre_keys.__contains__))
+        if min_duration is not None or max_duration is not None:
+            start, stop = self._duration_index.range(min_duration, max_duration)
+            durations = self._duration_index.values
+            low = min_duration if min_duration is not None else -math.inf
+            high = max_duration if max_duration is not None else math.inf
+            filters.append((stop - start, lambda: self._duration_index.keys(start, stop),
+                            lambda key: low <= durations[key] <= high))
+        if artist_lower is not None:
+            values = self._artist_index.matching_values(artist_lower)
+            filters.append((self._artist_index.count(values), lambda: self._artist_index.keys_for(values),
+                            lambda key: artist_lower in self.all_songs[key].artist.lower()))
+        if not filters:
+            return None
+        filters.sort(key=lambda item: item[0])
+        size, fetch, _ = filters[0]
+        keys = set(fetch()) if size else set()
+        for size, fetch, test in filters[1:]:
+            if not keys:
+                break
+            if size <= len(keys) * QUERY_PROBE_RATIO:
+                keys.intersection_update(fetch())
+            else:
+                # Much bigger than what is left: checking each candidate beats building its key set.
+                keys = {key for key in keys if test(key)}
+        return keys
+
+    @metrics.timed("library.show_all_songs")
+    @_snapshot_read
     def show_all_songs(self):
         if len(self.all_songs) == 0:
             return "🎵 Library is empty! Add some songs first."
-        result = f"\n{'='*60}\nALL SONGS IN LIBRARY\n{'='*60}\n"
-        sorted_keys = sorted(self.all_songs.keys())
-        for index, key in enumerate(sorted_keys, start=1):
-            song = self.all_songs[key]
-            result += f"{index}. {song.get_info()} [Played: {song.get_play_count()}x]\n"
-        return result
+        header = f"\n{'='*60}\nALL SONGS IN LIBRARY\n{'='*60}\n"
+        lines = (f"{index}. {song.get_info()} [Played: {song.get_play_count()}x]\n"
+                 for index, song in enumerate(self.iter_sorted_songs(), start=1))
+        return header + "".join(lines)
     
+    @_snapshot_read
     def get_all_genres(self):
+        if self._store_queries():
+            return self.all_songs.all_genres()
+        self._ensure_indexes()
         return sorted(list(self.genres))
 
+    @metrics.timed("library.edit_song")
+    @_locked_write
     def edit_song(self, song, field_to_edit, new_value):
+        old_key = song.title.lower()
+        if self.all_songs.get(old_key) != song:
+            # Deleted or renamed (e.g. by another thread) since it was looked up.
+            return f"❌ Edit failed. '{song.title}' is no longer in the library."
+        change = (field_to_edit, getattr(song, field_to_edit, None))
         try:
             if field_to_edit == "title":
-                old_key = song.title.lower()
                 new_key = new_value.lower()
                 if old_key == new_key:
                     song.title = new_value
+                    self._song_edited(song, old_key, change)
                     return f"✅ Title capitalization updated for '{new_value}'."
                 if new_key in self.all_songs:
                     return f"❌ Edit failed. A song with title '{new_value}' already exists."
+                self._unindex_song(old_key, song)
                 song.title = new_value
-                del self.all_songs[old_key]
-                self.all_songs[new_key] = song
+                if self._store() is not None:
+                    self.all_songs.rename_key(old_key, new_key, song)
+                else:
+                    del self.all_songs[old_key]
+                    self.all_songs[new_key] = song
+                self._index_song(new_key, song)
+                self._notify("edit", song, old_key, change)
                 return f"✅ Title updated to '{new_value}'."
             elif field_to_edit == "artist":
+                self._reindex_field(self._artist_index, song.artist, new_value, old_key)
+                if self._fuzzy_ready:
+                    self._artist_words.remove(song.artist, old_key)
+                    self._artist_words.add(new_value, old_key)
+                self._rerank_group(self._top_by_artist, song.artist, new_value, old_key, song)
                 song.artist = new_value
+                self._song_edited(song, old_key, change)
                 return f"✅ Artist updated to '{new_value}'."
             elif field_to_edit == "duration":
-                song.duration = int(new_value)
+                new_duration = int(new_value)
+                if self._indexes_ready:
+                    self._duration_index.remove(old_key)
+                    self._duration_index.add(new_duration, old_key)
+                song.duration = new_duration
+                self._song_edited(song, old_key, change)
                 return f"✅ Duration updated to '{_format_duration(new_value)}'."
             elif field_to_edit == "genre":
+                self._reindex_field(self._genre_index, song.genre, new_value, old_key)
+                if self._indexes_ready:
+                    self._count_genre(song.genre, -1)
+                    self._count_genre(new_value, 1)
+                self._rerank_group(self._top_by_genre, song.genre, new_value, old_key, song)
                 song.genre = new_value
+                self._song_edited(song, old_key, change)
                 return f"✅ Genre updated to '{new_value}'."
             elif field_to_edit == "filepath":
                 song.filepath = new_value
+                self._song_edited(song, old_key, change)
                 return f"✅ Filepath updated for '{song.title}'."
         except ValueError:
             return "❌ Edit failed. Duration must be a number."
         except Exception as e:
             return f"❌ An unexpected error occurred: {e}"
 
+    @metrics.timed("library.delete_song")
+    @_locked_write
     def delete_song(self, title_input):
         song = self.get_song(title_input)
         if not song:
             return f"❌ Song '{title_input}' not found."
         key = song.title.lower()
         del self.all_songs[key]
+        self._unindex_song(key, song)
+        self._notify("delete", song, key)
         # No longer need to remove from playlists
         return f"✅ Successfully deleted '{song.title}' from the library."
 
-    def get_sorted_song_list(self):
-        sorted_keys = sorted(self.all_songs.keys())
-        return [self.all_songs[key] for key in sorted_keys]
\ No newline at end of file
+    @metrics.timed("library.get_sorted_song_list")
+    @_snapshot_read
+    def get_sorted_song_list(self, start=0, stop=None):
+        """Returns the songs sorted by title, optionally only the [start:stop] slice."""
+        if self._store_queries():
+            return self.all_songs.sorted_songs(start, stop)
+        self._ensure_indexes()
+        return [self.all_songs[key] for key in self._sorted_keys[start:stop]]
+
+    def iter_sorted_songs(self, start=0, stop=None):
+        """
+        Yields the songs sorted by title without building the whole list first.
+        The order is fixed when iteration starts; songs deleted or renamed
+        while it runs are skipped.
+        """
+        if self._store_queries():
+            yield from self.all_songs.sorted_songs(start, stop)
+            return
+        self._ensure_indexes()
+        for key in self._sorted_keys[start:stop]: # Slicing copies the keys in one step
+            song = self.all_songs.get(key)
+            if song is not None:
+                yield song
+
+    @_snapshot_read
+    def get_all_songs(self):
+        """Returns every song, in insertion order, as one consistent list."""
+        return list(self.all_songs.values())
+
+    def song_count(self):
+        return len(self.all_songs)
\ No newline at end of file
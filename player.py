@@ -3,56 +3,865 @@ Player Module
 Handles file operations for songs.
 """
 
-def save_songs_to_file(library, filename="songs.txt"):
+import os
+import sys
+from collections import deque
+import threading
+import time
+
+import metrics
+from music_library import MusicLibrary
+from song_catalog import MAGIC, SongCatalog, CatalogSongMap, read_generation, write_catalog
+from sqlite_store import SqliteSongStore
+
+JOURNAL_SUFFIX = ".journal"
+CONFLICTS_SUFFIX = ".conflicts"
+WATCH_INTERVAL_SECONDS = 2.0
+SONGS_FILE_HEADER = "TITLE|ARTIST|DURATION|GENRE|FILEPATH|PLAY_COUNT|LAST_PLAYED\n"
+
+GENERATION_FIELD = "GENERATION="
+_EDIT_FIELDS = ("title", "artist", "duration", "genre", "filepath")
+
+def _journal_filename(filename):
+    return filename + JOURNAL_SUFFIX
+
+
+def _new_generation():
+    """A fresh id for a full save; journals started against an older one are stale."""
+    return int.from_bytes(os.urandom(8), "little")
+
+
+def _base_generation(filename):
+    """The generation stamped into songs.txt / songs.bin by the last full save, or None (no file, older format)."""
+    try:
+        with open(filename, 'rb') as file:
+            header = file.readline(1024)
+    except OSError:
+        return None
+    if header.startswith(MAGIC):
+        return read_generation(filename)
+    for field in header.decode('utf-8', 'replace').rstrip("\r\n").split('|'):
+        if field.startswith(GENERATION_FIELD):
+            try:
+                return int(field[len(GENERATION_FIELD):])
+            except ValueError:
+                return None
+    return None
+
+
+class SongJournal:
+    """
+    Append-only log of the library changes made since songs.txt was last written.
+    Once attached to a MusicLibrary, every add/edit/delete/play becomes one line:
+        BASE|generation                (first line: the full save these changes follow)
+        ADD|title|artist|duration|genre|filepath|play count|last played
+        EDIT|old key|field|old value|new value
+        DEL|key|title|artist|duration|genre|filepath|play count|last played
+        PLAY|key|play count|last played
+    load_songs_from_file replays these lines on top of songs.txt. An EDIT names
+    only the field that changed, so replaying it leaves the rest of the row alone.
+    (Journals from older versions have whole-row EDIT lines instead:
+    EDIT|old key|title|artist|duration|genre|filepath|play count|last played.)
+    """
+    
+    def __init__(self, filename="songs.txt", compact_after=1000):
+        self.base_filename = filename
+        self.filename = _journal_filename(filename)
+        self.compact_after = compact_after
+        self.entry_count = self._count_existing_entries()
+        self.pending = 0
+        self._file = None
+
+    def _count_existing_entries(self):
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file:
+                return sum(1 for line in file if not line.startswith("BASE|"))
+        except FileNotFoundError:
+            return 0
+
+    def attach(self, library):
+        library.add_listener(self.record)
+
+    def detach(self, library):
+        library.remove_listener(self.record)
+
+    def record(self, action, song, old_key, change=None):
+        """Library listener: appends one line describing the change."""
+        if self._file is None:
+            self._file = open(self.filename, 'a', encoding='utf-8')
+            if self._file.tell() == 0:
+                self._file.write(f"BASE|{_base_generation(self.base_filename)}\n")
+        if action == "delete":
+            line = f"DEL|{old_key}|" + "|".join(song.to_string())
+        elif action == "play":
+            line = f"PLAY|{old_key}|{song.get_play_count()}|{song.get_last_played()}"
+        elif action == "add":
+            line = "ADD|" + "|".join(song.to_string())
+        else:
+            field, old_value = change
+            line = f"EDIT|{old_key}|{field}|{old_value}|{getattr(song, field)}"
+        self._file.write(line + "\n")
+        self.entry_count += 1
+        self.pending += 1
+
+    def flush(self):
+        """Forces recorded lines to disk. Returns how many were written since the last flush."""
+        written = self.pending
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.pending = 0
+        return written
+
+    def needs_compaction(self):
+        return self.entry_count > self.compact_after
+
+    def reset(self):
+        """Empties the journal once its changes have been written into songs.txt."""
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        self.entry_count = 0
+        self.pending = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _can_append_to_journal(journal, filename):
+    return journal is not None and not journal.needs_compaction() and os.path.exists(filename)
+
+
+def _flush_journal(journal):
+    start = time.perf_counter()
+    try:
+        written = journal.flush()
+    except IOError as e:
+        metrics.increment("player.save_errors")
+        return f"❌ Error saving file: {e}"
+    _record_io("journal_flush", start, written)
+    return f"✅ Saved {written} change(s) to {journal.filename}"
+
+
+def _record_io(operation, start, songs, filename=None):
+    """Records the duration, song count, file size and throughput of a load or save."""
+    elapsed = time.perf_counter() - start
+    metrics.observe_ms(f"player.{operation}", elapsed * 1000)
+    metrics.increment(f"player.{operation}.songs", songs)
+    if filename is not None:
+        try:
+            metrics.increment(f"player.{operation}.bytes", os.path.getsize(filename))
+        except OSError:
+            pass
+    if elapsed > 0:
+        metrics.set_gauge(f"player.{operation}.songs_per_second", songs / elapsed)
+
+
+def _discard_journal(filename, journal):
+    """Drops the journal of `filename` after everything in it was written to the base file."""
+    if journal is not None:
+        journal.reset()
+    elif os.path.exists(_journal_filename(filename)):
+        os.remove(_journal_filename(filename))
+
+
+def save_songs_to_file(library, filename="songs.txt", journal=None):
     """
     Save all songs to a text file
     Uses: File handling (write mode), Exception handling, Loops
+    With a journal, only the pending journal lines are flushed until it grows
+    past its compact_after limit (or there is no base file yet). A full save (compaction) writes to a temp file
+    and renames it over songs.txt, so a crash never leaves a truncated library.
     """
+    if _can_append_to_journal(journal, filename):
+        with library.exclusive():
+            return _flush_journal(journal)
+
+    start = time.perf_counter()
+    temp_filename = filename + ".tmp"
     try:
-        with open(filename, 'w', encoding='utf-8') as file:
-            file.write("TITLE|ARTIST|DURATION|GENRE|FILEPATH\n")
-            
-            for song in library.all_songs.values():
-                song_data = song.to_string()
-                line = "|".join(song_data)
-                file.write(line + "\n")
+        # No changes (e.g. plays from the playback thread) between writing and dropping the journal.
+        with library.exclusive():
+            with open(temp_filename, 'w', encoding='utf-8') as file:
+                file.write(SONGS_FILE_HEADER.rstrip("\n") + f"|{GENERATION_FIELD}{_new_generation()}\n")
+                
+                for song in library.all_songs.values():
+                    song_data = song.to_string()
+                    line = "|".join(song_data)
+                    file.write(line + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_filename, filename)
+            _discard_journal(filename, journal)
+        _record_io("save", start, len(library.all_songs), filename)
         
         return f"✅ Saved {len(library.all_songs)} songs to {filename}"
     
     except IOError as e:
+        metrics.increment("player.save_errors")
         return f"❌ Error saving file: {e}"
     except Exception as e:
+        metrics.increment("player.save_errors")
         return f"❌ Unexpected error: {e}"
 
 
-def load_songs_from_file(library, filename="songs.txt"):
+def _replay_journal(library, filename):
+    """
+    Re-applies the journal of `filename` on top of the songs already loaded.
+    A journal whose BASE generation is not the file's is stale: a crash after a
+    full save but before the journal was deleted left it behind, and its changes
+    are already in the file. Replaying it again is not safe (an EDIT of a title
+    that was later re-added would hit the new song), so it is deleted instead.
+    The file may also have been edited by hand since (e.g. while the program
+    was closed). A change is only replayed onto a song that still has the value
+    it changed from; otherwise the file's version is kept, the change is a
+    conflict, and it is dropped from the journal so it isn't reported again.
+    A torn last line from a crash is ignored.
+    Returns (number of changes applied, [(title, reason, line or None), ...]).
+    """
+    journal_filename = _journal_filename(filename)
+    try:
+        file = open(journal_filename, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return 0, []
+
+    applied = 0
+    conflicts = [] # (title, reason, the program's line or None)
+    kept = [] # Journal lines without the conflicting ones
+    with file:
+        for line in file:
+            line = line.rstrip("\r\n")
+            found = len(conflicts)
+            parts = line.split('|')
+            action = parts[0]
+            if action == "BASE":
+                generation = _base_generation(filename)
+                if len(parts) == 2 and generation is not None and parts[1] != str(generation):
+                    break
+            elif action == "DEL" and len(parts) in (2, 9):
+                song = library.all_songs.get(parts[1])
+                # Older journals name only the key; newer ones also keep the row as it was deleted.
+                row = _journal_row(parts[2:7]) if len(parts) == 9 else None
+                if song is not None:
+                    if row is not None and not _same_song(song, row):
+                        conflicts.append((song.title, f"was deleted in the program but changed in {filename}", None))
+                    else:
+                        library.delete_song(song.title)
+                        applied += 1
+            elif action == "PLAY" and len(parts) == 4:
+                song = library.all_songs.get(parts[1])
+                play_stats = _parse_play_stats(parts[2:])
+                if song and play_stats:
+                    library.restore_play_stats(song, *play_stats)
+                    applied += 1
+            elif action == "EDIT" and len(parts) == 5 and parts[2] in _EDIT_FIELDS:
+                applied += _replay_edit(library, filename, *parts[1:], conflicts)
+            elif action in ("ADD", "EDIT") and len(parts) > 1:
+                applied += _replay_row(library, filename, action, parts, conflicts)
+            if len(conflicts) == found:
+                kept.append(line)
+        else:
+            if conflicts:
+                _rewrite_journal(journal_filename, kept)
+            return applied, conflicts
+    os.remove(journal_filename) # Stale (see above)
+    metrics.increment("player.stale_journals")
+    return 0, []
+
+
+def _journal_row(fields):
+    """(title, artist, duration, genre, filepath) from journal fields, as _same_song compares them."""
+    title, artist, duration, genre, filepath = fields[:5]
+    try:
+        return title, artist, int(duration), genre, filepath
+    except ValueError:
+        return None
+
+
+def _replay_edit(library, filename, old_key, field, old_value, new_value, conflicts):
+    """Replays one EDIT of a single field. Returns 1 if it was applied."""
+    song = library.all_songs.get(old_key)
+    if song is None:
+        if field != "title" or new_value.lower() not in library.all_songs:
+            conflicts.append((old_key, f"was edited in the program but is no longer in {filename}", None))
+        return 0 # Otherwise already renamed in the file
+    current = str(getattr(song, field))
+    if current == new_value:
+        return 0 # The file already has it
+    row = list(song.to_string())
+    row[_EDIT_FIELDS.index(field)] = new_value
+    if current != old_value:
+        conflicts.append((song.title, f"had its {field} changed both in the program and in {filename}", "|".join(row)))
+        return 0
+    result = library.edit_song(song, field, new_value)
+    if result.startswith("❌"):
+        conflicts.append((song.title, result.lstrip("❌ "), "|".join(row)))
+        return 0
+    return 1
+
+
+def _replay_row(library, filename, action, parts, conflicts):
+    """Replays an ADD, or a whole-row EDIT from an older journal. Returns 1 if it was applied."""
+    if action == "ADD":
+        fields = parts[1:]
+        old_key = fields[0].lower()
+    else:
+        fields = parts[2:]
+        old_key = parts[1]
+    if len(fields) not in (5, 7):
+        return 0
+    row = _journal_row(fields)
+    play_stats = _parse_play_stats(fields[5:]) if len(fields) == 7 else None
+    if row is None:
+        return 0
+    title, artist, duration, genre, filepath = row
+    song = library.all_songs.get(old_key) or library.all_songs.get(title.lower())
+    if song is None:
+        library.add_song(title, artist, duration, genre, filepath)
+        song = library.all_songs.get(title.lower())
+    elif action == "ADD":
+        if not _same_song(song, row):
+            conflicts.append((title, f"was added in the program but {filename} has a different '{song.title}'",
+                              "|".join(fields)))
+            return 0
+    else:
+        # Older journals don't say which field an EDIT changed, so the whole row is replayed.
+        _update_song(library, song, title, artist, duration, genre, filepath)
+    if song is not None and play_stats:
+        library.restore_play_stats(song, *play_stats)
+    return 1
+
+
+def _rewrite_journal(journal_filename, lines):
+    temp_filename = journal_filename + ".tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as file:
+        file.write("".join(line + "\n" for line in lines))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, journal_filename)
+
+
+def _journal_conflicts(filename, conflicts):
+    """Saves the journal changes that conflicted with the file and describes them ("" if none)."""
+    if not conflicts:
+        return ""
+    metrics.increment("player.journal_conflicts", len(conflicts))
+    return _save_conflicts(filename, conflicts, f"the version in {filename}")
+
+
+def _save_conflicts(filename, conflicts, kept):
+    """Appends the program's side of each conflict to `filename`.conflicts and describes the conflicts."""
+    conflicts_filename = filename + CONFLICTS_SUFFIX
+    lines = [line for _, _, line in conflicts if line is not None]
+    if lines:
+        new_file = not os.path.exists(conflicts_filename)
+        with open(conflicts_filename, 'a', encoding='utf-8') as file:
+            if new_file:
+                file.write(SONGS_FILE_HEADER)
+            file.write("\n".join(lines) + "\n")
+    message = f"\n⚠️ {len(conflicts)} conflicting change(s) kept {kept}"
+    message += f" (lines saved to {conflicts_filename}):" if lines else ":"
+    return message + "".join(f"\n  '{title}' {reason}" for title, reason, _ in conflicts)
+
+
+def _update_song(library, song, title, artist, duration, genre, filepath):
+    """Edits only the fields of `song` that differ, so the Song object (and its play count) is kept."""
+    for field, value in (("title", title), ("artist", artist), ("duration", duration),
+                         ("genre", genre), ("filepath", filepath)):
+        if getattr(song, field) != value:
+            library.edit_song(song, field, value)
+
+
+def _parse_play_stats(fields):
+    """Returns (play_count, last_played) from two text fields, or None if invalid."""
+    try:
+        play_count, last_played = int(fields[0]), int(fields[1])
+    except (ValueError, IndexError):
+        return None
+    if play_count < 0 or last_played < 0:
+        return None
+    return play_count, last_played
+
+
+def _parse_song_lines(file, position, reject):
+    """
+    Yields (title, artist, duration, genre, filepath, play_count, last_played)
+    rows from an open songs file, one line at a time. Files written before play
+    statistics were saved have five fields; their songs start at zero plays. `position` is a one-item list holding the current line
+    number so rejected rows can be reported where they came from.
+    """
+    for line_number, line in enumerate(file, start=1):
+        position[0] = line_number
+        if line_number == 1:
+            continue # Header row
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        row, reason = _parse_song_line(line)
+        if row is None:
+            reject(line, reason)
+            continue
+        yield row
+
+
+def _parse_song_line(line):
+    """Returns (row, None) for one line of a songs file, or (None, reason) if it can't be loaded."""
+    parts = line.strip().split('|')
+    if len(parts) not in (5, 7):
+        return None, "expected 5 or 7 fields separated by '|'"
+    title, artist, duration, genre, filepath = parts[:5]
+    try:
+        duration = int(duration)
+    except ValueError:
+        return None, "invalid duration"
+    play_stats = _parse_play_stats(parts[5:]) if len(parts) == 7 else (0, 0)
+    if play_stats is None:
+        return None, "invalid play count or last played time"
+    return (title, artist, duration, genre, filepath, *play_stats), None
+
+
+def load_songs_from_file(library, filename="songs.txt", report=None):
     """
     Load songs from a text file
     Uses: File handling (read mode), Exception handling
+    The file is streamed line by line into library.add_songs_bulk, then any
+    changes recorded in its journal are replayed. Rows that can't be loaded are
+    appended to `report` (if given) as
+    {"line": 7, "reason": "invalid duration", "text": "..."} instead of printed.
     """
+    start = time.perf_counter()
+    skipped = []
+    position = [0]
+
+    def reject(row, reason):
+        text = row if isinstance(row, str) else "|".join(str(part) for part in row)
+        skipped.append({"line": position[0], "reason": reason, "text": text})
+
     try:
         with open(filename, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-            
-            count = 0
-            for line in lines[1:]:
-                parts = line.strip().split('|')
-                
-                if len(parts) == 5:
-                    title, artist, duration, genre, filepath = parts
-                    try:
-                        library.add_song(title, artist, int(duration), genre, filepath)
-                        count += 1
-                    except ValueError:
-                         print(f"Skipping song with invalid duration: {title}")
-                else:
-                    print(f"Skipping malformed line: {line.strip()}")
-        
-        return f"✅ Loaded {count} songs from {filename}"
+            count = library.add_songs_bulk(_parse_song_lines(file, position, reject),
+                                           on_reject=reject)
+        replayed, conflicts = _replay_journal(library, filename)
     
     except FileNotFoundError:
         return f"⚠️ File '{filename}' not found. Starting with empty library."
     except ValueError as e:
         return f"❌ Error reading file data: {e}"
     except Exception as e:
-        return f"❌ Unexpected error: {e}"
\ No newline at end of file
+        return f"❌ Unexpected error: {e}"
+    finally:
+        if report is not None:
+            report.extend(skipped)
+        metrics.increment("player.malformed_rows", len(skipped))
+
+    _record_io("load", start, count, filename)
+    message = f"✅ Loaded {count} songs from {filename}"
+    if replayed:
+        message += f" (+{replayed} journal changes)"
+    if skipped:
+        message += f" (skipped {len(skipped)} malformed rows)"
+    return message + _journal_conflicts(filename, conflicts)
+
+
+class SongsFileWatcher:
+    """
+    Reloads songs.txt while the program runs, so it can be edited by hand.
+    The file is polled for a new mtime or size; then only the lines whose hash
+    wasn't seen before are parsed, and the difference is applied to the library
+    as adds, edits and deletes. Edited songs keep their Song object, so play
+    counts and queue entries survive; a new title on a removed song's file
+    path is a rename of that song.
+    A line for a song that was also changed in the program since songs.txt was
+    written is a conflict: the program's version is kept and the line is
+    appended to songs.txt.conflicts instead.
+    Reload messages from the background thread are queued, not printed; the
+    program shows them with pending_messages() when it draws its screen.
+    """
+
+    def __init__(self, library, filename="songs.txt", interval=WATCH_INTERVAL_SECONDS):
+        self.library = library
+        self.filename = filename
+        self.interval = interval
+        self._stat = self._read_stat()
+        self._lines = None # Key: hash of a line as last read, Value: song key; built on the first poll
+        # The listener fills these in under the library's write lock, so the
+        # watcher's thread only touches them inside library.exclusive().
+        self._changed = {} # Key: song key in the file, Value: "added", "edited" or "deleted" in the program
+        self._origins = {} # Key: key of a song renamed in the program, Value: its key in the file
+        self._played = set() # Keys in the file of songs played in the program
+        self._applying = False
+        self._messages = deque()
+        self._stop = threading.Event()
+        self._thread = None
+        self._track_journal()
+        library.add_listener(self._library_changed)
+
+    def _read_stat(self):
+        try:
+            info = os.stat(self.filename)
+        except OSError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="songs-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                message = self.poll()
+            except OSError as e:
+                message = f"⚠️ Could not reload {self.filename}: {e}"
+            if message:
+                self._messages.append(message)
+            if self._stop.wait(self.interval):
+                return
+
+    def pending_messages(self):
+        """Returns (and forgets) the messages of reloads since the last call."""
+        messages = []
+        while self._messages:
+            messages.append(self._messages.popleft())
+        return messages
+
+    def _library_changed(self, action, song, old_key, change=None):
+        """Library listener: remembers which songs of the file the program changed."""
+        if not self._applying:
+            self._track(action, song.title.lower(), old_key)
+
+    def _track(self, action, key, old_key):
+        if action == "add":
+            self._changed[key] = "added"
+            return
+        origin = self._origins.pop(old_key, old_key)
+        if action == "delete":
+            if self._changed.get(origin) == "added":
+                del self._changed[origin]
+            else:
+                self._changed[origin] = "deleted"
+            return
+        if key != origin:
+            self._origins[key] = origin
+        if action == "play":
+            self._played.add(origin)
+        else:
+            self._changed.setdefault(origin, "edited")
+
+    def _track_journal(self):
+        """Changes still only in the journal were made in the program too, just before this run."""
+        actions = {"ADD": "add", "EDIT": "edit", "DEL": "delete", "PLAY": "play"}
+        try:
+            file = open(_journal_filename(self.filename), 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with file:
+            for line in file:
+                parts = line.rstrip("\r\n").split('|')
+                if parts[0] not in actions or len(parts) < 2:
+                    continue
+                if parts[0] == "ADD":
+                    key = old_key = parts[1].lower()
+                elif parts[0] == "EDIT":
+                    if len(parts) < 3:
+                        continue
+                    old_key = parts[1]
+                    if len(parts) == 5 and parts[2] in _EDIT_FIELDS:
+                        key = parts[4].lower() if parts[2] == "title" else old_key
+                    else:
+                        key = parts[2].lower() # Whole-row EDIT from an older journal
+                else:
+                    key = old_key = parts[1]
+                self._track(actions[parts[0]], key, old_key)
+
+    def _forget_saved_changes(self, rows):
+        """
+        Drops journal changes the file already has (e.g. ones reloaded from it
+        in an earlier run). Caller holds library.exclusive().
+        """
+        for origin in list(self._changed):
+            song = self._current_song(origin)
+            if song is None:
+                saved = origin not in rows
+            else:
+                key = song.title.lower()
+                row = rows.get(key)
+                saved = row is not None and _same_song(song, row[0]) and (key == origin or origin not in rows)
+            if saved:
+                del self._changed[origin]
+                if song is not None:
+                    self._origins.pop(song.title.lower(), None)
+        for origin in list(self._played):
+            song = self._current_song(origin)
+            row = rows.get(song.title.lower()) if song is not None else None
+            if row is not None and (song.get_play_count(), song.get_last_played()) == row[0][5:]:
+                self._played.discard(origin)
+
+    def _current_song(self, origin):
+        """The library's song that was `origin` in the file, following renames made in the program."""
+        for key, renamed_from in self._origins.items():
+            if renamed_from == origin:
+                return self.library.all_songs.get(key)
+        return self.library.all_songs.get(origin)
+
+    def _read_lines(self):
+        """
+        Reads the file. Returns ({line hash: key}, {key: (row, line)} for lines
+        not seen before, [(line number, reason), ...] for lines that can't be loaded).
+        """
+        lines = {}
+        new_rows = {}
+        problems = []
+        with open(self.filename, 'r', encoding='utf-8') as file:
+            next(file, None) # Header row
+            for line_number, line in enumerate(file, start=2):
+                line = line.strip()
+                if not line:
+                    continue
+                digest = hash(line)
+                key = self._lines.get(digest) if self._lines else None
+                if key is None:
+                    row, reason = _parse_song_line(line)
+                    if row is None:
+                        problems.append((line_number, reason))
+                        continue
+                    key = row[0].lower()
+                    if key in new_rows:
+                        continue # Duplicate title: the first line wins, as when loading
+                    new_rows[key] = (row, line)
+                lines[digest] = key
+        return lines, new_rows, problems
+
+    def poll(self):
+        """
+        Checks the file once and applies what changed since it was last read.
+        Returns a summary message, or None if nothing changed.
+        """
+        stat = self._read_stat()
+        if self._lines is not None and stat == self._stat:
+            return None
+        if stat is None or stat[1] == 0:
+            # Missing or empty (e.g. mid-save by an editor): wait for it to come back rather than delete everything.
+            if self._lines is None:
+                self._lines = {}
+            return None
+        start = time.perf_counter()
+        first_read = self._lines is None
+        lines, new_rows, problems = self._read_lines()
+        if self._read_stat() != stat:
+            return None # Still being written; read it again on the next poll
+        self._stat = stat
+        if first_read:
+            self._lines = lines
+            with self.library.exclusive():
+                self._forget_saved_changes(new_rows)
+            return None
+        if problems:
+            line_number, reason = problems[0]
+            return (f"⚠️ {self.filename} changed but has {len(problems)} line(s) that can't be loaded "
+                    f"(line {line_number}: {reason}); not reloaded until they are fixed.")
+
+        with self.library.exclusive():
+            self._applying = True
+            try:
+                added, edited, deleted, conflicts = self._merge(lines, new_rows)
+            finally:
+                self._applying = False
+        self._lines = lines
+        _record_io("reload", start, added + edited + deleted, self.filename)
+        if not (added or edited or deleted or conflicts):
+            return None
+        message = f"🔄 Reloaded {self.filename}: {added} added, {edited} edited, {deleted} deleted."
+        if conflicts:
+            message += self._report_conflicts(conflicts)
+        return message
+
+    def _merge(self, lines, new_rows):
+        """Applies the new lines and removed songs to the library. Caller holds library.exclusive()."""
+        library = self.library
+        known = set(self._lines.values())
+        removed = known - set(lines.values())
+        # A removed song whose file path shows up under a new title was renamed.
+        paths = {}
+        for key in removed:
+            song = library.all_songs.get(key)
+            if key not in self._changed and song is not None:
+                paths.setdefault(song.filepath, key)
+        renames = {}
+        for key, (row, _) in new_rows.items():
+            if key not in known and row[4] in paths:
+                renames[key] = paths.pop(row[4])
+                removed.discard(renames[key])
+
+        added = edited = deleted = 0
+        conflicts = [] # (title, reason, line or None)
+        for key, (row, line) in new_rows.items():
+            title, artist, duration, genre, filepath, play_count, last_played = row
+            origin = renames.get(key, key if key in known else None)
+            if origin is None:
+                song = library.all_songs.get(key)
+                if song is None:
+                    library.add_song(title, artist, duration, genre, filepath)
+                    if play_count or last_played:
+                        library.restore_play_stats(library.all_songs[key], play_count, last_played)
+                    added += 1
+                elif not _same_song(song, row):
+                    conflicts.append((title, f"was also {self._changed.get(key, 'added')} in the program", line))
+                continue
+            if origin in self._changed:
+                song = self._current_song(origin)
+                if song is None or not _same_song(song, row):
+                    conflicts.append((title, f"was also {self._changed[origin]} in the program", line))
+                continue
+            song = library.all_songs.get(origin)
+            if song is None:
+                conflicts.append((title, "was deleted in the program", line))
+                continue
+            if key != origin and key in library.all_songs:
+                conflicts.append((title, "already exists in the program", line))
+                continue
+            _update_song(library, song, title, artist, duration, genre, filepath)
+            # Plays made in the program win over the counts in the file.
+            if origin not in self._played and (song.get_play_count(), song.get_last_played()) != (play_count, last_played):
+                library.restore_play_stats(song, play_count, last_played)
+            if origin in self._played and key != origin:
+                self._played.discard(origin)
+                self._played.add(key)
+            edited += 1
+
+        for key in removed:
+            if key in self._changed:
+                if self._changed[key] != "deleted":
+                    song = self._current_song(key)
+                    conflicts.append((song.title if song else key, f"was deleted from {self.filename} "
+                                      f"but {self._changed[key]} in the program", None))
+                continue
+            song = library.all_songs.get(key)
+            if song is not None:
+                library.delete_song(song.title)
+                deleted += 1
+        return added, edited, deleted, conflicts
+
+    def _report_conflicts(self, conflicts):
+        """Keeps the conflicting lines in songs.txt.conflicts and describes the conflicts."""
+        metrics.increment("player.reload_conflicts", len(conflicts))
+        return _save_conflicts(self.filename, conflicts, "the program's version")
+
+
+def _same_song(song, row):
+    return (song.title, song.artist, int(song.duration), song.genre, song.filepath) == tuple(row[:5])
+
+
+def save_songs_to_catalog(library, filename="songs.bin", journal=None):
+    """
+    Save all songs to a binary catalog (see song_catalog.py)
+    Follows the same journal and temp-file rules as save_songs_to_file.
+    """
+    if _can_append_to_journal(journal, filename):
+        with library.exclusive():
+            return _flush_journal(journal)
+    start = time.perf_counter()
+    try:
+        with library.exclusive():
+            count = write_catalog((song.to_string() for song in library.all_songs.values()), filename,
+                                  _new_generation())
+            _discard_journal(filename, journal)
+        _record_io("save_catalog", start, count, filename)
+        return f"✅ Saved {count} songs to {filename}"
+    except IOError as e:
+        metrics.increment("player.save_errors")
+        return f"❌ Error saving file: {e}"
+    except Exception as e:
+        metrics.increment("player.save_errors")
+        return f"❌ Unexpected error: {e}"
+
+
+def load_songs_from_catalog(library, filename="songs.bin"):
+    """
+    Open a binary catalog as the library's song store
+    The file is memory-mapped: songs are only read when they are used, so this
+    returns almost immediately even for millions of rows. `library` should be empty.
+    """
+    start = time.perf_counter()
+    try:
+        catalog = SongCatalog(filename)
+    except FileNotFoundError:
+        return f"⚠️ File '{filename}' not found. Starting with empty library."
+    except ValueError as e:
+        return f"❌ Error reading file data: {e}"
+    except Exception as e:
+        return f"❌ Unexpected error: {e}"
+
+    library.use_song_store(CatalogSongMap(catalog))
+    replayed, conflicts = _replay_journal(library, filename)
+    _record_io("load_catalog", start, len(catalog), filename)
+    message = f"✅ Opened {len(catalog)} songs from {filename}"
+    if replayed:
+        message += f" (+{replayed} journal changes)"
+    return message + _journal_conflicts(filename, conflicts)
+
+
+def convert_text_to_catalog(text_filename="songs.txt", catalog_filename="songs.bin"):
+    """Converts songs.txt (plus its journal) into a binary catalog."""
+    library = MusicLibrary()
+    loaded = load_songs_from_file(library, text_filename)
+    return f"{loaded}\n{save_songs_to_catalog(library, catalog_filename)}"
+
+
+def convert_catalog_to_text(catalog_filename="songs.bin", text_filename="songs.txt"):
+    """Converts a binary catalog (plus its journal) back into songs.txt."""
+    library = MusicLibrary()
+    loaded = load_songs_from_catalog(library, catalog_filename)
+    return f"{loaded}\n{save_songs_to_file(library, text_filename)}"
+
+
+
+def load_songs_from_database(library, filename="songs.db"):
+    """
+    Use a SQLite database as the library's song store
+    Nothing is read up front; every change is committed to the database as it
+    happens, so there is nothing left to save on exit. `library` should be empty.
+    """
+    try:
+        store = SqliteSongStore(filename)
+    except Exception as e:
+        return f"❌ Error opening database: {e}"
+    library.use_song_store(store)
+    return f"✅ Opened {len(store)} songs from {filename}"
+
+
+def migrate_text_to_database(text_filename="songs.txt", db_filename="songs.db", report=None):
+    """Bulk-loads songs.txt (plus its journal) into a SQLite database in one transaction."""
+    try:
+        store = SqliteSongStore(db_filename)
+    except Exception as e:
+        return f"❌ Error opening database: {e}"
+    library = MusicLibrary()
+    library.use_song_store(store)
+    loaded = load_songs_from_file(library, text_filename, report)
+    store.close()
+    return f"{loaded} into {db_filename}"
+
+
+if __name__ == "__main__":
+    # python player.py to-catalog [songs.txt] [songs.bin]
+    # python player.py to-text [songs.bin] [songs.txt]
+    # python player.py to-database [songs.txt] [songs.db]
+    commands = {"to-catalog": (convert_text_to_catalog, "songs.txt", "songs.bin"),
+                "to-text": (convert_catalog_to_text, "songs.bin", "songs.txt"),
+                "to-database": (migrate_text_to_database, "songs.txt", "songs.db")}
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print("Usage: python player.py (to-catalog|to-text|to-database) [source] [destination]")
+        sys.exit(1)
+    convert, source, destination = commands[sys.argv[1]]
+    source = sys.argv[2] if len(sys.argv) > 2 else source
+    destination = sys.argv[3] if len(sys.argv) > 3 else destination
+    print(convert(source, destination))
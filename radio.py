@@ -0,0 +1,201 @@
+"""
+Radio Module
+Autoplay for AudioPlayer: when the queue runs dry, it is refilled with songs
+similar to the one that just played. Each song is a row in a NumPy feature
+matrix (genre, artist, duration bucket, play count), so a whole catalog is
+scored in one vectorized pass. The matrix is built on first use and kept up to
+date through the library's change listener. NumPy is only imported then.
+"""
+
+import math
+import random
+import threading
+from collections import deque
+
+# Score = GENRE_WEIGHT * same genre + ARTIST_WEIGHT * same artist
+#       + DURATION_WEIGHT * duration closeness + POPULARITY_WEIGHT * play count weight + jitter
+GENRE_WEIGHT = 3.0
+ARTIST_WEIGHT = 2.0
+DURATION_WEIGHT = 1.0
+POPULARITY_WEIGHT = 0.5
+JITTER = 0.75 # Random spread, so the same seed doesn't always give the same songs
+DURATION_BUCKET_SECONDS = 30
+DURATION_SPAN_BUCKETS = 10 # Durations this many buckets apart count as not close at all
+POPULARITY_SATURATION = 1000 # Plays at which the play count weight reaches 1
+RADIO_BATCH = 5 # Songs queued per refill
+RECENT_LIMIT = 50 # Recently played songs that are not picked again
+_MISSING = -2 # Code for a genre/artist no song has; matches nothing
+
+
+def _numpy():
+    import numpy # Deferred: only paid for when the radio is used
+    return numpy
+
+
+def _duration_bucket(duration):
+    return min(max(int(duration), 0) // DURATION_BUCKET_SECONDS, 32767)
+
+
+def _popularity(play_count):
+    return POPULARITY_WEIGHT * min(math.log1p(play_count) / math.log1p(POPULARITY_SATURATION), 1.0)
+
+
+# --- Radio Class ---
+class Radio:
+    """
+    Picks songs similar to a seed song. The one-hot genre and artist features
+    are stored as integer codes (comparing codes equals the dot product of the
+    one-hot vectors without a column per artist), next to a duration bucket and
+    a play count weight. Deleted songs leave a free row that the next added
+    song reuses.
+    """
+
+    def __init__(self, library, batch=RADIO_BATCH, seed=None):
+        self.library = library
+        self.batch = batch
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock() # Held while reading the library, which _lock must never be
+        self._np = None
+        self._changes_during_build = None
+        self._count = 0 # Rows in use, including free ones
+        self._rows = {} # Key: "konservatif", Value: row number
+        self._keys = [] # Row number -> key (None for a free row)
+        self._free_rows = []
+        self._genre_codes = {} # Key: "indie", Value: code
+        self._artist_codes = {} # Key: "the adams", Value: code
+        self._recent = deque(maxlen=RECENT_LIMIT)
+        library.add_listener(self._library_changed)
+
+    # --- Feature matrix ---
+    def prepare(self):
+        """Builds the feature matrix now (it is otherwise built on the first pick). Raises ImportError without NumPy."""
+        if self._np is not None:
+            return
+        with self._build_lock:
+            if self._np is not None:
+                return
+            np = _numpy()
+            with self._lock:
+                self._changes_during_build = []
+            # Read without _lock: a library writer may be waiting in our listener meanwhile.
+            songs = self.library.get_all_songs()
+            with self._lock:
+                capacity = max(len(songs), 1024)
+                self._genre = np.empty(capacity, dtype=np.int32)
+                self._artist = np.empty(capacity, dtype=np.int32)
+                self._duration = np.empty(capacity, dtype=np.int16)
+                # Play count weight; -inf marks a free row so it never scores.
+                self._base = np.empty(capacity, dtype=np.float32)
+                self._np = np
+                for song in songs:
+                    self._add_row(song.title.lower(), song)
+                # Changes made while the library was read; applying one the snapshot already has is harmless.
+                changes, self._changes_during_build = self._changes_during_build, None
+                for change in changes:
+                    self._apply_change(*change)
+
+    def _code(self, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def _encode(self, row, song):
+        self._genre[row] = self._code(self._genre_codes, song.genre.lower())
+        self._artist[row] = self._code(self._artist_codes, song.artist.lower())
+        self._duration[row] = _duration_bucket(song.duration)
+        self._base[row] = _popularity(song.get_play_count())
+
+    def _add_row(self, key, song):
+        row = self._rows.get(key)
+        if row is not None:
+            self._encode(row, song)
+            return
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._keys[row] = key
+        else:
+            if self._count == len(self._base):
+                self._grow()
+            row = self._count
+            self._count += 1
+            self._keys.append(key)
+        self._rows[key] = row
+        self._encode(row, song)
+
+    def _grow(self):
+        np = self._np
+        capacity = len(self._base) * 2
+        for name in ("_genre", "_artist", "_duration", "_base"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _library_changed(self, action, song, old_key, change=None):
+        with self._lock:
+            if action == "play":
+                self._recent.append(song.title.lower())
+            if self._np is not None:
+                self._apply_change(action, song, old_key)
+            elif self._changes_during_build is not None:
+                self._changes_during_build.append((action, song, old_key))
+            # Otherwise not built yet; the build will see the change
+
+    def _apply_change(self, action, song, old_key):
+        key = song.title.lower()
+        if action == "add":
+            self._add_row(key, song)
+            return
+        row = self._rows.pop(old_key, None)
+        if row is None:
+            return
+        if action == "delete":
+            self._keys[row] = None
+            self._base[row] = -math.inf
+            self._free_rows.append(row)
+            return
+        # "edit" (possibly a rename) or "play"
+        self._rows[key] = row
+        self._keys[row] = key
+        self._encode(row, song)
+
+    # --- Picking ---
+    def similar_songs(self, song, count, exclude=()):
+        """
+        Returns up to `count` songs most similar to `song`, best first, leaving
+        out the song itself, recently played songs and the keys in `exclude`.
+        """
+        self.prepare()
+        with self._lock:
+            np = self._np
+            n = self._count
+            if n == 0 or count <= 0:
+                return []
+            genre = self._genre_codes.get(song.genre.lower(), _MISSING)
+            artist = self._artist_codes.get(song.artist.lower(), _MISSING)
+            bucket = _duration_bucket(song.duration)
+
+            scores = np.random.default_rng(self._random.getrandbits(64)).random(n, dtype=np.float32)
+            scores *= JITTER
+            scores += self._base[:n]
+            scores += (self._genre[:n] == genre) * np.float32(GENRE_WEIGHT)
+            scores += (self._artist[:n] == artist) * np.float32(ARTIST_WEIGHT)
+            distance = np.abs(self._duration[:n].astype(np.float32) - bucket)
+            scores += np.clip(1 - distance / DURATION_SPAN_BUCKETS, 0, 1) * np.float32(DURATION_WEIGHT)
+
+            skipped = {song.title.lower(), *self._recent, *exclude}
+            skip_rows = [self._rows[key] for key in skipped if key in self._rows]
+            scores[skip_rows] = -np.inf
+
+            count = min(count, n)
+            best = np.argpartition(scores, n - count)[n - count:]
+            best = best[np.argsort(scores[best])[::-1]]
+            keys = [self._keys[row] for row in best.tolist() if scores[row] > -np.inf]
+        songs = (self.library.all_songs.get(key) for key in keys)
+        return [found for found in songs if found is not None]
+
+    def next_songs(self, last_song):
+        """AudioPlayer autoplay callback: the next batch of songs to queue after `last_song`."""
+        return self.similar_songs(last_song, self.batch)
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+Song Catalog Module
+A compact binary alternative to songs.txt that is opened with mmap, so a huge
+library starts instantly and Song objects are only created for rows in use.
+
+File layout (all integers little-endian):
+    header       MAGIC, version, row count, row table offset, string pool offset,
+                 then (version 3) the generation written by the save (see player.py)
+    row table    one fixed-size record per song, sorted by lowercased title:
+                 (offset, length) of title, artist, genre and filepath in the
+                 string pool, then the duration in seconds, the play count
+                 and the last-played Unix time (version 1 rows end at the duration)
+    string pool  UTF-8 bytes; repeated artists and genres are stored once
+"""
+
+import mmap
+import os
+import struct
+
+from music_library import Song, SongStore
+
+MAGIC = b"MUSICAT\0"
+VERSION = 3
+_HEADER = struct.Struct("<8sIIQQ")
+_GENERATION = struct.Struct("<Q") # Follows the header from version 3 on
+_ROW = struct.Struct("<IIIIIIIIIIq")
+_ROWS_BY_VERSION = {1: struct.Struct("<IIIIIIIII"), 2: _ROW, 3: _ROW}
+_MAX_POOL_SIZE = 2 ** 32 - 1
+
+
+def write_catalog(rows, filename, generation=0):
+    """
+    Writes (title, artist, duration, genre, filepath[, play_count, last_played])
+    rows to a catalog file, stamped with `generation`.
+    Rows are sorted by lowercased title; the file is written to a temp file and
+    renamed into place. Returns the number of rows written.
+    """
+    rows = sorted(rows, key=lambda row: row[0].lower())
+    pool = bytearray()
+    interned = {}
+
+    def intern(text):
+        location = interned.get(text)
+        if location is None:
+            data = text.encode("utf-8")
+            location = (len(pool), len(data))
+            pool.extend(data)
+            if len(pool) > _MAX_POOL_SIZE:
+                raise ValueError("Catalog string pool is larger than 4 GiB.")
+            interned[text] = location
+        return location
+
+    table = bytearray()
+    for title, artist, duration, genre, filepath, *play_stats in rows:
+        play_count, last_played = play_stats or (0, 0)
+        title_data = title.encode("utf-8")
+        title_location = (len(pool), len(title_data))
+        pool.extend(title_data)
+        if len(pool) > _MAX_POOL_SIZE:
+            raise ValueError("Catalog string pool is larger than 4 GiB.")
+        table += _ROW.pack(*title_location, *intern(artist), *intern(genre),
+                           *intern(filepath), int(duration), int(play_count), int(last_played))
+
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as file:
+        table_offset = _HEADER.size + _GENERATION.size
+        pool_offset = table_offset + len(table)
+        file.write(_HEADER.pack(MAGIC, VERSION, len(rows), table_offset, pool_offset))
+        file.write(_GENERATION.pack(generation))
+        file.write(table)
+        file.write(pool)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+    return len(rows)
+
+
+def read_generation(filename):
+    """Returns the generation a catalog file was written with (None before version 3)."""
+    with open(filename, "rb") as file:
+        data = file.read(_HEADER.size + _GENERATION.size)
+    if len(data) < _HEADER.size or data[:len(MAGIC)] != MAGIC:
+        return None
+    version = _HEADER.unpack_from(data, 0)[1]
+    if version < 3 or len(data) < _HEADER.size + _GENERATION.size:
+        return None
+    return _GENERATION.unpack_from(data, _HEADER.size)[0]
+
+
+class SongCatalog:
+    """
+    Read-only, memory-mapped view of a catalog file.
+    Rows are decoded on demand; nothing is read up front except the header.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"'{filename}' is empty, not a song catalog.")
+        if self._map.size() < _HEADER.size:
+            self.close()
+            raise ValueError(f"'{filename}' is not a song catalog.")
+        magic, version, row_count, table_offset, pool_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version not in _ROWS_BY_VERSION:
+            self.close()
+            raise ValueError(f"'{filename}' is not a version {VERSION} song catalog.")
+        self.version = version
+        self.generation = _GENERATION.unpack_from(self._map, _HEADER.size)[0] if version >= 3 else None
+        self._row = _ROWS_BY_VERSION[version]
+        self._row_count = row_count
+        self._table_offset = table_offset
+        self._pool_offset = pool_offset
+
+    def __len__(self):
+        return self._row_count
+
+    def _text(self, offset, length):
+        start = self._pool_offset + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def _unpack(self, index):
+        fields = self._row.unpack_from(self._map, self._table_offset + index * self._row.size)
+        return fields if self.version > 1 else fields + (0, 0)
+
+    def row(self, index):
+        """
+        Returns row `index` as a
+        (title, artist, duration, genre, filepath, play_count, last_played) tuple.
+        """
+        (title_off, title_len, artist_off, artist_len, genre_off, genre_len,
+         path_off, path_len, duration, play_count, last_played) = self._unpack(index)
+        return (self._text(title_off, title_len), self._text(artist_off, artist_len), duration,
+                self._text(genre_off, genre_len), self._text(path_off, path_len), play_count, last_played)
+
+    def index_row(self, index):
+        """Returns (key, artist, genre, duration) for row `index` without decoding the filepath."""
+        (title_off, title_len, artist_off, artist_len, genre_off, genre_len,
+         _path_off, _path_len, duration, *_) = self._unpack(index)
+        return (self._text(title_off, title_len).lower(), self._text(artist_off, artist_len),
+                self._text(genre_off, genre_len), duration)
+
+    def play_count(self, index):
+        return self._unpack(index)[9]
+
+    def key(self, index):
+        title_off, title_len = struct.unpack_from("<II", self._map, self._table_offset + index * self._row.size)
+        return self._text(title_off, title_len).lower()
+
+    def find(self, key):
+        """Binary-searches the sorted row table. Returns the row index of `key`, or -1."""
+        low, high = 0, self._row_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._row_count and self.key(low) == key:
+            return low
+        return -1
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class CatalogSongMap(SongStore):
+    """
+    A key -> Song mapping over a SongCatalog, for MusicLibrary.use_song_store.
+    A Song is created the first time its row is looked up and then kept, so the
+    library always hands out the same object. Adds, edits and deletes live in
+    memory on top of the read-only catalog until it is rewritten.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._songs = {} # Materialized catalog rows and songs added since opening
+        self._removed = set() # Catalog keys deleted (or renamed away) since opening
+        self._added = {} # Keys that are not in the catalog, in insertion order
+
+    def __getitem__(self, key):
+        song = self._songs.get(key)
+        if song is not None:
+            return song
+        if key in self._removed:
+            raise KeyError(key)
+        index = self.catalog.find(key)
+        if index < 0:
+            raise KeyError(key)
+        title, artist, duration, genre, filepath, play_count, last_played = self.catalog.row(index)
+        song = Song(title, artist, duration, genre, filepath)
+        song.set_play_stats(play_count, last_played)
+        self._songs[key] = song
+        return song
+
+    def __setitem__(self, key, song):
+        self._songs[key] = song
+        if key in self._removed:
+            self._removed.discard(key)
+        elif self.catalog.find(key) < 0:
+            self._added[key] = None
+
+    def __delitem__(self, key):
+        if key in self._added:
+            del self._added[key]
+            del self._songs[key]
+        elif key not in self._removed and self.catalog.find(key) >= 0:
+            self._removed.add(key)
+            self._songs.pop(key, None)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._songs:
+            return True
+        return key not in self._removed and self.catalog.find(key) >= 0
+
+    def __iter__(self):
+        for index in range(len(self.catalog)):
+            key = self.catalog.key(index)
+            if key not in self._removed:
+                yield key
+        yield from list(self._added)
+
+    def __len__(self):
+        return len(self.catalog) - len(self._removed) + len(self._added)
+
+    def index_rows(self):
+        """Yields (key, artist, genre, duration) for every song, reading untouched rows straight from the catalog."""
+        for index in range(len(self.catalog)):
+            row = self.catalog.index_row(index)
+            key = row[0]
+            if key in self._removed:
+                continue
+            song = self._songs.get(key)
+            if song is not None:
+                yield key, song.artist, song.genre, song.duration
+            else:
+                yield row
+        for key in list(self._added):
+            song = self._songs[key]
+            yield key, song.artist, song.genre, song.duration
+
+    def play_rows(self):
+        """Yields (key, artist, genre, play_count) for played songs, reading untouched rows from the catalog."""
+        for index in range(len(self.catalog)):
+            play_count = self.catalog.play_count(index)
+            if not play_count:
+                continue
+            key, artist, genre, _duration = self.catalog.index_row(index)
+            if key not in self._removed and key not in self._songs:
+                yield key, artist, genre, play_count
+        # Songs in memory (looked up or added since opening) carry their current counts.
+        for key, song in list(self._songs.items()):
+            if song.get_play_count():
+                yield key, song.artist, song.genre, song.get_play_count()
+
+    def close(self):
+        self.catalog.close()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Song Store Module
+Alternative storage for MusicLibrary.all_songs that keeps song data in columns
+instead of one Python object per song.
+"""
+
+import time
+from array import array
+
+from music_library import Song, SongStore
+
+
+# --- SongView Class ---
+class SongView(Song):
+    """
+    A Song that reads and writes one row of a ColumnarSongStore.
+    Views are created on lookup and are cheap to throw away; any number of views
+    of the same row see the same data, including the play count.
+    """
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    @property
+    def title(self):
+        return self._store.titles[self._row]
+
+    @title.setter
+    def title(self, value):
+        self._store.titles[self._row] = value
+
+    @property
+    def artist(self):
+        return self._store.artists[self._row]
+
+    @artist.setter
+    def artist(self, value):
+        self._store.artists[self._row] = self._store.intern(value)
+
+    @property
+    def duration(self):
+        return self._store.durations[self._row]
+
+    @duration.setter
+    def duration(self, value):
+        self._store.durations[self._row] = int(value)
+
+    @property
+    def genre(self):
+        return self._store.genres[self._row]
+
+    @genre.setter
+    def genre(self, value):
+        self._store.genres[self._row] = self._store.intern(value)
+
+    @property
+    def filepath(self):
+        return self._store.filepaths[self._row]
+
+    @filepath.setter
+    def filepath(self, value):
+        self._store.filepaths[self._row] = value
+
+    def play(self):
+        self._store.play_counts[self._row] += 1
+        self._store.last_played[self._row] = int(time.time())
+        return f"🎵 Incrementing play count for: {self.title}"
+
+    def get_play_count(self):
+        return self._store.play_counts[self._row]
+
+    def get_last_played(self):
+        return self._store.last_played[self._row]
+
+    def set_play_stats(self, play_count, last_played):
+        self._store.play_counts[self._row] = int(play_count)
+        self._store.last_played[self._row] = int(last_played)
+
+    def __eq__(self, other):
+        if isinstance(other, SongView):
+            return self._store is other._store and self._row == other._row
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._store), self._row))
+
+
+# --- ColumnarSongStore Class ---
+class ColumnarSongStore(SongStore):
+    """
+    A key -> Song mapping for MusicLibrary.use_song_store that stores every field
+    in its own column: parallel lists for the strings (artists and genres are
+    interned, so each distinct value exists once) and array('I') for durations
+    and play statistics. Lookups return SongView objects over a row.
+
+    Deleted rows are never reused, so a view that outlives its song (for example
+    one still sitting in the player queue) keeps reading the old data.
+    """
+
+    def __init__(self):
+        self.titles = []
+        self.artists = []
+        self.genres = []
+        self.filepaths = []
+        self.durations = array('I')
+        self.play_counts = array('I')
+        self.last_played = array('q')
+        self._rows = {} # Key: "konservatif", Value: row number in the columns
+        self._strings = {}
+
+    def intern(self, text):
+        return self._strings.setdefault(text, text)
+
+    def _append_row(self, song):
+        row = len(self.titles)
+        self.titles.append(song.title)
+        self.artists.append(self.intern(song.artist))
+        self.genres.append(self.intern(song.genre))
+        self.filepaths.append(song.filepath)
+        self.durations.append(int(song.duration))
+        self.play_counts.append(song.get_play_count())
+        self.last_played.append(song.get_last_played())
+        return row
+
+    def __getitem__(self, key):
+        return SongView(self, self._rows[key])
+
+    def __setitem__(self, key, song):
+        if isinstance(song, SongView) and song._store is self:
+            # A renamed song keeps its row; only the key pointing at it moves.
+            self._rows[key] = song._row
+        else:
+            self._rows[key] = self._append_row(song)
+
+    def __delitem__(self, key):
+        del self._rows[key]
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def index_rows(self):
+        """Yields (key, artist, genre, duration) for every song without creating views."""
+        for key, row in self._rows.items():
+            yield key, self.artists[row], self.genres[row], self.durations[row]
+
+    def play_rows(self):
+        for key, row in self._rows.items():
+            play_count = self.play_counts[row]
+            if play_count:
+                yield key, self.artists[row], self.genres[row], play_count
@@ -0,0 +1,278 @@
+"""
+SQLite Store Module
+A MusicLibrary storage backend that keeps songs in a SQLite database instead of
+memory. Lookups, searches and listings are answered with indexed SQL queries,
+and every change (including play counts) is committed as it happens.
+"""
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+from music_library import Song, SongStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    artist_lower TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    genre TEXT NOT NULL,
+    genre_lower TEXT NOT NULL,
+    filepath TEXT NOT NULL,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    last_played INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS songs_artist_lower ON songs (artist_lower);
+CREATE INDEX IF NOT EXISTS songs_genre_lower ON songs (genre_lower);
+CREATE INDEX IF NOT EXISTS songs_play_count ON songs (play_count);
+CREATE INDEX IF NOT EXISTS songs_duration ON songs (duration);
+"""
+
+_COLUMNS = "key, title, artist, duration, genre, filepath, play_count, last_played"
+_SEARCH_COLUMNS = {"artist": "artist_lower", "genre": "genre_lower"}
+_QUERY_ORDERS = {"title": "key", "duration": "duration, key"}
+_CHUNK_ROWS = 1000 # Rows fetched per lock hold when walking the whole table
+
+
+# --- SqliteSong Class ---
+class SqliteSong(Song):
+    """A Song loaded from a SqliteSongStore (which hands out one object per row)."""
+    __slots__ = ("_store", "__weakref__")
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every string that starts with `prefix` (None if unbounded)."""
+    while prefix and prefix[-1] == "\U0010ffff":
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# --- SqliteSongStore Class ---
+class SqliteSongStore(SongStore):
+    """
+    A key -> Song mapping backed by a SQLite database file.
+    Keys are lowercased titles, as in MusicLibrary. Lowercased artist and genre
+    columns are indexed, and rows are numbered in insertion order so searches
+    return songs in the same order as the in-memory library.
+    The connection is shared by every thread (menu, playback engine, API
+    workers); each use of it holds the store's lock, and batch() holds it for
+    the whole transaction.
+    """
+    serves_queries = True
+
+    def __init__(self, filename="songs.db"):
+        self.filename = filename
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(songs)")}
+        if "last_played" not in columns:
+            # Databases created before play times were stored.
+            self._conn.execute("ALTER TABLE songs ADD COLUMN last_played INTEGER NOT NULL DEFAULT 0")
+        self._batch_depth = 0
+        # Hand out the same object for a row while anyone still holds it.
+        self._live_songs = weakref.WeakValueDictionary()
+
+    def _commit(self):
+        if self._batch_depth == 0:
+            self._conn.commit()
+
+    @contextmanager
+    def batch(self):
+        """Groups all writes made inside the block into a single transaction."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._conn.rollback()
+                raise
+            self._batch_depth -= 1
+            self._commit()
+
+    def _song_from_row(self, row):
+        key, title, artist, duration, genre, filepath, play_count, last_played = row
+        song = self._live_songs.get(key)
+        if song is not None:
+            return song
+        song = SqliteSong(title, artist, duration, genre, filepath)
+        song._store = self
+        song.set_play_stats(play_count, last_played)
+        self._live_songs[key] = song
+        return song
+
+    def _select(self, where, params=()):
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT {_COLUMNS} FROM songs {where}", params)
+            return [self._song_from_row(row) for row in cursor]
+
+    def _fetchone(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._commit()
+            return cursor.rowcount
+
+    def _walk(self, columns, where=""):
+        """
+        Yields `columns` of every row in id order, a chunk at a time, so the lock
+        (and no open cursor) is held while the caller works on the rows.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {columns} FROM songs WHERE id > ? {where} ORDER BY id LIMIT ?",
+                    (last_id, _CHUNK_ROWS)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                yield row[1:]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Mapping ---
+    def __getitem__(self, key):
+        with self._lock:
+            song = self._live_songs.get(key)
+        if song is not None:
+            return song
+        songs = self._select("WHERE key = ?", (key,))
+        if not songs:
+            raise KeyError(key)
+        return songs[0]
+
+    def __setitem__(self, key, song):
+        with self._lock:
+            self._set_row(key, song)
+
+    def _set_row(self, key, song):
+        self._conn.execute(
+            "INSERT INTO songs (key, title, artist, artist_lower, duration, genre, genre_lower, "
+            "filepath, play_count, last_played) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET title = excluded.title, artist = excluded.artist, "
+            "artist_lower = excluded.artist_lower, duration = excluded.duration, "
+            "genre = excluded.genre, genre_lower = excluded.genre_lower, "
+            "filepath = excluded.filepath, play_count = excluded.play_count, "
+            "last_played = excluded.last_played",
+            (key, song.title, song.artist, song.artist.lower(), int(song.duration),
+             song.genre, song.genre.lower(), song.filepath, song.get_play_count(),
+             song.get_last_played()))
+        self._commit()
+        if isinstance(song, SqliteSong) and song._store is self:
+            self._live_songs[key] = song
+
+    def __delitem__(self, key):
+        with self._lock:
+            deleted = self._write("DELETE FROM songs WHERE key = ?", (key,))
+            self._live_songs.pop(key, None)
+        if deleted == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._live_songs:
+                return True
+        return self._fetchone("SELECT 1 FROM songs WHERE key = ?", (key,)) is not None
+
+    def __iter__(self):
+        for (key,) in self._walk("key"):
+            yield key
+
+    def __len__(self):
+        return self._fetchone("SELECT COUNT(*) FROM songs")[0]
+
+    # --- SongStore hooks ---
+    def index_rows(self):
+        return self._walk("key, artist, genre, duration")
+
+    def play_rows(self):
+        return self._walk("key, artist, genre, play_count", "AND play_count > 0")
+
+    def rename_key(self, old_key, new_key, song):
+        with self._lock:
+            # Like the in-memory dict, a renamed song moves to the end of the insertion order.
+            self._write(
+                "UPDATE songs SET id = (SELECT MAX(id) + 1 FROM songs), key = ?, title = ? WHERE key = ?",
+                (new_key, song.title, old_key))
+            self._live_songs.pop(old_key, None)
+            if isinstance(song, SqliteSong) and song._store is self:
+                self._live_songs[new_key] = song
+
+    def save_song(self, key, song):
+        self[key] = song
+
+    def record_play(self, key, song):
+        self._write("UPDATE songs SET play_count = ?, last_played = ? WHERE key = ?",
+                    (song.get_play_count(), song.get_last_played(), key))
+
+    def search(self, field, query_lower):
+        column = _SEARCH_COLUMNS[field]
+        # Find the matching distinct values by scanning the (much smaller) index,
+        # then fetch their songs through the same index.
+        return self._select(
+            f"WHERE {column} IN (SELECT DISTINCT {column} FROM songs WHERE instr({column}, ?) > 0) "
+            "ORDER BY id", (query_lower,))
+
+    def songs_by_prefix(self, prefix, limit=None):
+        upper = _prefix_upper_bound(prefix)
+        where, params = "WHERE key >= ?", [prefix]
+        if upper is not None:
+            where += " AND key < ?"
+            params.append(upper)
+        where += " ORDER BY key"
+        if limit is not None:
+            where += " LIMIT ?"
+            params.append(limit)
+        return self._select(where, params)
+
+    def sorted_songs(self, start=0, stop=None):
+        count = -1 if stop is None else max(stop - start, 0)
+        return self._select("ORDER BY key LIMIT ? OFFSET ?", (count, start))
+
+    def top_played(self, n, field=None, value_lower=None):
+        where, params = "WHERE play_count > 0", []
+        if field is not None:
+            where += f" AND {_SEARCH_COLUMNS[field]} = ?"
+            params.append(value_lower)
+        return self._select(where + " ORDER BY play_count DESC, id LIMIT ?", params + [n])
+
+    def query(self, artist_lower, genre_lower, min_duration, max_duration, order_by, limit):
+        # SQLite's planner picks between the genre and duration indexes itself.
+        conditions, params = [], []
+        if genre_lower is not None:
+            conditions.append("genre_lower = ?")
+            params.append(genre_lower)
+        if min_duration is not None:
+            conditions.append("duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            conditions.append("duration <= ?")
+            params.append(max_duration)
+        if artist_lower is not None:
+            conditions.append("instr(artist_lower, ?) > 0")
+            params.append(artist_lower)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        where += f"ORDER BY {_QUERY_ORDERS[order_by]}"
+        if limit is not None:
+            where += " LIMIT ?"
+            params.append(limit)
+        return self._select(where, params)
+
+    def all_genres(self):
+        with self._lock:
+            return [genre for (genre,) in self._conn.execute("SELECT DISTINCT genre FROM songs ORDER BY genre")]
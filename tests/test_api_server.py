@@ -0,0 +1,100 @@
+"""API endpoints, served on a free port with NullAudioBackend."""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import ApiServer
+from audio_backend import NullAudioBackend
+from audio_player import AudioPlayer
+from music_library import MusicLibrary
+
+
+async def request(port, method, path, body=None):
+    """Sends one request and returns (status, JSON payload)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(payload)
+
+
+class ApiServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filepath = os.path.join(directory.name, "song.mp3")
+        with open(self.filepath, "wb") as file:
+            file.write(b"\0" * 64)
+        self.library = MusicLibrary()
+        self.library.add_song("Song", "Artist", 100, "Rock", self.filepath)
+        self.player = AudioPlayer(backend=NullAudioBackend(), library=self.library)
+        self.server = ApiServer(self.library, self.player)
+        listening = await self.server.start("127.0.0.1", 0)
+        self.port = listening.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self.player.shutdown()
+
+    async def test_add_and_get_song(self):
+        status, song = await request(self.port, "POST", "/songs", {
+            "title": "New", "artist": "Band", "duration": 200, "genre": "Pop", "filepath": self.filepath})
+        self.assertEqual(status, 201)
+        self.assertEqual(song["title"], "New")
+        status, song = await request(self.port, "GET", "/songs/new")
+        self.assertEqual((status, song["artist"]), (200, "Band"))
+        status, _ = await request(self.port, "POST", "/songs", {
+            "title": "new", "artist": "Band", "duration": 200, "genre": "Pop", "filepath": self.filepath})
+        self.assertEqual(status, 409)
+
+    async def test_bad_patch_changes_nothing(self):
+        status, _ = await request(self.port, "PATCH", "/songs/Song", {"artist": "Other", "duration": "abc"})
+        self.assertEqual(status, 400)
+        self.assertEqual(self.library.get_song("Song").artist, "Artist")
+        status, song = await request(self.port, "PATCH", "/songs/Song", {"artist": "Other", "title": "Renamed"})
+        self.assertEqual((status, song["title"], song["artist"]), (200, "Renamed", "Other"))
+
+    async def test_queueing_starts_playback(self):
+        status, queue = await request(self.port, "POST", "/queue", {"title": "Song"})
+        self.assertEqual((status, queue["length"]), (200, 0))
+        status, state = await request(self.port, "GET", "/now-playing?timeout=0")
+        self.assertEqual((status, state["song"]["title"]), (200, "Song"))
+
+    async def test_a_waiting_write_does_not_block_other_clients(self):
+        held, release = threading.Event(), threading.Event()
+
+        def hold_library():
+            with self.library.exclusive():
+                held.set()
+                release.wait(2)
+
+        holder = threading.Thread(target=hold_library)
+        holder.start()
+        self.addCleanup(holder.join)
+        self.addCleanup(release.set)
+        held.wait(5)
+        start = time.perf_counter()
+        edit = asyncio.ensure_future(request(self.port, "PATCH", "/songs/Song", {"genre": "Jazz"}))
+        await asyncio.sleep(0.05)
+        status, _ = await request(self.port, "GET", "/now-playing?timeout=0")
+        self.assertEqual(status, 200)
+        self.assertLess(time.perf_counter() - start, 1) # Answered while the edit waits
+        self.assertFalse(edit.done())
+        release.set()
+        status, song = await asyncio.wait_for(edit, 5)
+        self.assertEqual((status, song["genre"]), (200, "Jazz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
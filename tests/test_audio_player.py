@@ -0,0 +1,71 @@
+"""Queueing and track changes in AudioPlayer, played through NullAudioBackend."""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_backend import NullAudioBackend
+from audio_player import AudioPlayer
+from music_library import MusicLibrary
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class QueueTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.library = MusicLibrary()
+        for title in ("One", "Two", "Three"):
+            filepath = os.path.join(directory.name, f"{title}.mp3")
+            with open(filepath, "wb") as file:
+                file.write(b"\0" * 64)
+            self.library.add_song(title, "Artist", 60, "Rock", filepath)
+        self.songs = [self.library.get_song(title) for title in ("One", "Two", "Three")]
+
+    def player(self, track_seconds=None):
+        player = AudioPlayer(backend=NullAudioBackend(track_seconds), library=self.library)
+        self.addCleanup(player.shutdown)
+        return player
+
+    def test_adding_to_an_idle_player_starts_playback(self):
+        player = self.player()
+        player.add_to_queue(self.songs[0])
+        self.assertIs(player.current_song, self.songs[0])
+        self.assertEqual(len(player.queue), 0)
+        player.add_to_queue(self.songs[1])
+        self.assertIs(player.current_song, self.songs[0]) # Doesn't interrupt the playing song
+        self.assertEqual(list(player.queue), [self.songs[1]])
+
+    def test_every_enqueue_path_starts_an_idle_player(self):
+        for enqueue in ("add_many_to_queue", "play_after_current"):
+            with self.subTest(enqueue=enqueue):
+                player = self.player()
+                if enqueue == "add_many_to_queue":
+                    player.add_many_to_queue(self.songs[:2])
+                else:
+                    player.play_after_current(self.songs[1])
+                self.assertIsNotNone(player.current_song)
+
+    def test_engine_plays_the_queue_through(self):
+        player = self.player(track_seconds=0.05)
+        player.add_many_to_queue(self.songs)
+        self.assertTrue(wait_for(lambda: player.current_song is None and not player.queue))
+        self.assertEqual([song.get_play_count() for song in self.songs], [1, 1, 1])
+        player.add_to_queue(self.songs[0]) # Idle again after the queue ran out
+        self.assertIs(player.current_song, self.songs[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""Loudness measurements of generated WAV files (needs NumPy)."""
+
+import math
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loudness
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HALF_SCALE_RMS_DB = 20 * math.log10(0.5 / math.sqrt(2)) # -9.03
+HALF_SCALE_PEAK_DB = 20 * math.log10(0.5) # -6.02
+
+
+def write_sine(filename, width, amplitude=0.5, rate=8000, seconds=1, frequency=440):
+    """Writes a mono sine wave as a `width`-byte WAV file."""
+    # 8000 / 440 isn't whole, so the samples land on many phases, like real audio.
+    full_scale = 1 << (8 * width - 1)
+    frames = bytearray()
+    for i in range(rate * seconds):
+        value = min(round(amplitude * math.sin(2 * math.pi * frequency * i / rate) * full_scale), full_scale - 1)
+        if width == 1:
+            frames += struct.pack("<B", value + 128)
+        else:
+            frames += value.to_bytes(width, "little", signed=True)
+    with wave.open(filename, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(width)
+        file.setframerate(rate)
+        file.writeframes(bytes(frames))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class MeasureFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_sine_levels_at_every_bit_depth(self):
+        for width in (1, 2, 3, 4):
+            with self.subTest(bits=8 * width):
+                filename = self.path(f"sine{width}.wav")
+                write_sine(filename, width)
+                rms_db, peak_db = loudness.measure_file(filename)
+                self.assertAlmostEqual(rms_db, HALF_SCALE_RMS_DB, places=2)
+                self.assertAlmostEqual(peak_db, HALF_SCALE_PEAK_DB, places=2)
+
+    def test_silence_has_no_level(self):
+        filename = self.path("silent.wav")
+        write_sine(filename, 2, amplitude=0)
+        self.assertEqual(loudness.measure_file(filename), (None, None))
+        self.assertEqual(loudness.volume_for(None), 1.0)
+
+    def test_loud_tracks_are_turned_down_to_the_target(self):
+        filename = self.path("loud.wav")
+        write_sine(filename, 2)
+        result = loudness.analyze_file(filename)
+        self.assertIsNone(result[5])
+        self.assertAlmostEqual(20 * math.log10(result[4]), loudness.TARGET_RMS_DB - HALF_SCALE_RMS_DB, places=2)
+
+    def test_missing_files_are_not_cached(self):
+        analyzer = loudness.LoudnessAnalyzer(cache_file=None, workers=1)
+        filename = self.path("loud.wav")
+        write_sine(filename, 2)
+        self.assertEqual(analyzer.analyze([filename, self.path("missing.wav")]), 2)
+        self.assertIsNotNone(analyzer.result(filename))
+        self.assertIsNone(analyzer.result(self.path("missing.wav")))
+
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
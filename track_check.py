@@ -0,0 +1,152 @@
+"""
+Track Check Module
+Finds songs whose audio file is missing or unreadable before they are due to
+play. Files are checked concurrently in a thread pool, and the results are
+cached by path (with mtime and size), so checking again only opens files that
+changed and the player knows about broken tracks from the previous run.
+"""
+
+import json
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+TRACK_CACHE_FILE = ".track_cache.json"
+_BATCH_SIZE = 256 # Paths per pool task, so a million songs isn't a million futures
+
+
+def check_file(filepath, cached=None):
+    """
+    Returns (mtime_ns, size, problem) for one file; problem is None if it can
+    be played. A `cached` result with the same mtime and size is reused
+    without opening the file again.
+    """
+    try:
+        info = os.stat(filepath)
+    except FileNotFoundError:
+        return None, None, "file not found"
+    except OSError as e:
+        return None, None, f"cannot access file ({e.strerror})"
+    if not stat.S_ISREG(info.st_mode):
+        return None, None, "not a file"
+    if cached is not None and cached[0] == info.st_mtime_ns and cached[1] == info.st_size:
+        return tuple(cached)
+    if info.st_size == 0:
+        return info.st_mtime_ns, 0, "empty file"
+    try:
+        with open(filepath, "rb") as file:
+            file.read(4)
+    except OSError as e:
+        return info.st_mtime_ns, info.st_size, f"cannot read file ({e.strerror})"
+    return info.st_mtime_ns, info.st_size, None
+
+
+# --- TrackValidator Class ---
+class TrackValidator:
+    """
+    Remembers which song files are playable. AudioPlayer consults it to skip
+    broken tracks without trying to load them, and reports load failures back.
+    """
+
+    def __init__(self, cache_file=TRACK_CACHE_FILE, workers=16):
+        self.cache_file = cache_file
+        self.workers = workers
+        self._results = self._load_cache() # Key: filepath, Value: [mtime_ns, size, problem]
+        self._session_problems = {} # Key: filepath, Value: problem reported by mark_broken (not saved)
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        if not self.cache_file:
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            data = json.dumps(self._results)
+        temp_filename = self.cache_file + ".tmp"
+        with open(temp_filename, "w", encoding="utf-8") as file:
+            file.write(data)
+        os.replace(temp_filename, self.cache_file)
+
+    # --- Lookups ---
+    def problem(self, filepath):
+        """
+        Returns why `filepath` can't be played, or None if it is fine or not checked yet.
+        A saved problem is only trusted while the file is there with the same mtime
+        and size; a file that was missing (e.g. on an unmounted drive) or has
+        changed since is checked again first.
+        """
+        problem = self._session_problems.get(filepath)
+        if problem is not None:
+            return problem
+        result = self._results.get(filepath)
+        if result is None or result[2] is None:
+            return None
+        fresh = list(check_file(filepath, result))
+        if fresh != result:
+            with self._lock:
+                self._results[filepath] = fresh
+        return fresh[2]
+
+    def mark_broken(self, filepath, problem):
+        """Records a failure found elsewhere (e.g. by the player) for this session or until the next check."""
+        with self._lock:
+            self._session_problems[filepath] = problem
+
+    # --- Checking ---
+    def _check_batch(self, filepaths):
+        return [(path, check_file(path, self._results.get(path))) for path in filepaths]
+
+    def check(self, filepaths, recheck=False):
+        """
+        Checks the given files concurrently. Without `recheck`, only files never
+        checked before are looked at; with it, every file is stat'ed again but
+        only reopened if its mtime or size changed. Returns how many were checked.
+        """
+        pending = dict.fromkeys(filepaths)
+        if not recheck:
+            pending = [path for path in pending if path not in self._results]
+        paths = iter(pending)
+        batches = iter(lambda: list(islice(paths, _BATCH_SIZE)), [])
+        checked = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="track-check") as pool:
+            for results in pool.map(self._check_batch, batches):
+                with self._lock:
+                    for path, result in results:
+                        self._results[path] = list(result)
+                        self._session_problems.pop(path, None)
+                checked += len(results)
+        if checked:
+            self.save()
+        return checked
+
+    def check_library(self, library, recheck=False):
+        return self.check((song.filepath for song in library.get_all_songs()), recheck)
+
+    def broken_songs(self, library):
+        """Returns [(song, problem)] for every song whose file is known to be broken."""
+        if not self._session_problems and not any(result[2] for result in list(self._results.values())):
+            return []
+        broken = []
+        for song in library.get_all_songs():
+            problem = self.problem(song.filepath)
+            if problem:
+                broken.append((song, problem))
+        return broken
+
+    def format_report(self, library):
+        broken = self.broken_songs(library)
+        if not broken:
+            return "✅ All checked tracks are playable."
+        lines = [f"⚠️ {len(broken)} broken track(s):"]
+        lines.extend(f"{i}. {song.title} - {song.filepath}: {problem}"
+                     for i, (song, problem) in enumerate(broken, 1))
+        return "\n".join(lines)